@@ -0,0 +1,82 @@
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+
+# 自定义数据角色
+AccountRole = Qt.UserRole + 1
+
+
+class AccountListModel(QAbstractListModel):
+    """已注册邮箱列表模型：行文本在视图需要显示时才格式化，单个账号变化只通知对应行"""
+
+    def __init__(self, accounts=None, parent=None):
+        super().__init__(parent)
+        self._accounts = list(accounts or [])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._accounts)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        account = self._accounts[index.row()]
+        if role == Qt.DisplayRole:
+            status = "已使用" if account.get("used") else "未使用"
+            return f"[{index.row() + 1}] {account['email']} (密码：{account.get('password', '')}) ({status})"
+        if role == AccountRole:
+            return account
+        return None
+
+    def account(self, row):
+        return self._accounts[row]
+
+    def set_accounts(self, accounts):
+        self.beginResetModel()
+        self._accounts = list(accounts)
+        self.endResetModel()
+
+    def append_accounts(self, accounts):
+        if not accounts:
+            return
+        first = len(self._accounts)
+        self.beginInsertRows(QModelIndex(), first, first + len(accounts) - 1)
+        self._accounts.extend(accounts)
+        self.endInsertRows()
+
+    def update_account(self, row, **fields):
+        self._accounts[row].update(fields)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, AccountRole])
+
+    def remove_account(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        account = self._accounts.pop(row)
+        self.endRemoveRows()
+        # 后续行的序号会变，但视图删行后会重绘可见行，不必对整段发 dataChanged（会触发全量重新过滤）
+        return account
+
+
+class AccountFilterProxyModel(QSortFilterProxyModel):
+    """按邮箱类型、使用状态和关键字过滤账号"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._email_type = None
+        self._used = None
+        self._text = ""
+        # 账号被标记为已使用等变化后自动重新过滤
+        self.setDynamicSortFilter(True)
+
+    def set_filters(self, email_type=None, used=None, text=""):
+        self._email_type = email_type
+        self._used = used
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        account = self.sourceModel().account(source_row)
+        if self._email_type is not None and account.get("type") != self._email_type:
+            return False
+        if self._used is not None and bool(account.get("used")) != self._used:
+            return False
+        if self._text and self._text not in account["email"].lower():
+            return False
+        return True
@@ -0,0 +1,275 @@
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS
+from providers import get_provider
+from http_client import (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES,
+                         HTTP_BACKOFF_FACTOR, HTTP_RETRY_STATUS, run_flow)
+
+# 异步后端配置
+ASYNC_PROVIDER_CONCURRENCY = {"mail.tm": 32, "1secmail": 32, "guerrillamail": 16}
+ASYNC_DEFAULT_CONCURRENCY = 8
+# Outlook（Selenium / IMAP）等阻塞操作使用的固定线程数
+ASYNC_BLOCKING_WORKERS = 4
+
+
+class AsyncResponse:
+    """与 requests.Response 用法一致的最小响应对象，供服务商流程解析"""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncProviderBackend:
+    """在单独的事件循环线程上并发执行服务商操作，线程数不随任务数增长"""
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="async-blocking")
+        self._sessions = {}
+        self._semaphores = {}
+        self._inflight = {}      # coalesce 键 -> 正在进行的请求任务
+        # aiohttp 导入较慢，第一次执行流程时在线程池中加载
+        self._aiohttp = None
+        self._aiohttp_loaded = False
+
+    def start(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(self._loop)
+                self._loop.call_soon(ready.set)
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="async-provider-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def submit(self, coro):
+        """把协程提交到事件循环，返回 concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def register(self, email_type):
+        return self.submit(self._register(email_type))
+
+    def fetch_verification_code(self, email_info):
+        return self.submit(self._fetch_verification_code(email_info))
+
+    def prepare(self, email_type):
+        """提前做好注册准备（拉取域名、预启动浏览器等）"""
+        return self.submit(self._call_provider(email_type, "prepare"))
+
+    def finish_registration(self, email_info):
+        return self.submit(self._call_provider(email_info.get("type"), "finish_registration", email_info))
+
+    def stop(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+        self._executor.shutdown(wait=False)
+
+    async def _register(self, email_type):
+        with METRICS.span(email_type, "register") as span:
+            try:
+                provider = get_provider(email_type)
+                if provider is None:
+                    raise ValueError("未知邮箱类型")
+                flow = provider.register_flow()
+                if flow is None:
+                    # Outlook 走 Selenium，只能放到阻塞线程池
+                    result = await self._run_blocking(provider.register)
+                else:
+                    # 预热缓存（如域名列表），避免流程内的同步拉取阻塞事件循环
+                    await self._run_blocking(provider.prepare)
+                    result = await self.run_flow(flow)
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            if not result.get("success"):
+                span.fail()
+        result["type"] = email_type
+        return result
+
+    async def _fetch_verification_code(self, email_info):
+        with METRICS.span(email_info.get("type"), "fetch_code") as span:
+            try:
+                provider = get_provider(email_info.get("type"))
+                if provider is None:
+                    raise ValueError("未知邮箱类型")
+                flow = provider.fetch_code_flow(email_info)
+                if flow is None:
+                    result = await self._run_blocking(provider.fetch_verification_code, email_info)
+                else:
+                    result = await self.run_flow(flow)
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            if not result.get("success"):
+                span.fail()
+            return result
+
+    async def _call_provider(self, email_type, method, *args):
+        provider = await self._run_blocking(get_provider, email_type)
+        if provider is not None:
+            await self._run_blocking(getattr(provider, method), *args)
+
+    async def _run_blocking(self, func, *args):
+        # run_in_executor 不传递 contextvars，带上当前上下文，线程池中的阶段计时才能归到当前操作
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, func, *args)
+
+    async def run_flow(self, flow):
+        """在事件循环中驱动服务商流程（与 http_client.run_flow 语义一致）"""
+        if not self._aiohttp_loaded:
+            self._aiohttp = await self._run_blocking(_import_aiohttp)
+            self._aiohttp_loaded = True
+        if self._aiohttp is None:
+            return await self._run_blocking(run_flow, flow)
+        try:
+            request = next(flow)
+            while True:
+                try:
+                    resp = await self._send(request)
+                except Exception as e:
+                    request = flow.throw(e)
+                else:
+                    request = flow.send(resp)
+        except StopIteration as stop:
+            return stop.value
+
+    def _session(self, provider):
+        session = self._sessions.get(provider)
+        if session is None:
+            aiohttp = self._aiohttp
+            limit = ASYNC_PROVIDER_CONCURRENCY.get(provider, ASYNC_DEFAULT_CONCURRENCY)
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=limit, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT),
+                # 与同步会话一致：不保存 Cookie
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trace_configs=[_connection_trace(aiohttp, provider)],
+            )
+            self._sessions[provider] = session
+            self._semaphores[provider] = asyncio.Semaphore(limit)
+        return session
+
+    async def _send(self, request):
+        if request.coalesce is None:
+            return await self._request(request)
+        # 同一键的并发请求共用一个任务；shield 保证某个等待者被取消时请求仍继续
+        task = self._inflight.get(request.coalesce)
+        if task is None:
+            task = self._inflight[request.coalesce] = asyncio.ensure_future(self._request(request))
+            task.add_done_callback(lambda _, key=request.coalesce: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _request(self, request):
+        """发送请求并记录耗时、状态码与收发字节数"""
+        if not METRICS.enabled:
+            return await self._request_with_retry(request)
+        start = time.perf_counter()
+        try:
+            resp = await self._request_with_retry(request)
+        except Exception:
+            METRICS.record_http(request.provider, "error", time.perf_counter() - start)
+            raise
+        sent = len(json.dumps(request.json).encode()) if request.json is not None else 0
+        METRICS.record_http(request.provider, resp.status_code, time.perf_counter() - start, sent, len(resp.content))
+        return resp
+
+    async def _request_with_retry(self, request):
+        """发送请求，GET 对 429/5xx 指数退避重试，POST 只重试 429"""
+        session = self._session(request.provider)
+        params = {k: str(v) for k, v in request.params.items() if v is not None} if request.params else None
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self._semaphores[request.provider]:
+                    async with session.request(request.method, request.url, params=params,
+                                               json=request.json, headers=request.headers) as resp:
+                        content = await resp.read()
+                        retry_after = resp.headers.get("Retry-After")
+                        status = resp.status
+            except self._aiohttp.ClientConnectorError:
+                # 与同步会话一致：只重试建连失败，请求已发出后的错误不重试
+                if attempt >= HTTP_MAX_RETRIES:
+                    raise
+            else:
+                retryable = status in HTTP_RETRY_STATUS and (request.method != "POST" or status == 429)
+                if not retryable or attempt >= HTTP_MAX_RETRIES:
+                    return AsyncResponse(status, content)
+            delay = HTTP_BACKOFF_FACTOR * (2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _shutdown(self):
+        # 取消尚未完成的任务（如退出时仍在进行的预热），再关闭会话
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+
+def _connection_trace(aiohttp, provider):
+    """记录新建连接时的 DNS 解析与建连（含 TLS 握手）耗时，复用连接时不触发"""
+    trace = aiohttp.TraceConfig()
+
+    # DNS 解析发生在建连过程中，两个阶段各用一个起始时间
+    def start(phase):
+        async def mark(session, ctx, params):
+            setattr(ctx, phase, time.perf_counter())
+        return mark
+
+    def end(phase):
+        async def record(session, ctx, params):
+            started = getattr(ctx, phase, None)
+            if METRICS.enabled and started is not None:
+                provider_label, operation = METRICS.labels(provider)
+                METRICS.observe(provider_label, operation, phase, time.perf_counter() - started)
+        return record
+
+    trace.on_dns_resolvehost_start.append(start("dns"))
+    trace.on_dns_resolvehost_end.append(end("dns"))
+    trace.on_connection_create_start.append(start("connect"))
+    trace.on_connection_create_end.append(end("connect"))
+    return trace
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+        return aiohttp
+    except ImportError:
+        # 未安装 aiohttp 时退化为在固定线程池中同步执行流程
+        return None
+
+
+ASYNC_BACKEND = AsyncProviderBackend()
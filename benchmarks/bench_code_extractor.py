@@ -0,0 +1,93 @@
+"""验证码提取微基准
+
+用法：python benchmarks/bench_code_extractor.py [--repeat N]
+
+先用 corpus/expected.json 校验每封样例邮件识别出的验证码，
+再对比旧的逐关键词扫描实现与 code_extractor 的耗时（含放大后的大 HTML 邮件）。
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from code_extractor import CODE_KEYWORDS, extract_code  # noqa: E402
+
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+# 大邮件：在验证码段落前拼接大量营销内容
+LARGE_MAIL_REPEAT = 2000
+NEWSLETTER_BLOCK = (
+    '<tr><td style="padding:12px;font-family:Arial"><img src="https://cdn.example.com/p/{i}.jpg" width="120">'
+    '<h3>Spring sale &ndash; item {i}</h3><p>Only $19.99 until 2024/06/30. Free shipping on orders over $50.'
+    ' <a href="https://shop.example.com/item/{i}?utm_source=mail">Shop now</a></p></td></tr>'
+)
+
+
+def legacy_extract(email_content):
+    """旧实现：每个关键词各扫描一遍正文，只返回关键词附近 200 字"""
+    for keyword in CODE_KEYWORDS:
+        if keyword in email_content:
+            idx = email_content.index(keyword)
+            start = max(0, idx - 100)
+            end = min(len(email_content), idx + len(keyword) + 100)
+            return email_content[start:end].strip()
+    return None
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS_DIR, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    mails = {}
+    for name in expected:
+        with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+            mails[name] = f.read()
+    return mails, expected
+
+
+def check_accuracy(mails, expected):
+    correct = 0
+    for name, content in mails.items():
+        code = extract_code(content)["code"]
+        ok = code == expected[name]
+        correct += ok
+        print(f"  {'OK ' if ok else 'ERR'} {name:<28} 期望 {expected[name]!s:<8} 识别 {code}")
+    print(f"识别正确 {correct}/{len(mails)}")
+    return correct == len(mails)
+
+
+def bench(label, func, mails, repeat):
+    contents = list(mails.values())
+    elapsed = timeit.timeit(lambda: [func(content) for content in contents], number=repeat)
+    per_mail = elapsed / (repeat * len(contents)) * 1e6
+    print(f"  {label:<16} {per_mail:10.1f} µs/封")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证码提取微基准")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    mails, expected = load_corpus()
+    print("样例识别结果：")
+    ok = check_accuracy(mails, expected)
+
+    print(f"\n样例邮件（{len(mails)} 封，重复 {args.repeat} 次）：")
+    bench("旧实现", legacy_extract, mails, args.repeat)
+    bench("code_extractor", extract_code, mails, args.repeat)
+
+    # 大邮件：关键词与验证码位于营销内容之后
+    padding = "".join(NEWSLETTER_BLOCK.format(i=i) for i in range(LARGE_MAIL_REPEAT))
+    large = {"large.html": "<html><body><table>" + padding + "</table>" + mails["en_html.html"]}
+    repeat = max(1, args.repeat // 200)
+    print(f"\n大 HTML 邮件（{len(large['large.html']) // 1024} KB，重复 {repeat} 次）：")
+    bench("旧实现", legacy_extract, large, repeat)
+    bench("code_extractor", extract_code, large, repeat)
+    print(f"  大邮件识别结果：{extract_code(large['large.html'])['code']}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
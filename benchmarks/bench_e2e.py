@@ -0,0 +1,290 @@
+"""端到端基准：用本地替身服务器离线测量注册、收码、收件箱和发信性能
+
+用法：python benchmarks/bench_e2e.py [--provider mail.tm,imap,...] [--accounts N]
+                                     [--mailbox-size N] [--latency MS] [--backend sync|async]
+                                     [--tracemalloc] [--json 结果.json] [--baseline 基线.json]
+
+--provider 可选 mail.tm、1secmail、guerrillamail、imap、smtp 或 all（默认）：
+  临时邮箱：批量注册吞吐、首次/再次获取验证码的延迟分位数（p50/p90/p99）
+  imap：冷启动同步+首页、增量刷新、翻页、打开邮件（冷/缓存）
+  smtp：经发信队列批量发送的吞吐
+--latency 为替身服务器每个请求（命令）的延迟，模拟网络往返。
+服务商声明的注册/发信限速模拟的是线上服务器的限制，基准中放开，只测客户端本身。
+--baseline 与之前用 --json 保存的结果比较，任一指标变差超过 --tolerance 时退出码为 1；
+取到的验证码与投递的不一致时退出码同样为 1。
+账号库写在临时目录中，不影响当前目录下的 mail_store.db。
+"""
+import argparse
+import imaplib
+import json
+import os
+import smtplib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_http import FakeTempMailServer  # noqa: E402
+from fake_imap import FakeIMAPServer, FakeMailbox, make_message  # noqa: E402
+from fake_smtp import FakeSMTPServer  # noqa: E402
+
+TEMP_PROVIDERS = ("mail.tm", "1secmail", "guerrillamail")
+ALL_SCENARIOS = TEMP_PROVIDERS + ("imap", "smtp")
+UNLIMITED = {"concurrency": 16, "rate": 1e6, "burst": 1e6}
+CODE_MAIL = "Your verification code is {code}. It expires in 10 minutes."
+PAGE_SIZE = 10
+PAGE_TURNS = 5
+BENCH_USER = "bench@example.com"
+BENCH_PASSWORD = "bench-auth-code"
+
+
+def percentile(values, p):
+    """最近秩法分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_stats(prefix, seconds):
+    return {f"{prefix}.p{p}_ms": percentile(seconds, p) * 1000 for p in (50, 90, 99)}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节计，Linux 以 KB 计
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def use_plain_transports():
+    """IMAP/SMTP 改为明文连接本地替身服务器"""
+    imaplib.IMAP4_SSL = imaplib.IMAP4
+    smtplib.SMTP_SSL = smtplib.SMTP
+
+
+def use_local_server(imap_port, smtp_port):
+    from email_services import MailboxService
+    info = {"imap": "127.0.0.1", "imap_port": imap_port, "smtp": "127.0.0.1", "smtp_port": smtp_port}
+    MailboxService.get_server_info = staticmethod(lambda mail_type: dict(info))
+
+
+def bench_temp_provider(email_type, args, server):
+    from email_services import EmailHandler
+    from provisioning import BulkProvisioner, build_account
+
+    results = {}
+    start = time.perf_counter()
+    if args.backend == "async":
+        from async_backend import ASYNC_BACKEND
+        futures = [ASYNC_BACKEND.register(email_type) for _ in range(args.accounts)]
+        registered = [future.result() for future in futures]
+    else:
+        registered = BulkProvisioner(limits={email_type: UNLIMITED}).run({email_type: args.accounts})
+    elapsed = time.perf_counter() - start
+    accounts = [build_account(result) for result in registered if result.get("success")]
+    failed = len(registered) - len(accounts)
+    results[f"{email_type}.register.per_sec"] = len(accounts) / elapsed
+    print(f"  注册 {len(accounts)}/{args.accounts} 个，{elapsed:.2f}s，{len(accounts) / elapsed:.1f} 个/秒"
+          + (f"（失败 {failed}：{registered[0].get('message')}）" if failed else ""))
+    if not accounts:
+        return results
+
+    codes = {}
+    for index, account in enumerate(accounts):
+        codes[account["email"]] = f"{100000 + index}"
+        server.deliver(account["email"], "Verify your email", CODE_MAIL.format(code=codes[account["email"]]))
+
+    if args.backend == "async":
+        from async_backend import ASYNC_BACKEND
+
+        def fetch(account):
+            return ASYNC_BACKEND.fetch_verification_code(account).result()
+    else:
+        fetch = EmailHandler.fetch_verification_code
+
+    results[f"{email_type}.wrong_codes"] = 0
+    for label in ("first", "repeat"):
+        durations, wrong = [], 0
+        for account in accounts:
+            result, seconds = timed(fetch, account)
+            durations.append(seconds)
+            wrong += result.get("code") != codes[account["email"]]
+        stats = latency_stats(f"{email_type}.code_{label}", durations)
+        results.update(stats)
+        results[f"{email_type}.wrong_codes"] += wrong
+        name = "首次获取验证码" if label == "first" else "再次获取验证码"
+        print(f"  {name}：" + "  ".join(f"{key.rsplit('.', 1)[1][:-3]} {value:.1f}ms" for key, value in stats.items())
+              + (f"  （{wrong} 个验证码不正确）" if wrong else ""))
+    return results
+
+
+def bench_imap(args):
+    from email_services import MailboxService
+
+    mailbox = FakeMailbox.generate(args.mailbox_size)
+    server = FakeIMAPServer(mailbox, latency=args.latency / 1000, password=BENCH_PASSWORD).start()
+    use_local_server(server.port, 0)
+    results = {}
+
+    (ok, msg, mail_list, total), seconds = timed(
+        MailboxService.fetch_mail_list, "qq", BENCH_USER, BENCH_PASSWORD, 0, PAGE_SIZE)
+    if not ok:
+        print(f"  收件箱加载失败：{msg}")
+        return results
+    results["imap.inbox_cold_ms"] = seconds * 1000
+    print(f"  冷启动同步 {total} 封 + 首页：{seconds * 1000:.1f}ms")
+
+    mailbox.append(make_message(args.mailbox_size + 1, subject="New arrival"))
+    _, seconds = timed(MailboxService.fetch_mail_list, "qq", BENCH_USER, BENCH_PASSWORD, 0, PAGE_SIZE)
+    results["imap.inbox_refresh_ms"] = seconds * 1000
+    print(f"  增量刷新（1 封新邮件）：{seconds * 1000:.1f}ms")
+
+    turns = [timed(MailboxService.fetch_mail_list, "qq", BENCH_USER, BENCH_PASSWORD, page, PAGE_SIZE, False)[1]
+             for page in range(1, PAGE_TURNS + 1)]
+    results.update(latency_stats("imap.page_turn", turns))
+    print(f"  翻页 {len(turns)} 次：平均 {sum(turns) / len(turns) * 1000:.1f}ms")
+
+    uid = mail_list[0]["id"]
+    _, cold = timed(MailboxService.get_mail_content, "qq", BENCH_USER, BENCH_PASSWORD, uid)
+    _, cached = timed(MailboxService.get_mail_content, "qq", BENCH_USER, BENCH_PASSWORD, uid)
+    results["imap.open_mail_cold_ms"] = cold * 1000
+    results["imap.open_mail_cached_ms"] = cached * 1000
+    print(f"  打开邮件：冷 {cold * 1000:.1f}ms，缓存 {cached * 1000:.2f}ms")
+    print(f"  服务器收到 {len(server.commands)} 条命令，登录 {server.logins} 次")
+    server.shutdown()
+    return results
+
+
+def bench_smtp(args):
+    import mail_outbox
+    from email_services import MailboxService
+
+    server = FakeSMTPServer(password=BENCH_PASSWORD, latency=args.latency / 1000).start()
+    use_local_server(0, server.port)
+    mail_outbox.SMTP_SEND_RATES["127.0.0.1"] = UNLIMITED
+    messages = [{"to": f"user{i}@example.com", "subject": f"Bench {i}", "content": f"第 {i} 封测试邮件"}
+                for i in range(args.accounts)]
+    job, seconds = timed(MailboxService.send_bulk, "qq", BENCH_USER, BENCH_PASSWORD, messages)
+    report = job.report()
+    sent = sum(result["status"] == "sent" for result in report["results"])
+    results = {"smtp.send.per_sec": sent / seconds}
+    print(f"  {report['message']}，{seconds:.2f}s，{sent / seconds:.1f} 封/秒，"
+          f"连接 {server.connections} 次，登录 {server.logins} 次")
+    mail_outbox.SMTP_OUTBOX.close_all()
+    server.shutdown()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较，返回变差超过容忍度的指标说明"""
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        if not old or not isinstance(value, (int, float)):
+            continue
+        if key.endswith("_ms") or key.endswith("_mb"):
+            change = value / old - 1
+        elif key.endswith("per_sec"):
+            change = old / value - 1 if value else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{key}: {old:.2f} -> {value:.2f}（变差 {change:.0%}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准（本地替身服务器）")
+    parser.add_argument("--provider", default="all", help="逗号分隔：" + ",".join(ALL_SCENARIOS) + " 或 all")
+    parser.add_argument("--accounts", type=int, default=20, help="注册账号数 / 发信封数")
+    parser.add_argument("--mailbox-size", type=int, default=1000, help="IMAP 收件箱邮件数")
+    parser.add_argument("--latency", type=float, default=20.0, help="服务器每个请求的延迟（毫秒）")
+    parser.add_argument("--backend", choices=("sync", "async"), default="sync", help="临时邮箱的执行后端")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计各场景的 Python 内存峰值（计时会变慢）")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许变差的比例")
+    args = parser.parse_args()
+
+    scenarios = ALL_SCENARIOS if args.provider == "all" else [p.strip() for p in args.provider.split(",")]
+    unknown = [s for s in scenarios if s not in ALL_SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}")
+
+    # 结果路径相对于启动目录；账号库、域名缓存等写到临时目录
+    args.json = args.json and os.path.abspath(args.json)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+    os.chdir(tempfile.mkdtemp(prefix="bench-e2e-"))
+    use_plain_transports()
+    http_server = None
+    if any(s in TEMP_PROVIDERS for s in scenarios):
+        http_server = FakeTempMailServer(latency=args.latency / 1000).start()
+        http_server.install()
+
+    print(f"延迟 {args.latency:g}ms，账号 {args.accounts}，收件箱 {args.mailbox_size} 封，后端 {args.backend}")
+    results = {}
+    for scenario in scenarios:
+        print(f"[{scenario}]")
+        if args.tracemalloc:
+            tracemalloc.start()
+        if scenario in TEMP_PROVIDERS:
+            results.update(bench_temp_provider(scenario, args, http_server))
+        elif scenario == "imap":
+            results.update(bench_imap(args))
+        else:
+            results.update(bench_smtp(args))
+        if args.tracemalloc:
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+            results[f"{scenario}.alloc_peak_mb"] = peak
+            print(f"  Python 内存峰值 {peak:.1f}MB")
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        results["process.peak_rss_mb"] = rss
+        print(f"进程峰值内存 {rss:.1f}MB")
+    if http_server is not None:
+        print("临时邮箱 API 请求数：" + "，".join(f"{k} {v}" for k, v in sorted(http_server.requests.items())))
+        http_server.shutdown()
+    if args.backend == "async" and any(s in TEMP_PROVIDERS for s in scenarios):
+        from async_backend import ASYNC_BACKEND
+        ASYNC_BACKEND.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    # 验证码不对说明功能已坏，计时没有意义
+    wrong_codes = {key[:-len(".wrong_codes")]: value for key, value in results.items()
+                   if key.endswith(".wrong_codes") and value}
+    for provider, count in wrong_codes.items():
+        print(f"结果错误 {provider}：{count} 次取到的验证码不正确")
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"性能回退 {line}")
+        if not regressions:
+            print("与基线相比没有超出容忍度的回退")
+    if wrong_codes or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""mail.tm / 1secmail / GuerrillaMail 三个临时邮箱 API 的本地替身
+
+一个 HTTP 服务同时提供三家的接口（路径前缀 /mailtm、/1secmail/、/guerrilla/ajax.php），
+只实现 providers 中用到的请求，响应字段与线上接口一致。
+install() 把各服务商模块的 API 地址指向本服务，deliver() 向邮箱投递一封邮件。
+"""
+import json
+import time
+import base64
+import random
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+MAIL_TM_PAGE_SIZE = 30
+MAIL_TM_DOMAINS = ("bench-a.test", "bench-b.test")
+ONESECMAIL_DOMAIN = "1secmail.test"
+GUERRILLA_DOMAIN = "guerrilla.test"
+
+
+def make_jwt(subject, exp):
+    """生成不签名的 JWT，只为让客户端能读到 exp"""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    return f"{encode({'alg': 'none'})}.{encode({'sub': subject, 'exp': exp, 'iat': int(time.time())})}.sig"
+
+
+def _jwt_exp(token):
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"]
+    except (IndexError, KeyError, ValueError):
+        return 0
+
+
+class _Mailbox:
+    def __init__(self, address, password=""):
+        self.address = address
+        self.password = password
+        self.messages = []       # 按投递顺序，id 递增
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和正文分两次写出，不关 Nagle 时与客户端的延迟确认叠加，每个请求多出约 40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method):
+        server = self.server
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        server.count(url.path.split("/")[1] or url.path)
+        if server.latency:
+            time.sleep(server.latency)
+        if url.path.startswith("/mailtm/"):
+            return self._mail_tm(method, url.path[len("/mailtm"):], query)
+        if url.path == "/1secmail/":
+            return self._onesecmail(query)
+        if url.path == "/guerrilla/ajax.php":
+            return self._guerrilla(query)
+        self._reply(404, {"error": "not found"})
+
+    def _mail_tm(self, method, path, query):
+        server = self.server
+        if path == "/domains":
+            return self._reply(200, {"hydra:member": [{"domain": d, "isActive": True, "isPrivate": False}
+                                                     for d in MAIL_TM_DOMAINS]})
+        if path == "/accounts" and method == "POST":
+            data = self._body()
+            with server.lock:
+                if data["address"] in server.mailboxes:
+                    return self._reply(422, {"detail": "address: This value is already used."})
+                server.mailboxes[data["address"]] = _Mailbox(data["address"], data["password"])
+            return self._reply(201, {"id": data["address"], "address": data["address"]})
+        if path == "/token" and method == "POST":
+            data = self._body()
+            mailbox = server.mailboxes.get(data.get("address"))
+            if mailbox is None or mailbox.password != data.get("password"):
+                return self._reply(401, {"code": 401, "message": "Invalid credentials."})
+            token = make_jwt(mailbox.address, int(time.time()) + server.token_ttl)
+            server.tokens[token] = mailbox.address
+            return self._reply(200, {"token": token, "id": mailbox.address})
+        if path.startswith("/messages"):
+            token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+            address = server.tokens.get(token)
+            if address is None or _jwt_exp(token) < time.time():
+                return self._reply(401, {"code": 401, "message": "Expired JWT Token"})
+            messages = server.mailboxes[address].messages
+            msg_id = path[len("/messages/"):]
+            if msg_id:
+                for message in messages:
+                    if message["id"] == msg_id:
+                        return self._reply(200, {**message["summary"], "text": message["text"],
+                                                 "html": [message["html"]]})
+                return self._reply(404, {"detail": "Not Found"})
+            page = int(query.get("page", 1))
+            newest_first = messages[::-1]
+            chunk = newest_first[(page - 1) * MAIL_TM_PAGE_SIZE: page * MAIL_TM_PAGE_SIZE]
+            return self._reply(200, {"hydra:member": [message["summary"] for message in chunk],
+                                     "hydra:totalItems": len(messages)})
+        self._reply(404, {"error": "not found"})
+
+    def _onesecmail(self, query):
+        server = self.server
+        action = query.get("action")
+        if action == "genRandomMailbox":
+            addresses = [f"b{random.randrange(10 ** 9)}@{ONESECMAIL_DOMAIN}" for _ in range(int(query.get("count", 1)))]
+            with server.lock:
+                for address in addresses:
+                    server.mailboxes[address] = _Mailbox(address)
+            return self._reply(200, addresses)
+        mailbox = server.mailboxes.get(f"{query.get('login')}@{query.get('domain')}")
+        messages = mailbox.messages if mailbox else []
+        if action == "getMessages":
+            return self._reply(200, [{"id": int(m["id"]), "from": m["from"], "subject": m["subject"],
+                                      "date": m["date"]} for m in messages])
+        if action == "readMessage":
+            for message in messages:
+                if message["id"] == query.get("id"):
+                    return self._reply(200, {"id": int(message["id"]), "from": message["from"],
+                                             "subject": message["subject"], "date": message["date"],
+                                             "body": message["html"], "textBody": message["text"]})
+            return self._reply(200, "Message not found")
+        self._reply(400, {"error": "unknown action"})
+
+    def _guerrilla(self, query):
+        server = self.server
+        function = query.get("f")
+        if function == "get_email_address":
+            sid = f"s{random.randrange(10 ** 12)}"
+            address = f"{sid}@{GUERRILLA_DOMAIN}"
+            with server.lock:
+                server.mailboxes[address] = _Mailbox(address)
+                server.sessions[sid] = address
+            return self._reply(200, {"email_addr": address, "sid_token": sid, "email_timestamp": int(time.time())})
+        mailbox = server.mailboxes.get(server.sessions.get(query.get("sid_token")))
+        if mailbox is None:
+            return self._reply(200, {"list": [], "auth": {"success": False}})
+        if function in ("check_email", "get_email_list"):
+            seq = int(query.get("seq", 0))
+            items = [{"mail_id": m["id"], "mail_from": m["from"], "mail_subject": m["subject"],
+                      "mail_date": m["date"]} for m in mailbox.messages if int(m["id"]) > seq]
+            return self._reply(200, {"list": items[::-1], "count": len(items)})
+        if function == "fetch_email":
+            for message in mailbox.messages:
+                if message["id"] == query.get("email_id"):
+                    return self._reply(200, {"mail_id": message["id"], "mail_subject": message["subject"],
+                                             "mail_body": message["html"]})
+            return self._reply(200, False)
+        self._reply(400, {"error": "unknown function"})
+
+
+class FakeTempMailServer(ThreadingHTTPServer):
+    """三家临时邮箱 API 的本地替身，latency 为每个请求的服务端延迟（秒）"""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency=0.0, token_ttl=3600):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.lock = threading.Lock()
+        self.mailboxes = {}      # 地址 -> _Mailbox
+        self.tokens = {}         # mail.tm token -> 地址
+        self.sessions = {}       # GuerrillaMail sid_token -> 地址
+        self.requests = {}       # 路径前缀 -> 请求数
+        self._next_id = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-temp-mail", daemon=True).start()
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def install(self):
+        """把 providers 的 API 地址指向本服务"""
+        import providers.mail_tm as mail_tm
+        import providers.onesecmail as onesecmail
+        import providers.guerrillamail as guerrillamail
+        mail_tm.MAIL_TM_API = f"{self.base_url}/mailtm"
+        onesecmail.ONESECMAIL_API = f"{self.base_url}/1secmail/"
+        guerrillamail.GUERRILLAMAIL_API = f"{self.base_url}/guerrilla/ajax.php"
+
+    def deliver(self, address, subject, text, sender="noreply@service.test"):
+        """向邮箱投递一封邮件"""
+        with self.lock:
+            self._next_id += 1
+            msg_id = str(self._next_id)
+            created = datetime.now(timezone.utc).isoformat()
+            self.mailboxes[address].messages.append({
+                "id": msg_id,
+                "from": sender,
+                "subject": subject,
+                "date": created,
+                "text": text,
+                "html": f"<html><body><p>{text}</p></body></html>",
+                "summary": {"id": msg_id, "from": {"address": sender, "name": ""}, "subject": subject,
+                            "intro": text[:60], "seen": False, "createdAt": created},
+            })
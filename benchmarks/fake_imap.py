@@ -0,0 +1,397 @@
+"""IMAP4rev1 本地替身
+
+明文 IMAP 服务，实现客户端用到的命令：LOGIN、SELECT/EXAMINE、STATUS、SEARCH、
+FETCH（含 BODYSTRUCTURE 与 BODY[分段]<起点.长度> 的部分读取）、IDLE、NOOP、LOGOUT。
+邮箱大小由 FakeMailbox.generate 决定，latency 为每条命令的服务端延迟（秒）。
+基准中把 imaplib.IMAP4_SSL 换成 imaplib.IMAP4 后连接本服务。
+"""
+import re
+import time
+import select
+import datetime
+import functools
+import threading
+import socketserver
+from email import message_from_bytes
+from email.utils import parsedate_to_datetime, format_datetime
+
+
+def _tokenize(text):
+    """把命令参数拆成原子、带引号字符串和括号；BODY[...] 中的空格不拆分"""
+    tokens, i = [], 0
+    while i < len(text):
+        c = text[i]
+        if c == " ":
+            i += 1
+        elif c in "()":
+            tokens.append(c)
+            i += 1
+        elif c == '"':
+            j, buf = i + 1, []
+            while text[j] != '"':
+                if text[j] == "\\":
+                    j += 1
+                buf.append(text[j])
+                j += 1
+            tokens.append("".join(buf))
+            i = j + 1
+        else:
+            j, depth = i, 0
+            while j < len(text) and (depth or text[j] not in " ()"):
+                if text[j] == "[":
+                    depth += 1
+                elif text[j] == "]":
+                    depth -= 1
+                j += 1
+            tokens.append(text[i:j])
+            i = j
+    return tokens
+
+
+@functools.lru_cache(maxsize=64)
+def _seqset(spec, maxval):
+    """序号集合，搜索时每封邮件都要判断一次，结果缓存"""
+    values = set()
+    for part in spec.split(","):
+        if ":" in part:
+            a, b = (maxval if x == "*" else int(x) for x in part.split(":"))
+            values.update(range(min(a, b), max(a, b) + 1))
+        else:
+            values.add(maxval if part == "*" else int(part))
+    return values
+
+
+def make_message(i, subject=None, body=None, sender="sender@example.com", date=None):
+    """生成一封 text/plain 邮件的原始字节"""
+    subject = subject or f"Message {i}"
+    body = body or f"Hello body {i}"
+    date = date or format_datetime(datetime.datetime.now(datetime.timezone.utc))
+    return (f"From: {sender}\r\nTo: me@example.com\r\nSubject: {subject}\r\nDate: {date}\r\n"
+            f"Content-Type: text/plain; charset=\"utf-8\"\r\n\r\n{body}\r\n").encode()
+
+
+class FakeMailbox:
+    """INBOX 的内容，messages 为 [uid, 原始字节, 标记集合]"""
+
+    def __init__(self, messages=(), uidvalidity=1):
+        self.uidvalidity = uidvalidity
+        self.messages = []
+        self.next_uid = 1
+        self.lock = threading.Lock()
+        self.listeners = []      # IDLE 中的连接，新邮件到达时通知
+        for raw in messages:
+            self.append(raw)
+
+    @classmethod
+    def generate(cls, count, body_size=200):
+        """生成 count 封邮件，正文约 body_size 字节"""
+        filler = ("lorem ipsum dolor sit amet " * (body_size // 27 + 1))[:body_size]
+        return cls(make_message(i, body=f"{filler}\r\n{i}") for i in range(1, count + 1))
+
+    def append(self, raw):
+        with self.lock:
+            self.messages.append([self.next_uid, raw, set()])
+            self.next_uid += 1
+            for event in list(self.listeners):
+                event.set()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # 多行响应逐行写出，关闭 Nagle 避免与客户端的延迟确认叠加
+    disable_nagle_algorithm = True
+
+    def send(self, line):
+        if isinstance(line, str):
+            line = line.encode()
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self.selected = None
+        self.send("* OK fake imap ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.rstrip(b"\r\n")
+            # 同步字面量 {n}：回复续行后读入，拼成带引号的字符串
+            while line.endswith(b"}") and b"{" in line:
+                start = line.rindex(b"{")
+                size = int(line[start + 1:-1])
+                self.send("+ go ahead")
+                data = self.rfile.read(size)
+                line = line[:start] + b'"' + data.replace(b'"', b'\\"') + b'"'
+                line += self.rfile.readline().rstrip(b"\r\n")
+            text = line.decode("utf-8", "replace")
+            server.commands.append(text)
+            if server.latency:
+                time.sleep(server.latency)
+            tag, _, rest = text.partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            uid = command == "UID"
+            if uid:
+                command, _, args = args.partition(" ")
+                command = command.upper()
+            handler = getattr(self, "do_" + command, None)
+            if handler is None:
+                self.send(f"{tag} BAD unknown {command}")
+            elif not handler(tag, args, uid):
+                return
+
+    def do_CAPABILITY(self, tag, args, uid):
+        self.send("* CAPABILITY " + " ".join(self.server.capabilities))
+        self.send(f"{tag} OK done")
+        return True
+
+    def do_LOGIN(self, tag, args, uid):
+        self.server.logins += 1
+        tokens = _tokenize(args)
+        if self.server.password and tokens[1] != self.server.password:
+            self.send(f"{tag} NO [AUTHENTICATIONFAILED] invalid credentials")
+        else:
+            self.send(f"{tag} OK logged in")
+        return True
+
+    def do_NOOP(self, tag, args, uid):
+        self.send(f"{tag} OK done")
+        return True
+
+    def do_LOGOUT(self, tag, args, uid):
+        self.send("* BYE logging out")
+        self.send(f"{tag} OK done")
+        return False
+
+    def do_SELECT(self, tag, args, uid):
+        mailbox = self.selected = self.server.mailbox
+        self.send(f"* {len(mailbox.messages)} EXISTS")
+        self.send("* 0 RECENT")
+        self.send(f"* OK [UIDVALIDITY {mailbox.uidvalidity}] ok")
+        self.send(f"* OK [UIDNEXT {mailbox.next_uid}] ok")
+        self.send(f"{tag} OK [READ-WRITE] selected")
+        return True
+
+    do_EXAMINE = do_SELECT
+
+    def do_STATUS(self, tag, args, uid):
+        mailbox = self.server.mailbox
+        self.send(f"* STATUS INBOX (MESSAGES {len(mailbox.messages)} UIDNEXT {mailbox.next_uid} "
+                  f"UIDVALIDITY {mailbox.uidvalidity})")
+        self.send(f"{tag} OK done")
+        return True
+
+    def do_IDLE(self, tag, args, uid):
+        mailbox = self.server.mailbox
+        event = threading.Event()
+        known = len(mailbox.messages)
+        mailbox.listeners.append(event)
+        self.send("+ idling")
+        try:
+            while True:
+                readable, _, _ = select.select([self.connection], [], [], 0.05)
+                if readable:
+                    line = self.rfile.readline()
+                    if not line:
+                        return False
+                    if line.strip().upper() == b"DONE":
+                        break
+                if event.is_set():
+                    event.clear()
+                    if len(mailbox.messages) != known:
+                        known = len(mailbox.messages)
+                        self.send(f"* {known} EXISTS")
+        finally:
+            mailbox.listeners.remove(event)
+        self.send(f"{tag} OK idle done")
+        return True
+
+    def _max_uid(self):
+        messages = self.selected.messages
+        return messages[-1][0] if messages else 0
+
+    def _match(self, tokens, i, seq, message):
+        """匹配一个搜索条件，返回 (是否命中, 下一个条件的位置)"""
+        key = tokens[i].upper()
+        if key == "ALL":
+            return True, i + 1
+        if key == "OR":
+            a, j = self._match(tokens, i + 1, seq, message)
+            b, k = self._match(tokens, j, seq, message)
+            return a or b, k
+        if key == "NOT":
+            a, j = self._match(tokens, i + 1, seq, message)
+            return not a, j
+        if key == "UID":
+            return message[0] in _seqset(tokens[i + 1], self._max_uid()), i + 2
+        if key == "CHARSET":
+            return True, i + 2
+        if key == "UNSEEN":
+            return "\\Seen" not in message[2], i + 1
+        if key in ("SUBJECT", "FROM"):
+            msg = message_from_bytes(message[1])
+            return tokens[i + 1].lower() in str(msg.get(key, "")).lower(), i + 2
+        if key in ("BODY", "TEXT"):
+            return tokens[i + 1].encode().lower() in message[1].lower(), i + 2
+        if key == "SINCE":
+            since = datetime.datetime.strptime(tokens[i + 1], "%d-%b-%Y").date()
+            try:
+                sent = parsedate_to_datetime(message_from_bytes(message[1])["Date"]).date()
+            except (TypeError, ValueError):
+                return True, i + 2
+            return sent >= since, i + 2
+        if re.match(r"^[\d:*,]+$", key):
+            return seq in _seqset(key, len(self.selected.messages)), i + 1
+        raise ValueError(key)
+
+    def do_SEARCH(self, tag, args, uid):
+        tokens = [t for t in _tokenize(args) if t not in "()"]
+        hits = []
+        for seq, message in enumerate(self.selected.messages, 1):
+            i, matched = 0, True
+            while i < len(tokens):
+                result, i = self._match(tokens, i, seq, message)
+                matched = matched and result
+            if matched:
+                hits.append(message[0] if uid else seq)
+        self.send("* SEARCH" + "".join(f" {hit}" for hit in hits))
+        self.send(f"{tag} OK search done")
+        return True
+
+    def do_FETCH(self, tag, args, uid):
+        spec, _, items = args.partition(" ")
+        messages = self.selected.messages
+        if uid:
+            wanted = _seqset(spec, self._max_uid())
+            targets = [(seq, m) for seq, m in enumerate(messages, 1) if m[0] in wanted]
+        else:
+            wanted = _seqset(spec, len(messages))
+            targets = [(seq, m) for seq, m in enumerate(messages, 1) if seq in wanted]
+        names = _tokenize(items)
+        if names and names[0] == "(":
+            names = names[1:-1]
+        if uid and "UID" not in (name.upper() for name in names):
+            names.insert(0, "UID")
+        for seq, message in targets:
+            atoms, literals = [], []
+            for name in names:
+                upper = name.upper()
+                if upper == "UID":
+                    atoms.append(f"UID {message[0]}".encode())
+                elif upper == "FLAGS":
+                    atoms.append(f"FLAGS ({' '.join(sorted(message[2]))})".encode())
+                elif upper == "RFC822.SIZE":
+                    atoms.append(f"RFC822.SIZE {len(message[1])}".encode())
+                elif upper == "BODYSTRUCTURE":
+                    atoms.append(b"BODYSTRUCTURE " + _bodystructure(message_from_bytes(message[1])))
+                else:
+                    if ".PEEK" not in upper:
+                        message[2].add("\\Seen")
+                    literals.append(_section(message[1], name))
+            out = f"* {seq} FETCH (".encode() + b" ".join(atoms)
+            for n, (data, label) in enumerate(literals):
+                out += (b" " if atoms or n else b"") + label.encode() + b" {%d}\r\n" % len(data) + data
+            self.wfile.write(out + b")\r\n")
+        self.send(f"{tag} OK fetch done")
+        return True
+
+
+def _section(raw, name):
+    """按 FETCH 数据项取邮件的某一段，返回 (数据, 响应标签)"""
+    upper = name.upper().replace(".PEEK", "")
+    sep = b"\r\n\r\n" if b"\r\n\r\n" in raw else b"\n\n"
+    header, _, body = raw.partition(sep)
+    header += sep
+    if upper == "RFC822":
+        return raw, "RFC822"
+    if upper == "RFC822.HEADER":
+        return header, "RFC822.HEADER"
+    match = re.match(r"BODY\[(.*?)\](?:<(\d+)(?:\.(\d+))?>)?$", upper)
+    section, start, length = match.groups()
+    label_section = section
+    if section == "":
+        data = raw
+    elif section == "HEADER":
+        data = header
+    elif section == "TEXT":
+        data = body
+    elif section.startswith("HEADER.FIELDS"):
+        fields = [f.lower() for f in re.search(r"\((.*)\)", section).group(1).split()]
+        msg = message_from_bytes(raw)
+        data = b"".join(f"{k}: {v}\r\n".encode() for k, v in msg.items() if k.lower() in fields) + b"\r\n"
+    else:
+        data = _part_data(message_from_bytes(raw), section)
+    label = f"BODY[{label_section}]"
+    if start is not None:
+        start = int(start)
+        data = data[start:start + int(length)] if length else data[start:]
+        label += f"<{start}>"
+    return data, label
+
+
+def _part_data(msg, section):
+    node = msg
+    for index in (int(x) for x in section.split(".") if x.isdigit()):
+        if node.is_multipart():
+            node = node.get_payload()[index - 1]
+        elif index != 1:
+            return b""
+    if section.endswith(".MIME"):
+        return b"".join(f"{k}: {v}\r\n".encode() for k, v in node.items()) + b"\r\n"
+    payload = node.get_payload(decode=False)
+    if isinstance(payload, list):
+        return node.as_bytes()
+    return payload.encode("utf-8", "surrogateescape")
+
+
+def _quote(value):
+    return b"NIL" if value is None else b'"' + str(value).encode() + b'"'
+
+
+def _bodystructure(part):
+    if part.is_multipart():
+        children = b"".join(_bodystructure(p) for p in part.get_payload())
+        return b"(" + children + b" " + _quote(part.get_content_subtype().upper()) + b")"
+    maintype, subtype = part.get_content_maintype().upper(), part.get_content_subtype().upper()
+    params = []
+    for key, value in (part.get_params() or [None])[1:]:
+        params += [_quote(key.upper()), _quote(value)]
+    param_list = b"(" + b" ".join(params) + b")" if params else b"NIL"
+    payload = part.get_payload(decode=False)
+    size = len(payload.encode("utf-8", "surrogateescape"))
+    encoding = part.get("Content-Transfer-Encoding", "7BIT").upper()
+    fields = [_quote(maintype), _quote(subtype), param_list, b"NIL", b"NIL", _quote(encoding), str(size).encode()]
+    if maintype == "TEXT":
+        fields.append(str(payload.count("\n")).encode())
+    fields.append(b"NIL")
+    disposition = part.get("Content-Disposition")
+    if disposition:
+        filename = part.get_filename()
+        disposition_params = b"(" + _quote("FILENAME") + b" " + _quote(filename) + b")" if filename else b"NIL"
+        fields.append(b"(" + _quote(disposition.split(";")[0].strip().upper()) + b" " + disposition_params + b")")
+    else:
+        fields.append(b"NIL")
+    return b"(" + b" ".join(fields) + b")"
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """单邮箱 IMAP 服务，password 为 None 时接受任意密码"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox, latency=0.0, password=None, capabilities=("IMAP4rev1", "IDLE", "UIDPLUS")):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.mailbox = mailbox
+        self.latency = latency
+        self.password = password
+        self.capabilities = list(capabilities)
+        self.commands = []
+        self.logins = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-imap", daemon=True).start()
+        return self
@@ -0,0 +1,142 @@
+"""SMTP 本地收信端（sink）
+
+明文 SMTP 服务，支持 EHLO / AUTH PLAIN / MAIL / RCPT / DATA / RSET / NOOP / QUIT
+和 PIPELINING，收到的邮件存入 messages。地址中含 "bad" 的收件人会被拒绝，
+drop_after 为每条连接收满多少封后主动断开（用于测试重连）。
+latency 只在客户端等待回复（读缓冲区已空）时生效，模拟一次网络往返。
+基准中把 smtplib.SMTP_SSL 换成 smtplib.SMTP 后连接本服务。
+"""
+import time
+import base64
+import socket
+import threading
+import socketserver
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = b""
+
+    def readline(self):
+        while b"\r\n" not in self.buffer:
+            data = self.request.recv(65536)
+            if not data:
+                return None
+            self.buffer += data
+        line, _, self.buffer = self.buffer.partition(b"\r\n")
+        if self.buffer:
+            self.server.pipelined_reads += 1
+        return line
+
+    def send(self, *lines):
+        if self.server.latency and not self.buffer:
+            time.sleep(self.server.latency)
+        self.request.sendall(b"".join(line.encode() + b"\r\n" for line in lines))
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.send("220 fake smtp ready")
+        authed = False
+        mail_from, recipients = None, []
+        received = 0
+        while True:
+            line = self.readline()
+            if line is None:
+                return
+            command = line.decode(errors="replace")
+            upper = command.upper()
+            server.commands.append(command)
+            if upper.startswith("EHLO"):
+                extensions = ["250-fake", "250-AUTH PLAIN LOGIN"]
+                if server.pipelining:
+                    extensions.append("250-PIPELINING")
+                self.send(*extensions, "250 SIZE 10000000")
+            elif upper.startswith("HELO"):
+                self.send("250 fake")
+            elif upper.startswith("AUTH PLAIN"):
+                parts = command.split()
+                credentials = base64.b64decode(parts[2]).split(b"\0") if len(parts) > 2 else [b"", b"", b""]
+                if server.password is None or credentials[2].decode() == server.password:
+                    authed = True
+                    with server.lock:
+                        server.logins += 1
+                    self.send("235 authenticated")
+                else:
+                    self.send("535 authentication failed")
+            elif upper.startswith("MAIL FROM"):
+                if not authed:
+                    self.send("530 authentication required")
+                else:
+                    mail_from, recipients = command[10:].strip("<> "), []
+                    self.send("250 ok")
+            elif upper.startswith("RCPT TO"):
+                address = command[8:].strip("<> ")
+                if "bad" in address:
+                    self.send("550 no such user")
+                elif mail_from is None:
+                    self.send("503 need MAIL first")
+                else:
+                    recipients.append(address)
+                    self.send("250 ok")
+            elif upper == "DATA":
+                if not recipients:
+                    self.send("554 no valid recipients")
+                    continue
+                self.send("354 end data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.readline()
+                    if data_line is None:
+                        return
+                    if data_line == b".":
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                with server.lock:
+                    server.messages.append((mail_from, list(recipients), b"\r\n".join(lines)))
+                received += 1
+                mail_from, recipients = None, []
+                self.send("250 queued")
+                if server.drop_after and received >= server.drop_after:
+                    return
+            elif upper == "RSET":
+                mail_from, recipients = None, []
+                self.send("250 ok")
+            elif upper == "NOOP":
+                self.send("250 ok")
+            elif upper == "QUIT":
+                self.send("221 bye")
+                return
+            else:
+                self.send("502 command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP 收信端，password 为 None 时接受任意密码"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None, pipelining=True, latency=0.0, drop_after=0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.password = password
+        self.pipelining = pipelining
+        self.latency = latency
+        self.drop_after = drop_after
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []       # (发件人, [收件人], 邮件字节)
+        self.commands = []
+        self.pipelined_reads = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-smtp", daemon=True).start()
+        return self
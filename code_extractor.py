@@ -0,0 +1,166 @@
+import re
+from bisect import bisect_left
+from html import unescape
+
+# 验证码邮件关键词（中英文），同时用于 IMAP 搜索
+CODE_KEYWORDS = ['验证', '验证码', '注册码', 'Verification', 'Verification Code', 'Registration Code']
+# 仅用于定位验证码位置的补充关键词
+EXTRA_KEYWORDS = ['校验码', '动态码', '确认码', '激活码', '安全码', '一次性密码',
+                  'code', 'OTP', 'one-time', 'passcode', 'security code', 'verify', 'confirm']
+RELATED_WINDOW = 100
+# 只在关键词前后这么多字符内找候选；超出范围的数字得不到邻近加分，很少会胜出
+KEYWORD_WINDOW = 200
+# 低于该分数的候选（远离关键词的短数字等）不当作验证码
+MIN_CODE_SCORE = 10
+
+# HTML 邮件只转换关键词附近这么多字符的源码（标签会占掉大部分长度）
+HTML_WINDOW = 2000
+
+
+def keyword_roots(keywords):
+    """去掉以其他关键词开头的长关键词（如 verification code 之于 verification），只需定位不需区分"""
+    lowered = {k.lower() for k in keywords}
+    return sorted(k for k in lowered if not any(k != other and k.startswith(other) for other in lowered))
+
+
+# 所有关键词合并成一个正则，对转小写后的正文一次扫描找出全部位置
+# （IGNORECASE 的多分支正则要慢数倍）
+_KEYWORD_RE = re.compile("|".join(re.escape(k) for k in keyword_roots(CODE_KEYWORDS + EXTRA_KEYWORDS)))
+
+# HTML 转纯文本
+_HTML_HINT_RE = re.compile(r"<(?:html|body|div|p|br|table|span|a)\b", re.IGNORECASE)
+_HTML_DROP_RE = re.compile(r"<(script|style|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_HTML_BREAK_RE = re.compile(r"<(?:br|/p|/div|/tr|/li|/h\d)\b[^>]*>", re.IGNORECASE)
+_HTML_HREF_RE = re.compile(r"""<a\b[^>]*?href\s*=\s*["']([^"']+)["'][^>]*>""", re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_SPACES_RE = re.compile(r"[ \t\r\f\v ]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+# 邮件模板常在验证码中间插入零宽字符防止被自动识别为电话号码
+_INVISIBLE_RE = re.compile("[\u200b-\u200d\u2060\ufeff\u00ad]")
+
+# 候选验证码：中文与数字之间没有单词边界，因此用字母数字前后断言代替 \b
+_CANDIDATE_RE = re.compile(
+    r"(?P<link>https?://[^\s\"'<>]+)"
+    r"|(?<![0-9A-Za-z])(?P<digits>\d{3}[ -]\d{3}|\d{4,8})(?![0-9A-Za-z])"
+    r"|(?<![0-9A-Za-z])(?P<alnum>(?=[A-Z0-9]*[0-9])(?=[0-9]*[A-Z])[A-Z0-9]{5,10})(?![0-9A-Za-z])"
+)
+_LINK_HINT_RE = re.compile(r"verify|verification|confirm|activate|activation|token|code|validate", re.IGNORECASE)
+# 紧挨着这些字符的数字多半是日期、时间、金额、电话或编号，直接排除
+_NOISE_BEFORE = set("/.$¥#-+")
+_NOISE_AFTER = set(":/%-年月日时分")
+
+
+def html_to_text(content):
+    """粗略把 HTML 转为纯文本，链接地址保留在链接文字之后"""
+    content = _HTML_DROP_RE.sub(" ", content)
+    content = _HTML_COMMENT_RE.sub(" ", content)
+    content = _HTML_HREF_RE.sub(lambda m: f" {m.group(1)} ", content)
+    content = _HTML_BREAK_RE.sub("\n", content)
+    content = _HTML_TAG_RE.sub(" ", content)
+    content = unescape(content)
+    return _BLANK_LINES_RE.sub("\n", content).strip()
+
+
+def _score(kind, value, start, end, text, keyword_positions):
+    before = text[start - 1] if start > 0 else ""
+    after = text[end] if end < len(text) else ""
+    if before in _NOISE_BEFORE or after in _NOISE_AFTER:
+        return 0
+
+    if kind == "digits":
+        digits = value.replace(" ", "").replace("-", "")
+        score = 12 if len(digits) == 6 else 8
+        if len(value) == 4 and value[:2] in ("19", "20"):
+            # 看起来像年份
+            score -= 6
+    else:
+        score = 6
+
+    # 离关键词越近越可能是验证码，关键词之后的数字再加分
+    if keyword_positions:
+        i = bisect_left(keyword_positions, start)
+        if i > 0:
+            distance = start - keyword_positions[i - 1]
+            score += max(0, 30 - distance / 4) + 4
+        if i < len(keyword_positions):
+            distance = keyword_positions[i] - end
+            score += max(0, 20 - distance / 4)
+    return score
+
+
+def _merge_windows(positions, length, radius):
+    windows = []
+    for pos in positions:
+        start, end = max(0, pos - radius), min(length, pos + radius)
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return windows
+
+
+def _html_keyword_text(content):
+    """只把 HTML 中关键词附近的源码转成纯文本；找不到关键词时转换全文"""
+    positions = [m.start() for m in _KEYWORD_RE.finditer(content.lower())]
+    if not positions:
+        # 关键词可能被写成 &#...; 实体，只能整篇转换
+        return html_to_text(content)
+    parts = []
+    for start, end in _merge_windows(positions, len(content), HTML_WINDOW):
+        # 区间边界对齐到标签，避免截断标签
+        tag_start = content.rfind("<", 0, start)
+        tag_end = content.find(">", end)
+        start = tag_start if tag_start != -1 else start
+        end = tag_end + 1 if tag_end != -1 else len(content)
+        parts.append(html_to_text(content[start:end]))
+    return "\n".join(parts)
+
+
+def _scan_windows(keyword_positions, length, text):
+    """合并各关键词附近的扫描区间；区间末尾延伸到空白处，避免截断数字或链接"""
+    windows = _merge_windows(keyword_positions, length, KEYWORD_WINDOW)
+    for window in windows:
+        end = window[1]
+        while end < length and not text[end].isspace():
+            end += 1
+        window[1] = end
+    return windows
+
+
+def extract_code(content):
+    """从邮件正文提取验证码
+
+    返回 {"code", "link", "related"}：code 为得分最高的候选（没有则为 None），
+    link 为疑似验证链接，related 为验证码（或关键词）附近的原文片段。
+    """
+    text = _html_keyword_text(content) if _HTML_HINT_RE.search(content) else content
+    text = _INVISIBLE_RE.sub("", text)
+    keyword_positions = [m.start() for m in _KEYWORD_RE.finditer(text.lower())]
+    windows = _scan_windows(keyword_positions, len(text), text) or [(0, len(text))]
+
+    best, best_score, link = None, 0, None
+    matches = (m for start, end in windows for m in _CANDIDATE_RE.finditer(text, start, end))
+    for m in matches:
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "link":
+            if link is None and _LINK_HINT_RE.search(value):
+                link = value
+            continue
+        score = _score(kind, value, m.start(), m.end(), text, keyword_positions)
+        if score >= MIN_CODE_SCORE and score > best_score:
+            best, best_score = m, score
+
+    if best is not None:
+        anchor_start, anchor_end = best.start(), best.end()
+        code = best.group(best.lastgroup).replace(" ", "").replace("-", "")
+    elif keyword_positions:
+        anchor_start = anchor_end = keyword_positions[0]
+        code = None
+    else:
+        return {"code": None, "link": link, "related": None}
+
+    start = max(0, anchor_start - RELATED_WINDOW)
+    end = min(len(text), anchor_end + RELATED_WINDOW)
+    return {"code": code, "link": link, "related": _SPACES_RE.sub(" ", text[start:end]).strip()}
@@ -0,0 +1,117 @@
+import time
+import threading
+
+from mail_store import get_store
+
+# 域名列表缓存有效期（秒），过期后先用旧列表并在后台刷新
+DOMAIN_CACHE_TTL = 3600
+
+
+class DomainCache:
+    """服务商可用域名的 TTL 缓存（内存 + SQLite），轮询分配域名"""
+
+    def __init__(self, name, fetcher, ttl=DOMAIN_CACHE_TTL, store_getter=get_store):
+        self.name = name
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.store_getter = store_getter
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._domains = []
+        self._fetched_at = 0
+        self._loaded = False
+        self._refreshing = False
+        self._next_index = 0
+
+    @property
+    def _cache_key(self):
+        return f"domains:{self.name}"
+
+    def _load_from_disk(self):
+        """冷启动时读取上次持久化的域名列表（调用方持有锁）"""
+        self._loaded = True
+        try:
+            domains, fetched_at = self.store_getter().get_provider_cache(self._cache_key)
+        except Exception:
+            return
+        if domains:
+            self._domains = domains
+            self._fetched_at = fetched_at
+
+    def _refresh(self):
+        domains = self.fetcher()
+        if not domains:
+            raise ValueError("无可用域名")
+        with self._lock:
+            self._domains = list(domains)
+            self._fetched_at = time.time()
+        try:
+            self.store_getter().set_provider_cache(self._cache_key, self._domains, self._fetched_at)
+        except Exception:
+            pass
+        return self._domains
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self._refresh()
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name=f"domain-refresh-{self.name}", daemon=True).start()
+
+    def get_domains(self):
+        """返回可用域名列表：缓存为空时同步拉取，过期时先返回旧值并后台刷新"""
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+            domains = list(self._domains)
+            stale = time.time() - self._fetched_at >= self.ttl
+            if domains and stale and not self._refreshing:
+                self._refreshing = True
+                refresh_async = True
+            else:
+                refresh_async = False
+        if not domains:
+            # 并发注册时只让一个线程去拉取，其余等待复用结果
+            with self._fetch_lock:
+                with self._lock:
+                    domains = list(self._domains)
+                if not domains:
+                    domains = list(self._refresh())
+            return domains
+        if refresh_async:
+            self._refresh_in_background()
+        return domains
+
+    def pick(self):
+        """轮询选取一个域名，使账号均匀分布在各域名上"""
+        domains = self.get_domains()
+        with self._lock:
+            domain = domains[self._next_index % len(domains)]
+            self._next_index += 1
+        return domain
+
+    def invalidate(self, domain=None):
+        """服务商拒绝某域名时将其移出缓存；不传参数则清空整个缓存
+
+        修改同时写回数据库，重启后不会再读到已被拒绝的域名。
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+            if domain is None:
+                self._domains = []
+                self._fetched_at = 0
+            elif domain in self._domains:
+                self._domains.remove(domain)
+            else:
+                return
+            domains, fetched_at = list(self._domains), self._fetched_at
+        try:
+            self.store_getter().set_provider_cache(self._cache_key, domains, fetched_at)
+        except Exception:
+            pass
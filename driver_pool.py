@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.edge.service import Service
+
+# 浏览器池配置
+DRIVER_POOL_MAX = 2          # 同时存活的浏览器上限（含等待人工验证的）
+DRIVER_POOL_WARM = 1         # 保持预启动的空闲浏览器数量
+DRIVER_ACQUIRE_TIMEOUT = 60
+DRIVER_PAGE_LOAD_TIMEOUT = 30
+# msedgedriver.exe 放在项目根目录
+DRIVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "msedgedriver.exe")
+# 复用前需要清理存储的注册相关站点
+RESET_ORIGINS = ("https://signup.live.com", "https://login.live.com", "https://account.live.com")
+
+
+def launch_edge():
+    """启动一个 Edge 浏览器"""
+    options = webdriver.EdgeOptions()
+    # 如需无头运行可打开下一行
+    # options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.use_chromium = True
+
+    if not os.path.exists(DRIVER_PATH):
+        raise FileNotFoundError(f"未找到浏览器驱动: {DRIVER_PATH}")
+
+    driver = webdriver.Edge(
+        service=Service(DRIVER_PATH),
+        options=options
+    )
+    driver.set_page_load_timeout(DRIVER_PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+class EdgeDriverPool:
+    """预启动并复用 Edge 浏览器，限制同时存活的浏览器数量"""
+
+    def __init__(self, max_drivers=DRIVER_POOL_MAX, warm=DRIVER_POOL_WARM, factory=launch_edge):
+        self.max_drivers = max_drivers
+        self.warm = min(warm, max_drivers)
+        self.factory = factory
+        self._cond = threading.Condition()
+        self._idle = []
+        self._live = 0         # 空闲 + 借出 + 启动中
+        self._launching = 0
+        self._closed = False
+
+    def warm_up(self):
+        """在后台预启动浏览器，补足空闲数量（不阻塞调用方）"""
+        with self._cond:
+            if self._closed:
+                return
+            missing = self.warm - len(self._idle) - self._launching
+            missing = min(missing, self.max_drivers - self._live)
+            for _ in range(max(missing, 0)):
+                self._live += 1
+                self._launching += 1
+                threading.Thread(target=self._launch_idle, name="edge-warm-up", daemon=True).start()
+
+    def _launch_idle(self):
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._launching -= 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._launching -= 1
+            if not self._closed:
+                self._idle.append(driver)
+                self._cond.notify_all()
+                return
+            self._live -= 1
+        self._quit(driver)
+
+    def acquire(self, timeout=DRIVER_ACQUIRE_TIMEOUT):
+        """借出一个浏览器：优先复用空闲的，其次等待预启动中的，最后新建"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._launching == 0 and self._live < self.max_drivers:
+                    self._live += 1
+                    driver = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("浏览器数量已达上限，请先完成或放弃待验证的注册")
+                self._cond.wait(remaining)
+
+        if driver is not None:
+            if self._alive(driver):
+                return driver
+            self._quit(driver)
+        try:
+            return self.factory()
+        except BaseException:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify_all()
+            raise
+
+    def release(self, driver):
+        """归还浏览器：清理 Cookie 与站点数据后放回空闲队列，多余的直接关闭"""
+        keep = self._reset(driver)
+        with self._cond:
+            if keep and not self._closed and len(self._idle) < self.warm:
+                self._idle.append(driver)
+                self._cond.notify_all()
+                return
+            self._live -= 1
+            self._cond.notify_all()
+        self._quit(driver)
+
+    def discard(self, driver):
+        """关闭出错的浏览器，并在后台补一个预启动的"""
+        with self._cond:
+            self._live -= 1
+            self._cond.notify_all()
+        self._quit(driver)
+        self.warm_up()
+
+    @staticmethod
+    def _reset(driver):
+        """清除上一次注册留下的登录状态，失败说明浏览器已不可用"""
+        try:
+            # 关闭多余的标签页
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            try:
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                for origin in RESET_ORIGINS:
+                    driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                                           {"origin": origin, "storageTypes": "all"})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get("about:blank")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close_all(self, drivers=()):
+        """关闭空闲浏览器以及调用方传入的借出中的浏览器"""
+        with self._cond:
+            self._closed = True
+            to_quit = self._idle + list(drivers)
+            self._live -= len(to_quit)
+            self._idle = []
+            self._cond.notify_all()
+        for driver in to_quit:
+            self._quit(driver)
+
+
+DRIVER_POOL = EdgeDriverPool()
@@ -1,61 +1,165 @@
 import sys
-import json
-import os
+import threading
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QListWidget, QTextEdit, QTextBrowser, QLabel, QMessageBox, 
-                               QLineEdit, QComboBox, QTabWidget)
-from PySide6.QtCore import Qt, QThread, Signal
-from email_services import TempEmailService, EmailHandler, MailboxService
+                               QLineEdit, QComboBox, QTabWidget, QSpinBox, QProgressBar, QListView,
+                               QFileDialog, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView)
+from PySide6.QtCore import Qt, QThread, QObject, Signal, QTimer
+from account_model import AccountListModel, AccountFilterProxyModel
+from email_services import MailboxService
+from mail_store import get_store
+from metrics import METRICS
+from provisioning import BulkProvisioner, build_account
+from providers import get_provider, provider_types, close_providers
+from providers.base import format_timings
+
+# 邮件收发页后台网络操作的线程数
+MAILBOX_IO_WORKERS = 4
+# 性能统计页的自动刷新间隔（毫秒）
+METRICS_REFRESH_INTERVAL = 2000
+
+class AsyncTaskBridge(QObject):
+    """把异步后端的结果通过信号送回界面线程"""
+    register_finished = Signal(dict)
+    code_received = Signal(dict)
+    code_pushed = Signal(str, dict)
+
+    # 异步后端（asyncio / aiohttp）在第一次注册或查询时才导入
+    def register(self, email_type):
+        from async_backend import ASYNC_BACKEND
+        future = ASYNC_BACKEND.register(email_type)
+        future.add_done_callback(
+            lambda f: self.register_finished.emit(self._result(f, {"type": email_type}))
+        )
+
+    def fetch_code(self, email_info):
+        from async_backend import ASYNC_BACKEND
+        future = ASYNC_BACKEND.fetch_verification_code(email_info)
+        future.add_done_callback(lambda f: self.code_received.emit(self._result(f)))
+
+    def prepare(self, email_type):
+        from async_backend import ASYNC_BACKEND
+        ASYNC_BACKEND.prepare(email_type)
+
+    def finish_registration(self, email_info):
+        from async_backend import ASYNC_BACKEND
+        ASYNC_BACKEND.finish_registration(email_info)
+
+    # IMAP 推送监听同样在第一次使用时才导入
+    def watch(self, host, port, email, password):
+        from mail_watcher import MAIL_WATCHER
+        return MAIL_WATCHER.watch(host, port, email, password,
+                                  lambda result: self.code_pushed.emit(email, result))
+
+    def unwatch(self, host, port, email):
+        from mail_watcher import MAIL_WATCHER
+        MAIL_WATCHER.unwatch(host, port, email)
+
+    def is_watching(self, host, port, email):
+        if "mail_watcher" not in sys.modules:
+            return False
+        return sys.modules["mail_watcher"].MAIL_WATCHER.is_watching(host, port, email)
+
+    # 没有推送的 HTTP 临时邮箱由异步后端定时轮询
+    def poll(self, email_info):
+        from poll_scheduler import POLL_SCHEDULER
+        email = email_info["email"]
+        return POLL_SCHEDULER.watch(email_info, lambda result: self.code_pushed.emit(email, result))
+
+    def unpoll(self, email):
+        from poll_scheduler import POLL_SCHEDULER
+        POLL_SCHEDULER.unwatch(email)
+
+    def is_polling(self, email):
+        if "poll_scheduler" not in sys.modules:
+            return False
+        return sys.modules["poll_scheduler"].POLL_SCHEDULER.is_watching(email)
+
+    @staticmethod
+    def _result(future, extra=None):
+        try:
+            return future.result()
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+            result.update(extra or {})
+            return result
 
-# 全局配置
-EMAIL_LIST_PATH = "email_list.json"
-MAIL_ACCOUNTS_PATH = "mail_accounts.json"
 
-class EmailRegisterThread(QThread):
-    """邮箱注册线程"""
-    finish_signal = Signal(dict)
+class MailboxTaskRunner(QObject):
+    """邮件收发页的网络操作放到后台线程执行，结果通过信号送回界面线程
 
-    def __init__(self, email_type):
-        super().__init__()
-        self.email_type = email_type
+    每个通道只关心最新一次请求：新请求会取消同一通道中尚未开始的旧请求，
+    已在执行的旧请求结果直接丢弃；与进行中的请求完全相同的重复请求合并为一次。
+    回调总在界面线程执行。
+    """
+    _completed = Signal(object, object)
+    task_failed = Signal(str)
 
-    def run(self):
+    def __init__(self, max_workers=MAILBOX_IO_WORKERS):
+        super().__init__()
+        self.max_workers = max_workers
+        self._executor = None
+        self._current = {}       # 通道 -> (请求键, future, 回调)
+        self._completed.connect(self._deliver)
+
+    def submit(self, channel, key, callback, func, *args):
+        """提交任务，返回 False 表示与进行中的相同请求合并"""
+        current = self._current.get(channel)
+        if current is not None and current[0] == key:
+            return False
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mailbox-io")
+        future = self._executor.submit(func, *args)
+        self._current[channel] = (key, future, callback)
+        # 在工作线程中发出，经队列连接回到界面线程
+        future.add_done_callback(lambda f: self._completed.emit(channel, f))
+        if current is not None:
+            current[1].cancel()
+        return True
+
+    def _deliver(self, channel, future):
+        current = self._current.get(channel)
+        if current is None or current[1] is not future or future.cancelled():
+            # 已被新请求取代
+            return
+        del self._current[channel]
         try:
-            if self.email_type == "outlook":
-                result = TempEmailService.register_outlook()
-            elif self.email_type == "mail.tm":
-                result = TempEmailService.register_mail_tm()
-            elif self.email_type == "1secmail":
-                result = TempEmailService.register_1secmail()
-            elif self.email_type == "guerrillamail":
-                result = TempEmailService.register_guerrillamail()
-            else:
-                result = {"success": False, "message": "未知邮箱类型"}
-            
-            result["type"] = self.email_type
-            self.finish_signal.emit(result)
+            result = future.result()
         except Exception as e:
-            self.finish_signal.emit({
-                "success": False,
-                "message": str(e),
-                "type": self.email_type
-            })
+            self.task_failed.emit(str(e))
+            return
+        current[2](result)
+
+    def shutdown(self):
+        self._current.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
 
 
-class EmailCheckThread(QThread):
-    """邮箱验证码查询线程"""
-    code_signal = Signal(dict)
+class BulkRegisterThread(QThread):
+    """批量注册线程，逐个回报进度，结束时一次性返回全部结果"""
+    progress_signal = Signal(int, int, dict)
+    finish_signal = Signal(list)
 
-    def __init__(self, email_info):
+    def __init__(self, plan):
         super().__init__()
-        self.email_info = email_info
+        self.plan = plan
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
 
     def run(self):
         try:
-            result = EmailHandler.fetch_verification_code(self.email_info)
-            self.code_signal.emit(result)
+            results = BulkProvisioner().run(
+                self.plan,
+                progress=lambda done, total, result: self.progress_signal.emit(done, total, result),
+                cancel_event=self.cancel_event,
+            )
         except Exception as e:
-            self.code_signal.emit({"success": False, "message": str(e)})
+            results = [{"success": False, "message": str(e), "type": ""}]
+        self.finish_signal.emit(results)
 
 
 class EmailRegisterApp(QMainWindow):
@@ -64,9 +168,15 @@ class EmailRegisterApp(QMainWindow):
         super().__init__()
         self.setWindowTitle("邮箱工具")
         self.setGeometry(100, 100, 800, 600)
-        self.email_list = self.load_email_list()
+        self.store = get_store()
         self.mail_accounts = self.load_mail_accounts()
         self.pending_outlook_account = None
+        self.task_bridge = AsyncTaskBridge()
+        self.task_bridge.register_finished.connect(self.on_register_finish)
+        self.task_bridge.code_received.connect(self.on_code_received)
+        self.task_bridge.code_pushed.connect(self.on_code_pushed)
+        self.mailbox_tasks = MailboxTaskRunner()
+        self.mailbox_tasks.task_failed.connect(lambda msg: self.append_log(f"后台任务出错：{msg}"))
         self.init_ui()
 
     def init_ui(self):
@@ -82,6 +192,8 @@ class EmailRegisterApp(QMainWindow):
         self.init_register_tab()
         # 邮件收发器标签页
         self.init_mailbox_tab()
+        # 性能统计标签页
+        self.init_metrics_tab()
 
     def init_register_tab(self):
         """初始化注册标签页"""
@@ -90,12 +202,42 @@ class EmailRegisterApp(QMainWindow):
 
         # 左侧布局
         left_layout = QVBoxLayout()
-        self.email_list_widget = QListWidget()
-        self.refresh_email_list()
-        self.email_list_widget.itemClicked.connect(self.on_email_clicked)
-        
+        self.account_model = AccountListModel(self.load_email_list(), self)
+        self.account_proxy = AccountFilterProxyModel(self)
+        self.account_proxy.setSourceModel(self.account_model)
+        self.email_list_view = QListView()
+        # 行高一致时视图不必逐行计算尺寸，十万行也能流畅滚动
+        self.email_list_view.setUniformItemSizes(True)
+        self.email_list_view.setModel(self.account_proxy)
+        self.email_list_view.clicked.connect(self.on_email_clicked)
+
+        # 过滤条件
+        filter_row = QHBoxLayout()
+        self.filter_type_combo = QComboBox()
+        self.filter_type_combo.addItem("全部类型", None)
+        for email_type, display_name in provider_types():
+            self.filter_type_combo.addItem(display_name, email_type)
+        self.filter_used_combo = QComboBox()
+        self.filter_used_combo.addItem("全部状态", None)
+        self.filter_used_combo.addItem("未使用", False)
+        self.filter_used_combo.addItem("已使用", True)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("搜索邮箱")
+        # 输入停顿后再过滤，避免每个字符都全量过滤一次
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(200)
+        self.filter_timer.timeout.connect(self.apply_email_filter)
+        self.filter_edit.textChanged.connect(self.filter_timer.start)
+        self.filter_type_combo.currentIndexChanged.connect(self.apply_email_filter)
+        self.filter_used_combo.currentIndexChanged.connect(self.apply_email_filter)
+        filter_row.addWidget(self.filter_type_combo)
+        filter_row.addWidget(self.filter_used_combo)
+        filter_row.addWidget(self.filter_edit)
+
         left_layout.addWidget(QLabel("已注册邮箱列表"))
-        left_layout.addWidget(self.email_list_widget)
+        left_layout.addLayout(filter_row)
+        left_layout.addWidget(self.email_list_view)
 
         # 操作按钮
         btn_row = QHBoxLayout()
@@ -108,18 +250,25 @@ class EmailRegisterApp(QMainWindow):
         left_layout.addLayout(btn_row)
 
         # 查询按钮
+        query_row = QHBoxLayout()
         self.query_btn = QPushButton("查询验证码")
         self.query_btn.clicked.connect(self.query_selected_email)
-        left_layout.addWidget(self.query_btn)
+        self.watch_btn = QPushButton("监听新验证码")
+        self.watch_btn.clicked.connect(self.toggle_watch_selected)
+        query_row.addWidget(self.query_btn)
+        query_row.addWidget(self.watch_btn)
+        left_layout.addLayout(query_row)
 
         # 邮箱类型选择
         type_layout = QHBoxLayout()
         type_layout.addWidget(QLabel("邮箱类型："))
         self.email_type_combo = QComboBox()
-        self.email_type_combo.addItem("Outlook邮箱", "outlook")
-        self.email_type_combo.addItem("临时邮箱 mail.tm", "mail.tm")
-        self.email_type_combo.addItem("临时邮箱 1secmail", "1secmail")
-        self.email_type_combo.addItem("临时邮箱 GuerrillaMail", "guerrillamail")
+        for email_type, display_name in provider_types():
+            self.email_type_combo.addItem(display_name, email_type)
+        # 切换类型时提前做好注册准备（如预启动浏览器）
+        self.email_type_combo.currentIndexChanged.connect(
+            lambda: self.task_bridge.prepare(self.email_type_combo.currentData())
+        )
         type_layout.addWidget(self.email_type_combo)
         left_layout.addLayout(type_layout)
 
@@ -128,6 +277,25 @@ class EmailRegisterApp(QMainWindow):
         self.register_btn.clicked.connect(self.start_register)
         left_layout.addWidget(self.register_btn)
 
+        # 批量注册
+        bulk_layout = QHBoxLayout()
+        bulk_layout.addWidget(QLabel("批量数量："))
+        self.bulk_count_spin = QSpinBox()
+        self.bulk_count_spin.setRange(1, 1000)
+        self.bulk_count_spin.setValue(10)
+        bulk_layout.addWidget(self.bulk_count_spin)
+        self.bulk_register_btn = QPushButton("批量新建")
+        self.bulk_register_btn.clicked.connect(self.start_bulk_register)
+        bulk_layout.addWidget(self.bulk_register_btn)
+        self.bulk_cancel_btn = QPushButton("取消")
+        self.bulk_cancel_btn.setEnabled(False)
+        self.bulk_cancel_btn.clicked.connect(self.cancel_bulk_register)
+        bulk_layout.addWidget(self.bulk_cancel_btn)
+        left_layout.addLayout(bulk_layout)
+        self.bulk_progress = QProgressBar()
+        self.bulk_progress.setVisible(False)
+        left_layout.addWidget(self.bulk_progress)
+
         # Outlook验证按钮
         self.verify_btn = QPushButton("我已完成验证（Outlook）")
         self.verify_btn.setEnabled(False)
@@ -142,11 +310,22 @@ class EmailRegisterApp(QMainWindow):
         
         self.copy_btn = QPushButton("复制相关内容")
         self.copy_btn.clicked.connect(self.copy_related)
+
+        code_row = QHBoxLayout()
+        self.code_edit = QLineEdit()
+        self.code_edit.setReadOnly(True)
+        self.code_edit.setPlaceholderText("识别出的验证码 / 验证链接")
+        self.copy_code_btn = QPushButton("复制验证码")
+        self.copy_code_btn.clicked.connect(self.copy_code)
+        code_row.addWidget(QLabel("验证码："))
+        code_row.addWidget(self.code_edit)
+        code_row.addWidget(self.copy_code_btn)
         
         self.log_display = QTextEdit()
         self.log_display.setReadOnly(True)
         self.log_display.setPlaceholderText("操作日志...")
 
+        right_layout.addLayout(code_row)
         right_layout.addWidget(self.related_label)
         right_layout.addWidget(self.related_display)
         right_layout.addWidget(self.copy_btn)
@@ -193,7 +372,12 @@ class EmailRegisterApp(QMainWindow):
         left_mail_layout = QVBoxLayout()
         self.mail_fetch_btn = QPushButton("刷新收件箱")
         self.mail_fetch_btn.clicked.connect(self.fetch_mailbox)
-        left_mail_layout.addWidget(self.mail_fetch_btn)
+        self.mail_watch_btn = QPushButton("监听新邮件验证码")
+        self.mail_watch_btn.clicked.connect(self.toggle_watch_mailbox)
+        fetch_row = QHBoxLayout()
+        fetch_row.addWidget(self.mail_fetch_btn)
+        fetch_row.addWidget(self.mail_watch_btn)
+        left_mail_layout.addLayout(fetch_row)
         self.mail_list_widget = QListWidget()
         self.mail_list_widget.itemClicked.connect(self.on_mail_item_clicked)
         left_mail_layout.addWidget(self.mail_list_widget)
@@ -217,6 +401,17 @@ class EmailRegisterApp(QMainWindow):
         self.mail_body_display.setOpenExternalLinks(True)
         right_mail_layout.addWidget(self.mail_body_display)
 
+        # 附件只列出，点击保存时才下载
+        attachment_row = QHBoxLayout()
+        attachment_row.addWidget(QLabel("附件："))
+        self.mail_attachment_combo = QComboBox()
+        attachment_row.addWidget(self.mail_attachment_combo, stretch=1)
+        self.mail_attachment_btn = QPushButton("保存附件")
+        self.mail_attachment_btn.clicked.connect(self.save_mail_attachment)
+        self.mail_attachment_btn.setEnabled(False)
+        attachment_row.addWidget(self.mail_attachment_btn)
+        right_mail_layout.addLayout(attachment_row)
+
         mid_layout.addLayout(left_mail_layout, stretch=1)
         mid_layout.addLayout(right_mail_layout, stretch=2)
         tab2_layout.addLayout(mid_layout)
@@ -226,6 +421,7 @@ class EmailRegisterApp(QMainWindow):
         row_to = QHBoxLayout()
         row_to.addWidget(QLabel("收件人："))
         self.mail_send_to_edit = QLineEdit()
+        self.mail_send_to_edit.setPlaceholderText("多个收件人用 ; 分隔，逐个单独发送")
         row_to.addWidget(self.mail_send_to_edit)
         send_layout.addLayout(row_to)
 
@@ -251,64 +447,106 @@ class EmailRegisterApp(QMainWindow):
         self._mail_current_page = 0
         self._all_mail_count = 0
         self._current_mail_ids = []
+        self._current_mail_id = None
+        self._prefetch_cancel = None
         self.apply_account_to_fields()
 
+    def init_metrics_tab(self):
+        """初始化性能统计标签页"""
+        tab3 = QWidget()
+        tab3_layout = QVBoxLayout(tab3)
+
+        control_row = QHBoxLayout()
+        self.metrics_enable_check = QCheckBox("启用统计")
+        self.metrics_enable_check.setChecked(METRICS.enabled)
+        self.metrics_enable_check.toggled.connect(self.toggle_metrics)
+        control_row.addWidget(self.metrics_enable_check)
+        control_row.addStretch(1)
+        for text, slot in (("刷新", self.refresh_metrics), ("清空", self.reset_metrics),
+                           ("导出 JSON", self.export_metrics_json), ("导出 Prometheus", self.export_metrics_prometheus)):
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            control_row.addWidget(btn)
+        tab3_layout.addLayout(control_row)
+        tab3_layout.addWidget(QLabel("按服务商、操作和阶段统计耗时（毫秒），total 为整个操作，分位数按直方图估算。"))
+
+        self.metrics_table = QTableWidget(0, 9)
+        self.metrics_table.setHorizontalHeaderLabels(
+            ["服务商", "操作", "阶段", "次数", "失败", "平均", "p50", "p90", "p99"])
+        self.metrics_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.metrics_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.metrics_table.verticalHeader().setVisible(False)
+        tab3_layout.addWidget(self.metrics_table)
+
+        self.metrics_summary_label = QLabel()
+        self.metrics_summary_label.setWordWrap(True)
+        tab3_layout.addWidget(self.metrics_summary_label)
+        self.metrics_tab_index = self.tabs.addTab(tab3, "性能统计")
+
+        # 只在统计开启且停留在本页时自动刷新
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_REFRESH_INTERVAL)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.tabs.currentChanged.connect(self.update_metrics_timer)
+        self.refresh_metrics()
+
     # 数据加载与保存
     def load_email_list(self):
-        if os.path.exists(EMAIL_LIST_PATH):
-            with open(EMAIL_LIST_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        return self.store.list_accounts()
 
     def load_mail_accounts(self):
-        if os.path.exists(MAIL_ACCOUNTS_PATH):
-            try:
-                with open(MAIL_ACCOUNTS_PATH, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
-
-    def save_mail_accounts(self):
         try:
-            with open(MAIL_ACCOUNTS_PATH, 'w', encoding='utf-8') as f:
-                json.dump(self.mail_accounts, f, ensure_ascii=False, indent=2)
+            return self.store.get_mail_accounts()
+        except Exception:
+            return {}
+
+    def save_mail_account(self, mail_type):
+        try:
+            account = self.mail_accounts[mail_type]
+            self.store.save_mail_account(mail_type, account["email"], account["password"])
         except Exception as e:
             QMessageBox.warning(self, "提示", f"保存邮箱账号信息失败：{e}")
 
-    def save_email_list(self):
-        with open(EMAIL_LIST_PATH, 'w', encoding='utf-8') as f:
-            json.dump(self.email_list, f, ensure_ascii=False, indent=2)
-
     # 邮箱列表操作
-    def refresh_email_list(self):
-        self.email_list_widget.clear()
-        for idx, item in enumerate(self.email_list):
-            status = "已使用" if item.get("used") else "未使用"
-            self.email_list_widget.addItem(
-                f"[{idx + 1}] {item['email']} (密码：{item.get('password','')}) ({status})"
-            )
+    def apply_email_filter(self):
+        self.account_proxy.set_filters(
+            email_type=self.filter_type_combo.currentData(),
+            used=self.filter_used_combo.currentData(),
+            text=self.filter_edit.text(),
+        )
+
+    def selected_account_row(self):
+        """返回当前选中账号在模型中的行号，未选中返回 -1"""
+        index = self.email_list_view.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.account_proxy.mapToSource(index).row()
+
+    def add_accounts(self, accounts):
+        """保存新注册的账号并追加到列表"""
+        self.store.add_accounts(accounts)
+        self.account_model.append_accounts(accounts)
 
-    def on_email_clicked(self, item):
+    def on_email_clicked(self, index):
         """选中邮箱项"""
         pass
 
     def mark_email_used(self):
         """标记邮箱为已使用"""
-        current_idx = self.email_list_widget.currentRow()
-        if current_idx >= 0 and current_idx < len(self.email_list):
-            self.email_list[current_idx]["used"] = True
-            self.save_email_list()
-            self.refresh_email_list()
-            self.append_log(f"标记邮箱为已使用：{self.email_list[current_idx]['email']}")
+        row = self.selected_account_row()
+        if row >= 0:
+            email = self.account_model.account(row)["email"]
+            self.store.update_account(email, used=True)
+            self.account_model.update_account(row, used=True)
+            self.append_log(f"标记邮箱为已使用：{email}")
 
     def delete_email(self):
         """删除邮箱"""
-        current_idx = self.email_list_widget.currentRow()
-        if current_idx >= 0 and current_idx < len(self.email_list):
-            email = self.email_list.pop(current_idx)
-            self.save_email_list()
-            self.refresh_email_list()
+        row = self.selected_account_row()
+        if row >= 0:
+            email = self.account_model.account(row)
+            self.store.delete_account(email["email"])
+            self.account_model.remove_account(row)
             self.append_log(f"删除邮箱：{email['email']}")
 
     # 邮箱注册相关
@@ -318,9 +556,7 @@ class EmailRegisterApp(QMainWindow):
         self.register_btn.setEnabled(False)
         self.verify_btn.setEnabled(False)
         
-        self.register_thread = EmailRegisterThread(email_type)
-        self.register_thread.finish_signal.connect(self.on_register_finish)
-        self.register_thread.start()
+        self.task_bridge.register(email_type)
         self.append_log(f"开始注册{email_type}邮箱...")
 
     def on_register_finish(self, result):
@@ -328,13 +564,13 @@ class EmailRegisterApp(QMainWindow):
         self.register_btn.setEnabled(True)
         if result["success"]:
             self.append_log(f"{result['type']}邮箱注册成功：{result.get('email')}")
-            if result["type"] == "outlook":
-                self.pending_outlook_account = {
-                    "email": result["email"],
-                    "password": result["password"],
-                    "type": "outlook",
-                    "used": False
-                }
+            if result.get("timings"):
+                self.append_log(f"注册步骤耗时：{format_timings(result['timings'])}")
+            if get_provider(result["type"]).manual_verification:
+                if self.pending_outlook_account:
+                    # 上一个未验证的注册视为放弃，释放其浏览器
+                    self.task_bridge.finish_registration(self.pending_outlook_account)
+                self.pending_outlook_account = build_account(result)
                 self.verify_btn.setEnabled(True)
                 QMessageBox.information(
                     self,
@@ -342,22 +578,7 @@ class EmailRegisterApp(QMainWindow):
                     f"请在浏览器完成人机验证后点击验证按钮\n邮箱：{result['email']}\n密码：{result['password']}"
                 )
             else:
-                # 构建邮箱信息字典
-                email_info = {
-                    "email": result["email"],
-                    "password": result.get("password", ""),
-                    "type": result["type"],
-                    "used": False
-                }
-                # 添加特定类型的额外信息
-                if result["type"] == "mail.tm":
-                    email_info["token"] = result.get("token")
-                elif result["type"] == "guerrillamail":
-                    email_info["sid_token"] = result.get("sid_token")
-
-                self.email_list.append(email_info)
-                self.save_email_list()
-                self.refresh_email_list()
+                self.add_accounts([build_account(result)])
                 QMessageBox.information(
                     self,
                     "成功",
@@ -365,14 +586,62 @@ class EmailRegisterApp(QMainWindow):
                 )
         else:
             self.append_log(f"{result['type']}邮箱注册失败：{result['message']}")
+            if result.get("timings"):
+                self.append_log(f"注册步骤耗时：{format_timings(result['timings'])}")
             QMessageBox.warning(self, "失败", result["message"])
 
+    def start_bulk_register(self):
+        """批量注册邮箱"""
+        email_type = self.email_type_combo.currentData()
+        if not get_provider(email_type).supports_bulk:
+            QMessageBox.warning(self, "提示", f"{self.email_type_combo.currentText()} 需要人工完成人机验证，不支持批量注册")
+            return
+
+        count = self.bulk_count_spin.value()
+        self.register_btn.setEnabled(False)
+        self.bulk_register_btn.setEnabled(False)
+        self.bulk_cancel_btn.setEnabled(True)
+        self.bulk_progress.setRange(0, count)
+        self.bulk_progress.setValue(0)
+        self.bulk_progress.setVisible(True)
+
+        self.bulk_thread = BulkRegisterThread({email_type: count})
+        self.bulk_thread.progress_signal.connect(self.on_bulk_progress)
+        self.bulk_thread.finish_signal.connect(self.on_bulk_finish)
+        self.bulk_thread.start()
+        self.append_log(f"开始批量注册{count}个{email_type}邮箱...")
+
+    def cancel_bulk_register(self):
+        """取消批量注册（已完成的账号仍会保存）"""
+        if getattr(self, "bulk_thread", None):
+            self.bulk_thread.cancel()
+            self.bulk_cancel_btn.setEnabled(False)
+            self.append_log("正在取消批量注册...")
+
+    def on_bulk_progress(self, done, total, result):
+        """批量注册进度回调"""
+        self.bulk_progress.setValue(done)
+        if not result["success"]:
+            self.append_log(f"[{done}/{total}] 注册失败：{result['message']}")
+
+    def on_bulk_finish(self, results):
+        """批量注册完成回调，成功的账号一次性写入存储"""
+        self.register_btn.setEnabled(True)
+        self.bulk_register_btn.setEnabled(True)
+        self.bulk_cancel_btn.setEnabled(False)
+        self.bulk_progress.setVisible(False)
+
+        accounts = [build_account(result) for result in results if result["success"]]
+        if accounts:
+            self.add_accounts(accounts)
+        failed = len(results) - len(accounts)
+        self.append_log(f"批量注册完成：成功 {len(accounts)} 个，失败 {failed} 个")
+
     def verify_outlook_registration(self):
         """验证Outlook注册"""
         if self.pending_outlook_account:
-            self.email_list.append(self.pending_outlook_account)
-            self.save_email_list()
-            self.refresh_email_list()
+            self.task_bridge.finish_registration(self.pending_outlook_account)
+            self.add_accounts([self.pending_outlook_account])
             self.append_log(f"Outlook邮箱验证完成：{self.pending_outlook_account['email']}")
             self.verify_btn.setEnabled(False)
             self.pending_outlook_account = None
@@ -381,23 +650,73 @@ class EmailRegisterApp(QMainWindow):
     # 验证码查询
     def query_selected_email(self):
         """查询选中邮箱的验证码"""
-        current_idx = self.email_list_widget.currentRow()
-        if current_idx < 0 or current_idx >= len(self.email_list):
+        row = self.selected_account_row()
+        if row < 0:
             QMessageBox.warning(self, "提示", "请先选择一个邮箱")
             return
 
-        email_info = self.email_list[current_idx]
+        email_info = self.account_model.account(row)
         self.append_log(f"开始查询{email_info['email']}的验证码...")
         
-        self.check_thread = EmailCheckThread(email_info)
-        self.check_thread.code_signal.connect(self.on_code_received)
-        self.check_thread.start()
+        self.task_bridge.fetch_code(email_info)
+
+    def toggle_watch_selected(self):
+        """开始 / 停止监听选中邮箱的新验证码（IMAP 邮箱用 IDLE 推送，临时邮箱后台轮询）"""
+        row = self.selected_account_row()
+        if row < 0:
+            QMessageBox.warning(self, "提示", "请先选择一个邮箱")
+            return
+
+        email_info = self.account_model.account(row)
+        provider = get_provider(email_info.get("type"))
+        if provider is None:
+            QMessageBox.warning(self, "提示", "未知邮箱类型")
+            return
+        if provider.supports_push:
+            host, port = provider.imap_server()
+            self.toggle_watch(host, port, email_info["email"], email_info.get("password", ""))
+            return
+
+        email = email_info["email"]
+        if self.task_bridge.is_polling(email):
+            self.task_bridge.unpoll(email)
+            self.append_log(f"已停止轮询：{email}")
+            return
+        result = self.task_bridge.poll(email_info)
+        if result["success"]:
+            self.append_log(f"{result['message']}：{email}（收到验证码会自动显示并停止轮询）")
+        else:
+            QMessageBox.warning(self, "提示", result["message"])
+
+    def toggle_watch(self, host, port, email, password):
+        if self.task_bridge.is_watching(host, port, email):
+            self.task_bridge.unwatch(host, port, email)
+            self.append_log(f"已停止监听：{email}")
+            return
+        result = self.task_bridge.watch(host, port, email, password)
+        if result["success"]:
+            self.append_log(f"{result['message']}：{email}（收到验证码会自动显示）")
+        else:
+            QMessageBox.warning(self, "提示", result["message"])
+
+    def on_code_pushed(self, email, result):
+        """监听到新邮件验证码回调"""
+        if result["success"]:
+            self.related_display.setText(result["related"])
+            self.code_edit.setText(result.get("code") or result.get("link") or "")
+            self.append_log(f"{email} 收到新验证码：{result.get('code') or result.get('link')}")
+        else:
+            self.append_log(f"{email} {result['message']}")
 
     def on_code_received(self, result):
         """收到验证码回调"""
         if result["success"]:
             self.related_display.setText(result["related"])
-            self.append_log("验证码查询成功")
+            self.code_edit.setText(result.get("code") or result.get("link") or "")
+            if result.get("code"):
+                self.append_log(f"验证码查询成功：{result['code']}")
+            else:
+                self.append_log("验证码查询成功")
         else:
             self.append_log(f"验证码查询失败：{result['message']}")
             QMessageBox.warning(self, "失败", result["message"])
@@ -405,6 +724,7 @@ class EmailRegisterApp(QMainWindow):
     # 邮件收发相关
     def apply_account_to_fields(self):
         """应用保存的账号到输入框"""
+        self.cancel_prefetch()
         mail_type = self.mail_type_combo.currentData()
         if mail_type in self.mail_accounts:
             self.mail_email_edit.setText(self.mail_accounts[mail_type].get("email", ""))
@@ -422,10 +742,15 @@ class EmailRegisterApp(QMainWindow):
 
         # 保存账号信息
         self.mail_accounts[mail_type] = {"email": email, "password": password}
-        self.save_mail_accounts()
+        self.save_mail_account(mail_type)
 
         # 测试连接
-        success, msg = MailboxService.test_connection(mail_type, email, password)
+        self.mailbox_tasks.submit("test", (mail_type, email, password),
+                                  lambda result: self.on_test_mail_account(email, result),
+                                  MailboxService.test_connection, mail_type, email, password)
+
+    def on_test_mail_account(self, email, result):
+        success, msg = result
         if success:
             QMessageBox.information(self, "成功", msg)
             self.append_log(f"邮箱连接测试成功：{email}")
@@ -433,8 +758,22 @@ class EmailRegisterApp(QMainWindow):
             QMessageBox.warning(self, "失败", msg)
             self.append_log(f"邮箱连接测试失败：{msg}")
 
+    def toggle_watch_mailbox(self):
+        """开始 / 停止监听当前收发账号的新邮件验证码"""
+        server_info = MailboxService.get_server_info(self.mail_type_combo.currentData())
+        email = self.mail_email_edit.text().strip()
+        password = self.mail_pass_edit.text().strip()
+        if not email or not password:
+            QMessageBox.warning(self, "提示", "请填写邮箱地址和密码 / 授权码")
+            return
+        self.toggle_watch(server_info["imap"], server_info["imap_port"], email, password)
+
     def fetch_mailbox(self):
         """刷新收件箱"""
+        self.load_mail_page(refresh=True)
+
+    def load_mail_page(self, refresh=False):
+        """加载当前页邮件（refresh 时先同步新邮件，否则直接读本地缓存）"""
         mail_type = self.mail_type_combo.currentData()
         email = self.mail_email_edit.text()
         password = self.mail_pass_edit.text()
@@ -443,11 +782,18 @@ class EmailRegisterApp(QMainWindow):
             QMessageBox.warning(self, "提示", "请填写邮箱和密码")
             return
 
-        self.append_log("正在获取邮件列表...")
-        success, msg, mail_list, total = MailboxService.fetch_mail_list(
-            mail_type, email, password, self._mail_current_page, self._mail_page_size
+        self.cancel_prefetch()
+        page = self._mail_current_page
+        # 翻页、重复点击刷新只保留最后一次请求
+        submitted = self.mailbox_tasks.submit(
+            "list", (mail_type, email, password, page, refresh), self.on_mail_page_loaded,
+            MailboxService.fetch_mail_list, mail_type, email, password, page, self._mail_page_size, refresh
         )
+        if refresh and submitted:
+            self.append_log("正在获取邮件列表...")
 
+    def on_mail_page_loaded(self, result):
+        success, msg, mail_list, total = result
         if success:
             self._all_mail_count = total
             self.mail_list_widget.clear()
@@ -456,10 +802,30 @@ class EmailRegisterApp(QMainWindow):
                 self._current_mail_ids.append(mail["id"])
                 self.mail_list_widget.addItem(f"{mail['subject']} - {mail['from']}")
             self.append_log(msg)
+            self.start_prefetch()
         else:
             QMessageBox.warning(self, "失败", msg)
             self.append_log(f"获取邮件列表失败：{msg}")
 
+    def start_prefetch(self):
+        """当前页显示后，在后台预读前几封邮件的正文和相邻页的摘要"""
+        self.cancel_prefetch()
+        mail_type = self.mail_type_combo.currentData()
+        email = self.mail_email_edit.text()
+        password = self.mail_pass_edit.text()
+        page = self._mail_current_page
+        self._prefetch_cancel = threading.Event()
+        # 预读失败不打扰用户，点开邮件时会再次请求
+        self.mailbox_tasks.submit("prefetch", self._prefetch_cancel, lambda result: None,
+                                  MailboxService.prefetch_mail, mail_type, email, password,
+                                  page, self._mail_page_size, self._prefetch_cancel)
+
+    def cancel_prefetch(self):
+        """切换账号或页码时停止进行中的预读"""
+        if self._prefetch_cancel is not None:
+            self._prefetch_cancel.set()
+            self._prefetch_cancel = None
+
     def on_mail_item_clicked(self, item):
         """点击邮件项查看内容"""
         idx = self.mail_list_widget.row(item)
@@ -471,63 +837,131 @@ class EmailRegisterApp(QMainWindow):
         email = self.mail_email_edit.text()
         password = self.mail_pass_edit.text()
 
-        success, msg, content = MailboxService.get_mail_content(
-            mail_type, email, password, mail_id
-        )
+        # 点了另一封邮件时，上一封的加载结果直接丢弃
+        if self.mailbox_tasks.submit("content", (mail_type, email, mail_id),
+                                     lambda result: self.on_mail_content_loaded(mail_id, result),
+                                     MailboxService.get_mail_content, mail_type, email, password, mail_id):
+            self.mail_body_display.setText("正在加载...")
+            self.mail_attachment_combo.clear()
+            self.mail_attachment_btn.setEnabled(False)
 
+    def on_mail_content_loaded(self, mail_id, result):
+        success, msg, content, attachments = result
         if success:
             self.mail_body_display.setText(content)
+            self._current_mail_id = mail_id
+            self.mail_attachment_combo.clear()
+            for part in attachments:
+                name = part["filename"] or f"未命名附件（{part['type']}）"
+                self.mail_attachment_combo.addItem(f"{name}（{part['size'] // 1024 + 1} KB）", part)
+            self.mail_attachment_btn.setEnabled(bool(attachments))
+            if msg != "获取成功":
+                self.append_log(msg)
         else:
+            self.mail_body_display.clear()
             QMessageBox.warning(self, "失败", msg)
             self.append_log(f"获取邮件内容失败：{msg}")
 
+    def save_mail_attachment(self):
+        """下载当前邮件选中的附件并保存到本地"""
+        part = self.mail_attachment_combo.currentData()
+        if part is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "保存附件", part["filename"] or "attachment")
+        if not path:
+            return
+
+        args = (self.mail_type_combo.currentData(), self.mail_email_edit.text(),
+                self.mail_pass_edit.text(), self._current_mail_id, part, path)
+        # 每个保存目标一个通道，多个附件可以同时下载
+        if self.mailbox_tasks.submit(("attachment", path), args, self.on_mail_attachment_saved,
+                                     self._download_attachment, *args):
+            self.append_log(f"正在下载附件：{part['filename'] or path}")
+
+    @staticmethod
+    def _download_attachment(mail_type, email, password, mail_id, part, path):
+        """在后台线程中下载附件并写入文件，返回 (成功, 提示)"""
+        success, msg, data = MailboxService.get_attachment(mail_type, email, password, mail_id, part)
+        if not success:
+            return False, msg
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            return False, str(e)
+        return True, f"附件已保存：{path}"
+
+    def on_mail_attachment_saved(self, result):
+        success, msg = result
+        if success:
+            self.append_log(msg)
+        else:
+            QMessageBox.warning(self, "失败", msg)
+            self.append_log(f"下载附件失败：{msg}")
+
     def send_mail(self):
         """发送邮件"""
         mail_type = self.mail_type_combo.currentData()
         email = self.mail_email_edit.text()
         password = self.mail_pass_edit.text()
-        to_addr = self.mail_send_to_edit.text()
+        to_text = self.mail_send_to_edit.text()
         subject = self.mail_send_subject_edit.text()
         content = self.mail_send_body_edit.toPlainText()
+        recipients = [addr.strip() for addr in to_text.replace("，", ";").replace(",", ";").split(";") if addr.strip()]
 
-        if not to_addr or not subject or not content:
+        if not recipients or not subject or not content:
             QMessageBox.warning(self, "提示", "请填写收件人、主题和正文")
             return
 
-        success, msg = MailboxService.send_email(
-            mail_type, email, password, to_addr, subject, content
-        )
-
-        if success:
-            QMessageBox.information(self, "成功", msg)
-            self.append_log(f"邮件发送成功：{to_addr}")
-            # 清空发送框
-            self.mail_send_to_edit.clear()
-            self.mail_send_subject_edit.clear()
-            self.mail_send_body_edit.clear()
+        # 不同的邮件各占一个通道互不取消，同一封邮件重复点击只发一次；
+        # 发信队列复用该账号的 SMTP 会话并按账号限速
+        messages = [{"to": addr, "subject": subject, "content": content} for addr in recipients]
+        key = (mail_type, email, tuple(recipients), subject, content)
+        if self.mailbox_tasks.submit(("send", key), key,
+                                     lambda report: self.on_mail_sent(to_text, subject, content, report),
+                                     self._send_mail_batch, mail_type, email, password, messages):
+            self.append_log(f"正在发送邮件：{'；'.join(recipients)}")
+
+    @staticmethod
+    def _send_mail_batch(mail_type, email, password, messages):
+        return MailboxService.send_bulk(mail_type, email, password, messages).report()
+
+    def on_mail_sent(self, to_text, subject, content, report):
+        for result in report["results"]:
+            if result["status"] == "sent":
+                self.append_log(f"邮件发送成功：{result['to']}")
+            else:
+                self.append_log(f"邮件发送失败：{result['to']}（{result['message']}）")
+        if report["success"]:
+            QMessageBox.information(self, "成功", report["message"])
+            # 发送期间没有改写过发送框才清空
+            if (self.mail_send_to_edit.text(), self.mail_send_subject_edit.text(),
+                    self.mail_send_body_edit.toPlainText()) == (to_text, subject, content):
+                self.mail_send_to_edit.clear()
+                self.mail_send_subject_edit.clear()
+                self.mail_send_body_edit.clear()
         else:
-            QMessageBox.warning(self, "失败", msg)
-            self.append_log(f"邮件发送失败：{msg}")
+            QMessageBox.warning(self, "失败", report["message"])
 
     # 分页控制
     def goto_mail_first_page(self):
         """回到首页"""
         if self._mail_current_page != 0:
             self._mail_current_page = 0
-            self.fetch_mailbox()
+            self.load_mail_page()
 
     def goto_mail_prev_page(self):
         """上一页"""
         if self._mail_current_page > 0:
             self._mail_current_page -= 1
-            self.fetch_mailbox()
+            self.load_mail_page()
 
     def goto_mail_next_page(self):
         """下一页"""
         max_page = (self._all_mail_count - 1) // self._mail_page_size
         if self._mail_current_page < max_page:
             self._mail_current_page += 1
-            self.fetch_mailbox()
+            self.load_mail_page()
 
     # 辅助功能
     def append_log(self, content):
@@ -546,6 +980,87 @@ class EmailRegisterApp(QMainWindow):
             clipboard.setText(content)
             QMessageBox.information(self, "提示", "内容已复制到剪贴板")
 
+    def copy_code(self):
+        """复制识别出的验证码"""
+        code = self.code_edit.text()
+        if code:
+            QApplication.clipboard().setText(code)
+            self.append_log("验证码已复制到剪贴板")
+
+    # 性能统计
+    def toggle_metrics(self, enabled):
+        METRICS.enabled = enabled
+        self.append_log("已开启性能统计" if enabled else "已关闭性能统计（已有数据保留）")
+        self.update_metrics_timer()
+        self.refresh_metrics()
+
+    def update_metrics_timer(self):
+        if METRICS.enabled and self.tabs.currentIndex() == self.metrics_tab_index:
+            self.metrics_timer.start()
+        else:
+            self.metrics_timer.stop()
+
+    def refresh_metrics(self):
+        """把当前统计填入表格"""
+        snapshot = METRICS.snapshot()
+        operations = snapshot["operations"]
+        self.metrics_table.setRowCount(len(operations))
+        for row, op in enumerate(operations):
+            values = [op["provider"], op["operation"], op["phase"], str(op["count"]), str(op["errors"]),
+                      f"{op['sum'] / op['count'] * 1000:.1f}" if op["count"] else "-",
+                      f"{op['p50'] * 1000:.1f}", f"{op['p90'] * 1000:.1f}", f"{op['p99'] * 1000:.1f}"]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 3:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.metrics_table.setItem(row, column, item)
+
+        statuses = "，".join(f"{item['provider']} {item['status']}×{item['count']}"
+                             for item in snapshot["http_responses"]) or "无"
+        transferred = "，".join(f"{item['provider']} {'收' if item['direction'] == 'in' else '发'} "
+                                f"{item['bytes'] / 1024:.1f}KB" for item in snapshot["bytes"]) or "无"
+        state = "统计中" if snapshot["enabled"] else "未开启"
+        self.metrics_summary_label.setText(f"状态：{state}\nHTTP 状态码：{statuses}\n传输量：{transferred}")
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.refresh_metrics()
+
+    def export_metrics_json(self):
+        self._export_metrics("导出 JSON", "metrics.json", "JSON 文件 (*.json)", METRICS.to_json)
+
+    def export_metrics_prometheus(self):
+        self._export_metrics("导出 Prometheus", "metrics.prom", "Prometheus 文本 (*.prom *.txt)",
+                             METRICS.to_prometheus)
+
+    def _export_metrics(self, title, default_name, file_filter, render):
+        path, _ = QFileDialog.getSaveFileName(self, title, default_name, file_filter)
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(render())
+        except OSError as e:
+            QMessageBox.warning(self, "失败", str(e))
+            return
+        self.append_log(f"性能统计已导出：{path}")
+
+    def closeEvent(self, event):
+        """关闭窗口时登出连接池中的会话、停止异步后端并关闭浏览器"""
+        # 只关闭已经用到的后台组件，不为退出而导入模块
+        self.cancel_prefetch()
+        self.mailbox_tasks.shutdown()
+        if "mail_pool" in sys.modules:
+            sys.modules["mail_pool"].IMAP_POOL.close_all()
+        if "async_backend" in sys.modules:
+            sys.modules["async_backend"].ASYNC_BACKEND.stop()
+        if "mail_watcher" in sys.modules:
+            sys.modules["mail_watcher"].MAIL_WATCHER.stop()
+        if "mail_outbox" in sys.modules:
+            sys.modules["mail_outbox"].SMTP_OUTBOX.close_all()
+        close_providers()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
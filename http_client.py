@@ -0,0 +1,157 @@
+import time
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from metrics import METRICS
+
+# HTTP 配置：连接 / 读取超时分开设置
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 15
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+HTTP_POOL_SIZE = 16
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 服务商操作写成生成器：逐个 yield HttpRequest，接收响应后继续解析，
+# 同一份流程既可由 run_flow 同步执行，也可由异步后端在事件循环中执行；
+# coalesce 不为空时，同一键的并发请求只发一次，所有等待者共享同一个响应
+HttpRequest = namedtuple("HttpRequest", "provider method url params json headers coalesce",
+                         defaults=(None, None, None, None))
+
+
+@lru_cache(maxsize=None)
+def _provider_retry_class():
+    # requests / urllib3 导入较慢，等第一次发请求时再加载
+    from urllib3.util.retry import Retry
+
+    class _ProviderRetry(Retry):
+        """GET 对 429/5xx 指数退避重试；POST 只在 429（请求未被处理）时重试，避免重复创建账号"""
+
+        def is_retry(self, method, status_code, has_retry_after=False):
+            if method and method.upper() == "POST" and status_code != 429:
+                return False
+            return super().is_retry(method, status_code, has_retry_after)
+
+    return _ProviderRetry
+
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from http.cookiejar import DefaultCookiePolicy
+
+    session = requests.Session()
+    retry = _provider_retry_class()(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=0,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=HTTP_RETRY_STATUS,
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # 各服务商都靠 token / sid_token 鉴权；共享会话不能带 Cookie，
+    # 否则 GuerrillaMail 会按 PHPSESSID 把不同账号当成同一个会话
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(provider):
+    """返回该服务商共享的 keep-alive 会话"""
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = _sessions[provider] = _build_session()
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+class _InflightCall:
+    """正在进行的合并请求"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _send(request):
+    if not METRICS.enabled:
+        return get_session(request.provider).request(
+            request.method, request.url, params=request.params, json=request.json,
+            headers=request.headers, timeout=HTTP_TIMEOUT,
+        )
+    start = time.perf_counter()
+    try:
+        resp = get_session(request.provider).request(
+            request.method, request.url, params=request.params, json=request.json,
+            headers=request.headers, timeout=HTTP_TIMEOUT,
+        )
+    except Exception:
+        METRICS.record_http(request.provider, "error", time.perf_counter() - start)
+        raise
+    # requests 的连接建立（DNS / TCP / TLS）在连接池内部完成，这里只能记录整个请求
+    METRICS.record_http(request.provider, resp.status_code, time.perf_counter() - start,
+                        len(resp.request.body or b""), len(resp.content))
+    return resp
+
+
+def _send_coalesced(request):
+    """同一 coalesce 键同时只有一个线程真正发请求，其余线程等待并复用结果"""
+    with _inflight_lock:
+        call = _inflight.get(request.coalesce)
+        leader = call is None
+        if leader:
+            call = _inflight[request.coalesce] = _InflightCall()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.response
+    try:
+        call.response = _send(request)
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[request.coalesce]
+        call.done.set()
+    return call.response
+
+
+def run_flow(flow):
+    """用共享会话同步执行一个服务商流程，返回流程的结果"""
+    try:
+        request = next(flow)
+        while True:
+            try:
+                resp = _send(request) if request.coalesce is None else _send_coalesced(request)
+            except Exception as e:
+                # 网络异常交给流程自己处理（与原先 try/except 的语义一致）
+                request = flow.throw(e)
+            else:
+                request = flow.send(resp)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,344 @@
+import re
+import time
+import smtplib
+import hashlib
+import threading
+from collections import deque
+from email import policy
+from email.message import EmailMessage
+
+from metrics import METRICS
+from provisioning import RateLimiter
+
+# SMTP 会话配置
+SMTP_CONNECT_TIMEOUT = 30
+# 会话空闲超过该秒数后退出登录（服务器通常几分钟就会断开空闲连接）
+SMTP_IDLE_TIMEOUT = 60
+# 空闲超过该秒数的会话复用前先 NOOP 探活
+SMTP_KEEPALIVE_INTERVAL = 15
+# 单条会话最多发送的邮件数，之后重新登录（QQ/163 会限制每连接的发信数）
+SMTP_MAX_PER_SESSION = 20
+# 每个账号的发信速率（封/秒）与突发量，按 SMTP 服务器覆盖
+SMTP_SEND_RATE = {"rate": 0.5, "burst": 3}
+SMTP_SEND_RATES = {}
+# 同步发信时最多等待的秒数：基础时间 + 每封邮件的时间（含限速等待和一次重连）
+SMTP_WAIT_TIMEOUT = 60
+SMTP_WAIT_PER_MESSAGE = 30
+
+# 非 ASCII 正文用 base64 / quoted-printable 编码，不依赖服务器的 8BITMIME
+MESSAGE_POLICY = policy.SMTP.clone(cte_type="7bit")
+
+
+def build_message(from_addr, to_addr, subject, content):
+    msg = EmailMessage(policy=MESSAGE_POLICY)
+    msg["From"] = from_addr
+    msg["To"] = to_addr
+    msg["Subject"] = subject
+    msg.set_content(content)
+    return msg
+
+
+def _quote_data(data):
+    """统一为 CRLF 换行，行首的点加倍，并加上结束标记"""
+    data = re.sub(rb'\r\n|\r|\n', b'\r\n', data)
+    data = re.sub(rb'(?m)^\.', b'..', data)
+    if not data.endswith(b'\r\n'):
+        data += b'\r\n'
+    return data + b'.\r\n'
+
+
+def send_pipelined(conn, from_addr, to_addrs, data, reset=False):
+    """在已登录的会话上发送一封邮件
+
+    服务器支持 PIPELINING 时，RSET、MAIL、RCPT、DATA 一次写出，只等一次往返；
+    否则退回逐条命令。失败时抛出与 smtplib.sendmail 相同的异常。
+    地址含非 ASCII 字符时需要服务器支持 SMTPUTF8，不支持则抛出 SMTPNotSupportedError。
+    """
+    smtputf8 = not all(addr.isascii() for addr in (from_addr, *to_addrs))
+    if smtputf8 and not conn.has_extn("smtputf8"):
+        raise smtplib.SMTPNotSupportedError("邮件地址含非 ASCII 字符，服务器不支持 SMTPUTF8")
+    if not conn.has_extn("pipelining"):
+        if reset:
+            conn.rset()
+        conn.sendmail(from_addr, to_addrs, data, mail_options=["SMTPUTF8"] if smtputf8 else [])
+        return
+
+    commands = ["RSET"] if reset else []
+    commands.append(f"MAIL FROM:<{from_addr}>" + (" SMTPUTF8" if smtputf8 else ""))
+    commands.extend(f"RCPT TO:<{addr}>" for addr in to_addrs)
+    commands.append("DATA")
+    conn.send("".join(command + "\r\n" for command in commands).encode("utf-8" if smtputf8 else "ascii"))
+    replies = [conn.getreply() for _ in commands]
+    if reset:
+        replies.pop(0)
+    mail_reply, rcpt_replies, data_reply = replies[0], replies[1:-1], replies[-1]
+    refused = {addr: reply for addr, reply in zip(to_addrs, rcpt_replies) if reply[0] not in (250, 251)}
+    envelope_ok = mail_reply[0] == 250 and len(refused) < len(to_addrs)
+
+    if data_reply[0] == 354:
+        if not envelope_ok:
+            # 信封已被拒绝但服务器仍进入 DATA，立即结束事务
+            conn.send(b".\r\n")
+            conn.getreply()
+        else:
+            conn.send(_quote_data(data))
+            code, resp = conn.getreply()
+            if code != 250:
+                raise smtplib.SMTPDataError(code, resp)
+            if refused:
+                raise smtplib.SMTPRecipientsRefused(refused)
+            return
+    if mail_reply[0] != 250:
+        raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+    if refused:
+        raise smtplib.SMTPRecipientsRefused(refused)
+    raise smtplib.SMTPDataError(*data_reply)
+
+
+class SendJob:
+    """一批待发送的邮件及其逐封投递状态"""
+
+    def __init__(self, messages, on_progress=None):
+        self.results = [{
+            "to": message["to"],
+            "subject": message["subject"],
+            "status": "pending",      # pending / sent / failed
+            "message": "",
+            "attempts": 0,
+        } for message in messages]
+        self.on_progress = on_progress
+        self._remaining = len(messages)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not messages:
+            self._done.set()
+
+    def _finish(self, index, status, message=""):
+        with self._lock:
+            result = self.results[index]
+            if result["status"] != "pending":
+                return
+            result["status"] = status
+            result["message"] = message
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._done.set()
+        if self.on_progress is not None:
+            try:
+                self.on_progress(dict(result))
+            except Exception:
+                pass
+
+    def fail_all(self, message):
+        """把尚未完成的邮件全部标记为失败（如邮箱类型未知、发信队列已关闭）"""
+        for index in range(len(self.results)):
+            self._finish(index, "failed", message)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def report(self):
+        """投递状态汇总：{"success", "message", "results": [逐封状态]}"""
+        with self._lock:
+            results = [dict(result) for result in self.results]
+        sent = sum(result["status"] == "sent" for result in results)
+        failed = sum(result["status"] == "failed" for result in results)
+        pending = len(results) - sent - failed
+        message = f"发送成功 {sent} 封，失败 {failed} 封" + (f"，等待中 {pending} 封" if pending else "")
+        return {"success": sent == len(results), "message": message, "results": results}
+
+
+class _AccountOutbox:
+    """一个发件账号的队列、限速器和复用中的 SMTP 会话"""
+
+    def __init__(self, host, port, user, password, label=None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.label = label or host       # 统计中使用的服务商名
+        limits = SMTP_SEND_RATES.get(host, SMTP_SEND_RATE)
+        self.limiter = RateLimiter(limits["rate"], limits.get("burst", 1))
+        self.queue = deque()     # (SendJob, 序号, 邮件字节)
+        self.conn = None
+        self.session_sent = 0
+        self.last_used = 0.0
+        self.thread = None
+
+
+class SMTPOutbox:
+    """发信队列：每个账号一个后台线程，复用一条已登录的 SMTP 会话
+
+    邮件之间用 RSET 重置事务（支持 PIPELINING 时与信封命令一起发出），
+    连接断开时重连并重发当前邮件一次，按账号限速；空闲一段时间后退出登录。
+    """
+
+    def __init__(self, idle_timeout=SMTP_IDLE_TIMEOUT, max_per_session=SMTP_MAX_PER_SESSION):
+        self.idle_timeout = idle_timeout
+        self.max_per_session = max_per_session
+        self._cond = threading.Condition()
+        self._accounts = {}      # key -> _AccountOutbox
+        self._closed = False
+
+    @staticmethod
+    def _make_key(host, port, user, password):
+        # 密码参与 key，修改授权码后不会误用旧会话
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return (host, int(port), user, digest)
+
+    def send(self, host, port, user, password, messages, on_progress=None, label=None):
+        """把 [{to, subject, content}] 加入发信队列，返回 SendJob
+
+        on_progress(逐封状态) 在后台线程中调用，label 为统计中使用的服务商名。
+        """
+        job = SendJob(messages, on_progress)
+        payloads = [build_message(user, message["to"], message["subject"], message["content"]).as_bytes()
+                    for message in messages]
+        key = self._make_key(host, port, user, password)
+        with self._cond:
+            if self._closed:
+                job.fail_all("发信队列已关闭")
+                return job
+            outbox = self._accounts.get(key)
+            if outbox is None:
+                outbox = self._accounts[key] = _AccountOutbox(host, int(port), user, password, label)
+            outbox.queue.extend((job, index, payload) for index, payload in enumerate(payloads))
+            if outbox.thread is None:
+                outbox.thread = threading.Thread(target=self._worker, args=(key, outbox),
+                                                 name="smtp-outbox", daemon=True)
+                outbox.thread.start()
+            self._cond.notify_all()
+        return job
+
+    def close_all(self):
+        """停止所有发信线程，未发送的邮件标记为失败"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            threads = [outbox.thread for outbox in self._accounts.values() if outbox.thread is not None]
+        for thread in threads:
+            thread.join(SMTP_CONNECT_TIMEOUT)
+
+    # 以下方法在账号的发信线程中执行
+    def _worker(self, key, outbox):
+        current = None
+        try:
+            while True:
+                with self._cond:
+                    while not outbox.queue and not self._closed:
+                        if not self._cond.wait(self.idle_timeout) and not outbox.queue:
+                            # 空闲超时：退出登录并结束线程，下次发信时重新启动
+                            del self._accounts[key]
+                            return
+                    if self._closed:
+                        return
+                    job, index, payload = current = outbox.queue.popleft()
+                outbox.limiter.acquire()
+                with METRICS.span(outbox.label, "deliver") as span:
+                    error = self._deliver(outbox, job, index, payload)
+                    if job.results[index]["status"] != "sent":
+                        span.fail()
+                if error:
+                    # 登录失败时队列中其余邮件也无法发送，不再逐封重试登录
+                    with self._cond:
+                        failed = list(outbox.queue)
+                        outbox.queue.clear()
+                    for job, index, _ in failed:
+                        job._finish(index, "failed", error)
+        finally:
+            # 线程因任何原因结束时，不能留下永远等待中的邮件，也不能让后续发信排进没有线程的队列
+            with self._cond:
+                pending = list(outbox.queue)
+                outbox.queue.clear()
+                if self._accounts.get(key) is outbox:
+                    del self._accounts[key]
+            self._quit(outbox)
+            reason = "发信队列已关闭" if self._closed else "发信线程异常退出"
+            if current is not None:
+                pending.insert(0, current)     # 已完成的邮件 _finish 会忽略
+            for job, index, _ in pending:
+                job._finish(index, "failed", reason)
+
+    def _deliver(self, outbox, job, index, payload):
+        """发送队列中的一封邮件，登录失败时返回错误信息"""
+        to_addr = job.results[index]["to"]
+        for attempt in (0, 1):
+            job.results[index]["attempts"] += 1
+            try:
+                reset = self._ensure_session(outbox)
+                with METRICS.phase("smtp_send"):
+                    send_pipelined(outbox.conn, outbox.user, [to_addr], payload, reset=reset)
+                METRICS.add_bytes(len(payload), "out")
+            except smtplib.SMTPAuthenticationError as e:
+                self._quit(outbox)
+                error = f"登录失败：{e}"
+                job._finish(index, "failed", error)
+                return error
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                    smtplib.SMTPNotSupportedError) as e:
+                # 单封被拒（收件人无效、内容被拦截、地址需要 SMTPUTF8 等），会话可以继续使用
+                outbox.last_used = time.monotonic()
+                job._finish(index, "failed", str(e))
+                return
+            except OSError as e:
+                # 连接中断（含会话被服务器超时关闭）、其他协议错误：重连后重发一次
+                # （SMTPException 也是 OSError 的子类）
+                self._quit(outbox)
+                if attempt:
+                    job._finish(index, "failed", f"发送失败：{e}")
+                    return
+                continue
+            except Exception as e:
+                # 意外错误：会话状态未知，断开后只让这一封失败，不影响队列中的其他邮件
+                self._quit(outbox)
+                job._finish(index, "failed", f"发送失败：{e}")
+                return
+            outbox.session_sent += 1
+            outbox.last_used = time.monotonic()
+            job._finish(index, "sent")
+            return
+
+    def _ensure_session(self, outbox):
+        """确保有可用的已登录会话，返回发信前是否需要 RSET"""
+        if outbox.conn is not None:
+            if outbox.session_sent >= self.max_per_session:
+                self._quit(outbox)
+            elif time.monotonic() - outbox.last_used >= SMTP_KEEPALIVE_INTERVAL and not self._noop(outbox.conn):
+                self._quit(outbox)
+        if outbox.conn is not None:
+            return True
+        # smtplib 不单独暴露 DNS / TCP / TLS，connect 为三者加上服务器问候
+        with METRICS.phase("smtp_connect"):
+            conn = smtplib.SMTP_SSL(outbox.host, outbox.port, timeout=SMTP_CONNECT_TIMEOUT)
+        try:
+            with METRICS.phase("smtp_login"):
+                conn.login(outbox.user, outbox.password)
+        except BaseException:
+            self._close(conn)
+            raise
+        outbox.conn = conn
+        outbox.session_sent = 0
+        outbox.last_used = time.monotonic()
+        return False
+
+    @staticmethod
+    def _noop(conn):
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _quit(self, outbox):
+        if outbox.conn is not None:
+            self._close(outbox.conn)
+            outbox.conn = None
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+
+SMTP_OUTBOX = SMTPOutbox()
@@ -0,0 +1,210 @@
+import imaplib
+import hashlib
+import threading
+import time
+
+from metrics import METRICS
+
+# 连接池配置
+IMAP_CONNECT_TIMEOUT = 30
+POOL_MAX_PER_ACCOUNT = 2
+POOL_IDLE_TIMEOUT = 600
+POOL_KEEPALIVE_INTERVAL = 60
+POOL_ACQUIRE_TIMEOUT = 30
+
+
+class _PooledConnection:
+    """池中的一条已登录、已选中邮箱的 IMAP 会话"""
+    __slots__ = ("conn", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+
+class IMAPConnectionPool:
+    """按 服务器/账号/邮箱夹 复用 IMAP 会话的连接池"""
+
+    def __init__(self, max_per_account=POOL_MAX_PER_ACCOUNT, idle_timeout=POOL_IDLE_TIMEOUT,
+                 keepalive_interval=POOL_KEEPALIVE_INTERVAL):
+        self.max_per_account = max_per_account
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._cond = threading.Condition()
+        self._idle = {}      # key -> [_PooledConnection]
+        self._busy = {}      # key -> 已借出数量
+        self._reaper = None
+        self._closed = False
+
+    @staticmethod
+    def _make_key(host, port, user, password, mailbox):
+        # 密码参与 key，修改授权码后不会误用旧会话
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return (host, int(port), user, digest, mailbox)
+
+    def run(self, host, port, user, password, func, mailbox="INBOX"):
+        """借出一条会话执行 func(conn)，连接被服务器中断时自动重连重试一次"""
+        for attempt in (0, 1):
+            conn = self._acquire(host, port, user, password, mailbox)
+            try:
+                result = func(conn)
+            except (imaplib.IMAP4.abort, OSError):
+                self._discard(host, port, user, password, mailbox, conn)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                # 命令级错误（NO/BAD、解析失败）不影响会话本身，归还复用
+                self._release(host, port, user, password, mailbox, conn)
+                raise
+            except BaseException:
+                self._discard(host, port, user, password, mailbox, conn)
+                raise
+            self._release(host, port, user, password, mailbox, conn)
+            return result
+
+    def _acquire(self, host, port, user, password, mailbox):
+        key = self._make_key(host, port, user, password, mailbox)
+        deadline = time.monotonic() + POOL_ACQUIRE_TIMEOUT
+        with self._cond:
+            self._ensure_reaper()
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    pooled = idle.pop()
+                    self._busy[key] = self._busy.get(key, 0) + 1
+                    break
+                if self._busy.get(key, 0) < self.max_per_account:
+                    self._busy[key] = self._busy.get(key, 0) + 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("连接池已满，等待可用 IMAP 连接超时")
+                self._cond.wait(remaining)
+
+        try:
+            if pooled is not None:
+                # 空闲较久的会话先 NOOP 探活，失效则重建
+                if time.monotonic() - pooled.last_used < self.keepalive_interval or self._noop(pooled.conn):
+                    return pooled.conn
+                self._logout(pooled.conn)
+            return self._connect(host, port, user, password, mailbox)
+        except BaseException:
+            with self._cond:
+                self._busy[key] -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, host, port, user, password, mailbox, conn):
+        key = self._make_key(host, port, user, password, mailbox)
+        with self._cond:
+            self._busy[key] -= 1
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.setdefault(key, []).append(_PooledConnection(conn))
+            self._cond.notify()
+        if closed:
+            self._logout(conn)
+
+    def _discard(self, host, port, user, password, mailbox, conn):
+        key = self._make_key(host, port, user, password, mailbox)
+        with self._cond:
+            self._busy[key] -= 1
+            self._cond.notify()
+        self._logout(conn)
+
+    @staticmethod
+    def _connect(host, port, user, password, mailbox):
+        # imaplib 不单独暴露 DNS / TCP / TLS，connect 为三者加上服务器问候
+        with METRICS.phase("imap_connect", host):
+            conn = imaplib.IMAP4_SSL(host, port, timeout=IMAP_CONNECT_TIMEOUT)
+        try:
+            with METRICS.phase("imap_login", host):
+                conn.login(user, password)
+            with METRICS.phase("imap_select", host):
+                status, data = conn.select(mailbox)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"选择邮箱夹失败：{data}")
+        except BaseException:
+            IMAPConnectionPool._logout(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _noop(conn):
+        try:
+            status, _ = conn.noop()
+            return status == 'OK'
+        except Exception:
+            return False
+
+    @staticmethod
+    def _logout(conn):
+        try:
+            conn.logout()
+        except Exception:
+            pass
+
+    def _ensure_reaper(self):
+        """按需启动后台保活线程（调用方持有锁）"""
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop, name="imap-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.keepalive_interval)
+            if self._closed:
+                return
+            self.reap()
+
+    def reap(self):
+        """回收超时空闲会话，并对其余空闲会话发送 NOOP 保活"""
+        now = time.monotonic()
+        expired, to_ping = [], []
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for pooled in idle:
+                    age = now - pooled.last_used
+                    if age >= self.idle_timeout:
+                        expired.append(pooled.conn)
+                    elif age >= self.keepalive_interval:
+                        to_ping.append((key, pooled))
+                        self._busy[key] = self._busy.get(key, 0) + 1
+                    else:
+                        keep.append(pooled)
+                idle[:] = keep
+
+        for conn in expired:
+            self._logout(conn)
+
+        for key, pooled in to_ping:
+            alive = self._noop(pooled.conn)
+            with self._cond:
+                self._busy[key] -= 1
+                if alive and not self._closed:
+                    # 保活不刷新 last_used，长期无人使用的会话仍会按时回收
+                    self._idle.setdefault(key, []).append(pooled)
+                    alive_kept = True
+                else:
+                    alive_kept = False
+                self._cond.notify()
+            if not alive_kept:
+                self._logout(pooled.conn)
+
+    def close_all(self):
+        """登出并清空所有空闲会话"""
+        with self._cond:
+            self._closed = True
+            conns = [pooled.conn for idle in self._idle.values() for pooled in idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in conns:
+            self._logout(conn)
+
+
+IMAP_POOL = IMAPConnectionPool()
@@ -0,0 +1,543 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# 全局配置
+MAIL_STORE_PATH = "mail_store.db"
+# 旧版 JSON 数据文件，首次启动时一次性导入
+LEGACY_EMAIL_LIST_PATH = "email_list.json"
+LEGACY_MAIL_ACCOUNTS_PATH = "mail_accounts.json"
+LEGACY_MAIL_CACHE_PATH = "mail_cache.json"
+
+# accounts 表中单独建列的字段，其余字段存入 extra
+ACCOUNT_COLUMNS = ("email", "type", "password", "token", "sid_token", "used", "created_at")
+
+# created_at 为注册时间，旧版数据没有记录，为 NULL
+ACCOUNTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    password TEXT NOT NULL DEFAULT '',
+    token TEXT,
+    sid_token TEXT,
+    used INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_type_used ON accounts (type, used);
+CREATE INDEX IF NOT EXISTS idx_accounts_used ON accounts (used);
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+""" + ACCOUNTS_SCHEMA + """
+CREATE TABLE IF NOT EXISTS mail_accounts (
+    mail_type TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mailbox_state (
+    account_key TEXT PRIMARY KEY,
+    uidvalidity INTEGER,
+    highest_uid INTEGER NOT NULL DEFAULT 0,
+    highest_modseq INTEGER
+);
+CREATE TABLE IF NOT EXISTS mail_headers (
+    account_key TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    date TEXT,
+    flags TEXT,
+    size INTEGER,
+    fetched INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_key, uid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS provider_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS temp_messages (
+    account TEXT NOT NULL,
+    msg_id TEXT NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    date TEXT,
+    body TEXT,
+    ordinal INTEGER NOT NULL,
+    PRIMARY KEY (account, msg_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_temp_messages_order ON temp_messages (account, ordinal);
+"""
+
+
+def _account_from_row(row):
+    account = json.loads(row["extra"]) if row["extra"] else {}
+    account.update({
+        "email": row["email"],
+        "type": row["type"],
+        "password": row["password"],
+        "used": bool(row["used"]),
+        "created_at": row["created_at"],
+    })
+    if row["token"] is not None:
+        account["token"] = row["token"]
+    if row["sid_token"] is not None:
+        account["sid_token"] = row["sid_token"]
+    return account
+
+
+def _account_params(account):
+    extra = {k: v for k, v in account.items() if k not in ACCOUNT_COLUMNS}
+    return {
+        "email": account["email"],
+        "type": account.get("type", ""),
+        "password": account.get("password") or "",
+        "token": account.get("token"),
+        "sid_token": account.get("sid_token"),
+        "used": 1 if account.get("used") else 0,
+        "extra": json.dumps(extra, ensure_ascii=False) if extra else None,
+        "created_at": account.get("created_at"),
+    }
+
+
+class MailStore:
+    """SQLite（WAL）存储：注册邮箱、收发账号、收件箱同步状态与邮件摘要"""
+
+    def __init__(self, path=MAIL_STORE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate_created_at()
+
+    def _migrate_created_at(self):
+        """旧库的 accounts.created_at 为 NOT NULL，旧数据导入时填的是导入时间而不是注册时间
+
+        SQLite 不能直接去掉 NOT NULL，重建 accounts 表，并把导入的账号的 created_at 清空。
+        """
+        columns = {row["name"]: row for row in self._conn.execute("PRAGMA table_info(accounts)")}
+        if not columns["created_at"]["notnull"]:
+            return
+        with self._transaction() as conn:
+            conn.execute("ALTER TABLE accounts RENAME TO accounts_old")
+            conn.execute("DROP INDEX IF EXISTS idx_accounts_type_used")
+            conn.execute("DROP INDEX IF EXISTS idx_accounts_used")
+            for statement in ACCOUNTS_SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute("INSERT INTO accounts SELECT * FROM accounts_old")
+            conn.execute("DROP TABLE accounts_old")
+            imported = conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+            if imported:
+                # 导入在首次启动时完成，不晚于导入完成时间的账号都来自旧数据
+                conn.execute("UPDATE accounts SET created_at = NULL WHERE created_at <= ?", (float(imported["value"]),))
+
+    def _transaction(self):
+        return _Transaction(self)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # 注册邮箱
+    def list_accounts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM accounts ORDER BY id").fetchall()
+        return [_account_from_row(row) for row in rows]
+
+    def get_account(self, email):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM accounts WHERE email = ?", (email,)).fetchone()
+        return _account_from_row(row) if row else None
+
+    def find_accounts(self, email_type=None, used=None):
+        """按类型 / 使用状态走索引查询"""
+        clauses, params = [], []
+        if email_type is not None:
+            clauses.append("type = ?")
+            params.append(email_type)
+        if used is not None:
+            clauses.append("used = ?")
+            params.append(1 if used else 0)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM accounts{where} ORDER BY id", params).fetchall()
+        return [_account_from_row(row) for row in rows]
+
+    def add_accounts(self, accounts):
+        """批量写入（同一事务），已存在的邮箱按新数据覆盖"""
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO accounts (email, type, password, token, sid_token, used, extra, created_at) "
+                "VALUES (:email, :type, :password, :token, :sid_token, :used, :extra, :created_at) "
+                "ON CONFLICT(email) DO UPDATE SET type = excluded.type, password = excluded.password, "
+                "token = excluded.token, sid_token = excluded.sid_token, used = excluded.used, "
+                "extra = excluded.extra",
+                [_account_params(account) for account in accounts],
+            )
+
+    def add_account(self, account):
+        self.add_accounts([account])
+
+    def update_account(self, email, **fields):
+        """单行更新指定字段"""
+        columns = {k: v for k, v in fields.items() if k in ACCOUNT_COLUMNS and k != "email"}
+        extra_fields = {k: v for k, v in fields.items() if k not in ACCOUNT_COLUMNS}
+        if "used" in columns:
+            columns["used"] = 1 if columns["used"] else 0
+        with self._transaction() as conn:
+            if columns:
+                assignments = ", ".join(f"{k} = ?" for k in columns)
+                conn.execute(f"UPDATE accounts SET {assignments} WHERE email = ?", (*columns.values(), email))
+            if extra_fields:
+                row = conn.execute("SELECT extra FROM accounts WHERE email = ?", (email,)).fetchone()
+                if row is not None:
+                    extra = json.loads(row["extra"]) if row["extra"] else {}
+                    extra.update(extra_fields)
+                    conn.execute("UPDATE accounts SET extra = ? WHERE email = ?",
+                                 (json.dumps(extra, ensure_ascii=False), email))
+
+    def delete_account(self, email):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM accounts WHERE email = ?", (email,))
+            conn.execute("DELETE FROM temp_messages WHERE account = ?", (email,))
+            conn.execute("DELETE FROM provider_cache WHERE key = ?", (_cursor_key(email),))
+
+    # 收发账号（QQ/163 授权码）
+    def get_mail_accounts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM mail_accounts").fetchall()
+        return {row["mail_type"]: {"email": row["email"], "password": row["password"]} for row in rows}
+
+    def save_mail_account(self, mail_type, email, password):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO mail_accounts (mail_type, email, password) VALUES (?, ?, ?) "
+                "ON CONFLICT(mail_type) DO UPDATE SET email = excluded.email, password = excluded.password",
+                (mail_type, email, password),
+            )
+
+    # 服务商数据缓存（域名列表等）
+    def get_provider_cache(self, key):
+        """返回 (value, updated_at)，不存在时返回 (None, 0)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, updated_at FROM provider_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row["value"]), row["updated_at"]
+
+    def set_provider_cache(self, key, value, updated_at=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO provider_cache (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), updated_at or time.time()),
+            )
+
+    # 临时邮箱的增量列表游标与邮件缓存（按邮箱地址区分）
+    def get_temp_cursor(self, account):
+        cursor, _ = self.get_provider_cache(_cursor_key(account))
+        return cursor or {}
+
+    def add_temp_messages(self, account, messages, cursor):
+        """保存新邮件摘要（从新到旧）并更新游标，二者在同一事务中写入"""
+        with self._transaction() as conn:
+            if messages:
+                ordinal = conn.execute(
+                    "SELECT COALESCE(MAX(ordinal), 0) FROM temp_messages WHERE account = ?", (account,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT OR IGNORE INTO temp_messages (account, msg_id, subject, sender, date, ordinal) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(account, str(m["id"]), m.get("subject"), m.get("from"), m.get("date"), ordinal + len(messages) - i)
+                     for i, m in enumerate(messages)],
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO provider_cache (key, value, updated_at) VALUES (?, ?, ?)",
+                (_cursor_key(account), json.dumps(cursor, ensure_ascii=False), time.time()),
+            )
+
+    def list_temp_messages(self, account, limit):
+        """按到达顺序从新到旧返回缓存的邮件摘要"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT msg_id, subject, sender, date FROM temp_messages WHERE account = ? "
+                "ORDER BY ordinal DESC LIMIT ?", (account, limit),
+            ).fetchall()
+        return [{"id": row["msg_id"], "subject": row["subject"] or "", "from": row["sender"] or "",
+                 "date": row["date"] or ""} for row in rows]
+
+    def get_temp_body(self, account, msg_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM temp_messages WHERE account = ? AND msg_id = ?", (account, str(msg_id))
+            ).fetchone()
+        return row["body"] if row is not None else None
+
+    def set_temp_body(self, account, msg_id, body):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO temp_messages (account, msg_id, body, ordinal) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT(account, msg_id) DO UPDATE SET body = excluded.body",
+                (account, str(msg_id), body),
+            )
+
+    # 旧数据导入
+    def import_legacy_json(self, email_list_path=LEGACY_EMAIL_LIST_PATH,
+                           mail_accounts_path=LEGACY_MAIL_ACCOUNTS_PATH,
+                           mail_cache_path=LEGACY_MAIL_CACHE_PATH):
+        """一次性导入旧版 JSON 文件，已导入过则直接返回"""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return False
+
+        email_list = _read_json(email_list_path, [])
+        mail_accounts = _read_json(mail_accounts_path, {})
+        mail_cache = _read_json(mail_cache_path, {})
+
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO accounts (email, type, password, token, sid_token, used, extra, created_at) "
+                "VALUES (:email, :type, :password, :token, :sid_token, :used, :extra, :created_at)",
+                [_account_params(item) for item in email_list if item.get("email")],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO mail_accounts (mail_type, email, password) VALUES (?, ?, ?)",
+                [(mail_type, info.get("email", ""), info.get("password", ""))
+                 for mail_type, info in mail_accounts.items()],
+            )
+            for account_key, entry in mail_cache.items():
+                conn.execute(
+                    "INSERT OR IGNORE INTO mailbox_state (account_key, uidvalidity, highest_uid, highest_modseq) "
+                    "VALUES (?, ?, ?, ?)",
+                    (account_key, entry.get("uidvalidity"), entry.get("highest_uid", 0), entry.get("highest_modseq")),
+                )
+                headers = entry.get("headers", {})
+                conn.executemany(
+                    "INSERT OR IGNORE INTO mail_headers (account_key, uid, subject, sender, date, flags, size, fetched) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [_header_params(account_key, int(uid), headers.get(str(uid))) for uid in entry.get("uids", [])],
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(time.time()),))
+        return True
+
+    # 收件箱同步缓存（供 mail_sync 使用）
+    def get_mailbox_state(self, account_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM mailbox_state WHERE account_key = ?", (account_key,)
+            ).fetchone()
+        if row is None:
+            return {"uidvalidity": None, "highest_uid": 0, "highest_modseq": None}
+        return {"uidvalidity": row["uidvalidity"], "highest_uid": row["highest_uid"],
+                "highest_modseq": row["highest_modseq"]}
+
+    def set_mailbox_state(self, account_key, **fields):
+        state = self.get_mailbox_state(account_key)
+        state.update(fields)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO mailbox_state (account_key, uidvalidity, highest_uid, highest_modseq) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(account_key) DO UPDATE SET uidvalidity = excluded.uidvalidity, "
+                "highest_uid = excluded.highest_uid, highest_modseq = excluded.highest_modseq",
+                (account_key, state["uidvalidity"], state["highest_uid"], state["highest_modseq"]),
+            )
+
+    def reset_mailbox(self, account_key, uidvalidity):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM mail_headers WHERE account_key = ?", (account_key,))
+            conn.execute("DELETE FROM mailbox_state WHERE account_key = ?", (account_key,))
+            conn.execute(
+                "INSERT INTO mailbox_state (account_key, uidvalidity, highest_uid) VALUES (?, ?, 0)",
+                (account_key, uidvalidity),
+            )
+
+    def add_uids(self, account_key, uids):
+        if not uids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO mail_headers (account_key, uid) VALUES (?, ?)",
+                [(account_key, uid) for uid in uids],
+            )
+            _bump_highest_uid(conn, account_key, max(uids))
+
+    def replace_uids(self, account_key, uids):
+        """全量校正 UID 列表，删除服务器上已不存在的邮件"""
+        alive = set(uids)
+        with self._transaction() as conn:
+            known = {row[0] for row in conn.execute(
+                "SELECT uid FROM mail_headers WHERE account_key = ?", (account_key,))}
+            conn.executemany(
+                "DELETE FROM mail_headers WHERE account_key = ? AND uid = ?",
+                [(account_key, uid) for uid in known - alive],
+            )
+            conn.executemany(
+                "INSERT INTO mail_headers (account_key, uid) VALUES (?, ?)",
+                [(account_key, uid) for uid in alive - known],
+            )
+            if alive:
+                _bump_highest_uid(conn, account_key, max(alive))
+
+    def count_uids(self, account_key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM mail_headers WHERE account_key = ?", (account_key,)
+            ).fetchone()[0]
+
+    def page_uids(self, account_key, offset, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uid FROM mail_headers WHERE account_key = ? ORDER BY uid DESC LIMIT ? OFFSET ?",
+                (account_key, limit, offset),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_headers(self, account_key, uids):
+        if not uids:
+            return {}
+        placeholders = ",".join("?" * len(uids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM mail_headers WHERE account_key = ? AND fetched = 1 AND uid IN ({placeholders})",
+                (account_key, *uids),
+            ).fetchall()
+        return {row["uid"]: _header_from_row(row) for row in rows}
+
+    def put_headers(self, account_key, summaries):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO mail_headers (account_key, uid, subject, sender, date, flags, size, fetched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [_header_params(account_key, uid, summary) for uid, summary in summaries.items()],
+            )
+
+    def update_flags(self, account_key, flags_by_uid):
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE mail_headers SET flags = ? WHERE account_key = ? AND uid = ? AND fetched = 1",
+                [(" ".join(flags), account_key, uid) for uid, flags in flags_by_uid.items()],
+            )
+
+
+class _Transaction:
+    """持锁执行 BEGIN IMMEDIATE ... COMMIT，异常时回滚"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store._lock.acquire()
+        self.store._conn.execute("BEGIN IMMEDIATE")
+        return self.store._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.store._lock.release()
+        return False
+
+
+class StoreHeaderCache:
+    """MailSyncEngine 的缓存接口在 MailStore 上的实现"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get_state(self, key):
+        return self.store.get_mailbox_state(key)
+
+    def set_state(self, key, **fields):
+        self.store.set_mailbox_state(key, **fields)
+
+    def reset(self, key, uidvalidity):
+        self.store.reset_mailbox(key, uidvalidity)
+
+    def add_uids(self, key, uids):
+        self.store.add_uids(key, uids)
+
+    def replace_uids(self, key, uids):
+        self.store.replace_uids(key, uids)
+
+    def count(self, key):
+        return self.store.count_uids(key)
+
+    def page_uids(self, key, offset, limit):
+        return self.store.page_uids(key, offset, limit)
+
+    def get_headers(self, key, uids):
+        return self.store.get_headers(key, uids)
+
+    def put_headers(self, key, summaries):
+        self.store.put_headers(key, summaries)
+
+    def update_flags(self, key, flags_by_uid):
+        self.store.update_flags(key, flags_by_uid)
+
+
+def _bump_highest_uid(conn, account_key, uid):
+    conn.execute(
+        "INSERT INTO mailbox_state (account_key, highest_uid) VALUES (?, ?) "
+        "ON CONFLICT(account_key) DO UPDATE SET highest_uid = MAX(highest_uid, excluded.highest_uid)",
+        (account_key, uid),
+    )
+
+
+def _header_params(account_key, uid, summary):
+    if not summary:
+        return (account_key, uid, None, None, None, None, None, 0)
+    return (account_key, uid, summary.get("subject", ""), summary.get("from", ""), summary.get("date", ""),
+            " ".join(summary.get("flags", [])), summary.get("size"), 1)
+
+
+def _header_from_row(row):
+    flags = row["flags"].split() if row["flags"] else []
+    return {
+        "id": str(row["uid"]),
+        "uid": row["uid"],
+        "subject": row["subject"] or "",
+        "from": row["sender"] or "",
+        "date": row["date"] or "",
+        "flags": flags,
+        "seen": "\\Seen" in flags,
+        "size": row["size"],
+    }
+
+
+def _cursor_key(account):
+    return f"cursor:{account}"
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """进程内共享的存储实例，首次使用时打开数据库并导入旧 JSON 数据"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MailStore()
+            _store.import_legacy_json()
+        return _store
@@ -0,0 +1,536 @@
+import re
+import sys
+import codecs
+import imaplib
+import binascii
+import threading
+from collections import OrderedDict
+from email import message_from_bytes
+from email.header import decode_header
+
+from mail_pool import IMAP_POOL
+from metrics import METRICS
+from mail_store import get_store, StoreHeaderCache
+
+# 邮件列表只取展示所需的头字段，整页一次 FETCH
+MAIL_LIST_FETCH_ITEMS = '(UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)])'
+# 只取正文及解析 MIME 所需的头字段，不下载整封 RFC822，也不会把邮件标记为已读
+TEXT_FETCH_ITEMS = '(BODY.PEEK[HEADER.FIELDS (MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING)] BODY.PEEK[TEXT])'
+# 正文最多下载的字节数（按传输编码后的大小计），超出部分截断
+BODY_MAX_BYTES = 256 * 1024
+# 正文分段下载时每次 FETCH 的字节数
+BODY_FETCH_CHUNK = 64 * 1024
+# 内存中正文缓存的总大小上限（字节）
+BODY_CACHE_BYTES = 16 * 1024 * 1024
+# 每页预读正文的邮件数（从页首开始）
+PREFETCH_BODIES = 3
+
+_SEXP_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}|([^\s()"]+))')
+
+
+def decode_header_value(value):
+    """解码 RFC 2047 编码的头字段"""
+    if not value:
+        return ""
+    parts = []
+    for text, encoding in decode_header(value):
+        if isinstance(text, bytes):
+            text = text.decode(encoding or "utf-8", errors="ignore")
+        parts.append(text)
+    return "".join(parts)
+
+
+def parse_header_fetch(msg_data):
+    """解析批量 FETCH 的多段响应，返回 {UID: 邮件摘要}"""
+    summaries = {}
+    current = None
+    for item in msg_data:
+        if isinstance(item, tuple):
+            meta, literal = item
+            if not re.match(rb'\d+ \(', meta):
+                continue
+            msg = message_from_bytes(literal)
+            current = {
+                "subject": decode_header_value(msg.get("Subject")),
+                "from": decode_header_value(msg.get("From")),
+                "date": msg.get("Date", ""),
+            }
+        elif isinstance(item, bytes) and current is not None:
+            # UID/FLAGS 等也可能出现在字面量之后
+            meta = item
+        else:
+            continue
+        uid = re.search(rb'UID (\d+)', meta)
+        if uid:
+            current["uid"] = int(uid.group(1))
+            current["id"] = uid.group(1).decode()
+            summaries[current["uid"]] = current
+        flags = re.search(rb'FLAGS \(([^)]*)\)', meta)
+        if flags:
+            current["flags"] = flags.group(1).decode().split()
+            current["seen"] = "\\Seen" in current["flags"]
+        size = re.search(rb'RFC822\.SIZE (\d+)', meta)
+        if size:
+            current["size"] = int(size.group(1))
+    return summaries
+
+
+def fetch_text_message(mail, uid):
+    """按 UID 取单封邮件的正文部分，邮件不存在时返回 None"""
+    status, msg_data = mail.uid('FETCH', str(uid), TEXT_FETCH_ITEMS)
+    if status != 'OK':
+        return None
+    header = text = None
+    for item in msg_data:
+        if isinstance(item, tuple):
+            if b'HEADER' in item[0].upper():
+                header = item[1]
+            else:
+                text = item[1]
+    if text is None:
+        return None
+    return message_from_bytes((header or b'') + text)
+
+
+def message_text(msg):
+    """取邮件正文：优先 text/plain，没有时退回 text/html"""
+    parts = list(msg.walk()) if msg.is_multipart() else [msg]
+    for content_type in ("text/plain", "text/html"):
+        for part in parts:
+            if part.get_content_type() == content_type:
+                payload = part.get_payload(decode=True) or b''
+                return payload.decode(part.get_content_charset() or 'utf-8', errors='ignore')
+    return ""
+
+
+def _parse_sexp(data):
+    """把 FETCH 响应（可能夹带字面量）解析为嵌套列表，NIL 为 None，其余为 bytes"""
+    text, literals = b'', []
+    for item in data:
+        if isinstance(item, tuple):
+            text += item[0]
+            literals.append(item[1])
+        elif isinstance(item, bytes):
+            text += item
+    literals.reverse()
+    root = []
+    stack = [root]
+    pos = 0
+    while True:
+        match = _SEXP_TOKEN_RE.match(text, pos)
+        if not match:
+            return root
+        pos = match.end()
+        opening, closing, quoted, literal, atom = match.groups()
+        if opening:
+            node = []
+            stack[-1].append(node)
+            stack.append(node)
+        elif closing:
+            if len(stack) > 1:
+                stack.pop()
+        elif quoted is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted))
+        elif literal:
+            stack[-1].append(literals.pop() if literals else b'')
+        else:
+            stack[-1].append(None if atom.upper() == b'NIL' else atom)
+
+
+def _find_item(items, name):
+    """在 FETCH 响应的 名称 值 序列中查找指定数据项的值"""
+    for i, item in enumerate(items):
+        if isinstance(item, list):
+            found = _find_item(item, name)
+            if found is not None:
+                return found
+        elif isinstance(item, bytes) and item.upper() == name and i + 1 < len(items):
+            return items[i + 1]
+    return None
+
+
+def _text(value):
+    return value.decode('utf-8', errors='replace') if isinstance(value, bytes) else ""
+
+
+def _params(values):
+    if not isinstance(values, list):
+        return {}
+    return {_text(k).lower(): _text(v) for k, v in zip(values[::2], values[1::2])}
+
+
+def _walk_structure(node, section, parts):
+    if node and isinstance(node[0], list):
+        # multipart：开头若干项是子部分，其后是子类型等扩展字段
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            _walk_structure(child, f"{section}.{index}" if section else str(index), parts)
+        return
+    content_type = f"{_text(node[0])}/{_text(node[1])}".lower()
+    params = _params(node[2])
+    # 基本字段之后是 MD5、Content-Disposition；text 多一个行数，message/rfc822 多信封、结构和行数
+    md5_index = 8 if content_type.startswith("text/") else 10 if content_type == "message/rfc822" else 7
+    disposition = node[md5_index + 1] if len(node) > md5_index + 1 else None
+    disposition_type, disposition_params = "", {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = _text(disposition[0]).lower()
+        disposition_params = _params(disposition[1] if len(disposition) > 1 else None)
+    filename = decode_header_value(disposition_params.get("filename") or params.get("name") or "")
+    parts.append({
+        "section": section or "1",
+        "type": content_type,
+        "charset": params.get("charset", ""),
+        "encoding": _text(node[5]).lower(),
+        "size": int(node[6]) if node[6] else 0,
+        "filename": filename,
+        "attachment": disposition_type == "attachment" or bool(filename),
+    })
+
+
+def fetch_body_structure(mail, uid):
+    """取邮件的 BODYSTRUCTURE，返回各叶子部分
+
+    [{section, type, charset, encoding, size, filename, attachment}]，
+    邮件不存在或结构无法解析时返回 None
+    """
+    with METRICS.phase("imap_fetch_structure", mail.host):
+        status, data = mail.uid('FETCH', str(uid), '(BODYSTRUCTURE)')
+    if status != 'OK' or not data or data[0] is None:
+        return None
+    structure = _find_item(_parse_sexp(data), b'BODYSTRUCTURE')
+    if not isinstance(structure, list) or len(structure) < 2:
+        return None
+    parts = []
+    try:
+        _walk_structure(structure, "", parts)
+    except (IndexError, TypeError, ValueError):
+        return None
+    return parts
+
+
+class _BodyDecoder:
+    """按传输编码和字符集逐段解码正文，段尾不完整的编码单元和多字节字符留给下一段"""
+
+    def __init__(self, encoding, charset):
+        self.encoding = encoding
+        self._pending = b''
+        try:
+            self._decoder = codecs.getincrementaldecoder(charset or 'utf-8')(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, data, final=False):
+        data = self._pending + data
+        self._pending = b''
+        if self.encoding == 'base64':
+            data = re.sub(rb'[^A-Za-z0-9+/=]', b'', data)
+            cut = len(data) - len(data) % 4
+            data, self._pending = data[:cut], data[cut:]
+            try:
+                data = binascii.a2b_base64(data)
+            except binascii.Error:
+                data = b''
+        elif self.encoding == 'quoted-printable':
+            if not final:
+                # =XX 或软换行 =\r\n 被分段截断时留到下一段
+                cut = data.rfind(b'=', max(0, len(data) - 2))
+                if cut >= 0:
+                    data, self._pending = data[:cut], data[cut:]
+            data = binascii.a2b_qp(data)
+        return self._decoder.decode(data, final)
+
+
+def _pick_text_part(parts):
+    for content_type in ("text/plain", "text/html"):
+        for part in parts:
+            if part["type"] == content_type and not part["attachment"]:
+                return part
+    return None
+
+
+def _fetch_literal(mail, uid, items):
+    with METRICS.phase("imap_fetch", mail.host):
+        status, data = mail.uid('FETCH', str(uid), items)
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"获取邮件失败：{data}")
+    for item in data:
+        if isinstance(item, tuple):
+            METRICS.add_bytes(len(item[1]), "in", mail.host)
+            return item[1]
+    return None
+
+
+def fetch_body(mail, uid, max_bytes=BODY_MAX_BYTES):
+    """取邮件正文：先取 BODYSTRUCTURE，只分段下载 text/plain（没有时 text/html）部分
+
+    正文最多下载 max_bytes 字节，附件只列出不下载（用 fetch_attachment 按需获取）。
+    返回 {text, type, truncated, attachments}，邮件不存在时返回 None。
+    """
+    parts = fetch_body_structure(mail, uid)
+    if parts is None:
+        # 结构无法解析时退回整段取正文
+        msg = fetch_text_message(mail, uid)
+        if msg is None:
+            return None
+        return {"text": message_text(msg), "type": "", "truncated": False, "attachments": []}
+
+    body = _pick_text_part(parts)
+    attachments = [part for part in parts if part["attachment"] or not part["type"].startswith("text/")]
+    texts = []
+    truncated = False
+    if body is not None:
+        decoder = _BodyDecoder(body["encoding"], body["charset"])
+        offset = 0
+        while True:
+            length = min(BODY_FETCH_CHUNK, max_bytes - offset)
+            chunk = _fetch_literal(mail, uid, f'(BODY.PEEK[{body["section"]}]<{offset}.{length}>)') or b''
+            offset += len(chunk)
+            complete = len(chunk) < length or offset >= body["size"]
+            truncated = not complete and offset >= max_bytes
+            texts.append(decoder.feed(chunk, final=complete))
+            if complete or truncated:
+                break
+    return {
+        "text": "".join(texts),
+        "type": body["type"] if body else "",
+        "truncated": truncated,
+        "attachments": attachments,
+    }
+
+
+def fetch_body_text(mail, uid):
+    """只取邮件正文文本，邮件不存在时返回 None"""
+    body = fetch_body(mail, uid)
+    return None if body is None else body["text"]
+
+
+def fetch_attachment(mail, uid, part):
+    """按需下载 fetch_body 列出的附件，返回解码后的内容"""
+    raw = _fetch_literal(mail, uid, f'(BODY.PEEK[{part["section"]}])')
+    if raw is None:
+        raise imaplib.IMAP4.error("附件不存在或邮件已被删除")
+    if part["encoding"] == "base64":
+        return binascii.a2b_base64(raw)
+    if part["encoding"] == "quoted-printable":
+        return binascii.a2b_qp(raw)
+    return raw
+
+
+class BodyCache:
+    """按字节数限制总大小的 LRU 正文缓存，线程安全"""
+
+    def __init__(self, max_bytes=BODY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (账号, UID) -> (正文, 字节数)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(body):
+        # 附件只有元数据，按固定开销估算
+        return sys.getsizeof(body["text"]) + 512 * (len(body["attachments"]) + 1)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, body):
+        size = self._sizeof(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (body, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+
+    def discard_account(self, account):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == account]:
+                self._size -= self._entries.pop(key)[1]
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._size
+
+
+def _parse_uid_list(data):
+    return [int(uid) for uid in data[0].split()] if data and data[0] else []
+
+
+class MailSyncEngine:
+    """基于 UID 的增量收件箱同步，分页直接读本地缓存"""
+
+    def __init__(self, cache=None, pool=IMAP_POOL, bodies=None):
+        self._cache = cache
+        self.pool = pool
+        self.bodies = bodies or BodyCache()
+        self._body_lock = threading.Lock()
+        self._body_inflight = {}     # (账号, UID) -> threading.Event
+
+    @property
+    def cache(self):
+        # 延迟打开数据库，只用注册器的用户不必读盘
+        if self._cache is None:
+            self._cache = StoreHeaderCache(get_store())
+        return self._cache
+
+    @staticmethod
+    def account_key(host, user):
+        return f"{host}:{user}"
+
+    def sync(self, host, port, user, password):
+        """拉取自上次同步以来的新邮件 UID，返回新邮件数"""
+        key = self.account_key(host, user)
+        cache = self.cache
+
+        def run(mail):
+            condstore = 'CONDSTORE' in mail.capabilities
+            # 重新 SELECT 获取最新 EXISTS 与 UIDVALIDITY（CONDSTORE 时顺带开启 MODSEQ）
+            status, data = mail.select('INBOX (CONDSTORE)' if condstore else 'INBOX')
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"选择收件箱失败：{data}")
+            exists = int(data[0]) if data and data[0] else 0
+            uidvalidity = _first_int(mail.response('UIDVALIDITY')[1])
+            modseq = _first_int(mail.response('HIGHESTMODSEQ')[1]) if condstore else None
+
+            state = cache.get_state(key)
+            if state["uidvalidity"] != uidvalidity:
+                cache.reset(key, uidvalidity)
+                state = cache.get_state(key)
+                # UID 已重新编号，缓存的正文不再对应
+                self.bodies.discard_account(key)
+
+            # 只搜索比已见最大 UID 更新的邮件
+            highest = state["highest_uid"]
+            with METRICS.phase("imap_search", host):
+                status, data = mail.uid('SEARCH', None, f'UID {highest + 1}:*')
+            if status != 'OK':
+                raise imaplib.IMAP4.error("搜索新邮件失败")
+            new_uids = [uid for uid in _parse_uid_list(data) if uid > highest]
+            cache.add_uids(key, new_uids)
+
+            # 数量对不上说明有邮件被删除，全量校正一次 UID 列表
+            if cache.count(key) != exists:
+                status, data = mail.uid('SEARCH', None, 'ALL')
+                if status == 'OK':
+                    cache.replace_uids(key, _parse_uid_list(data))
+
+            # 支持 CONDSTORE 时顺带同步已缓存邮件的已读状态
+            if condstore and state["highest_modseq"] and highest:
+                try:
+                    status, data = mail.uid(
+                        'FETCH', f'1:{highest}', '(UID FLAGS)', f'(CHANGEDSINCE {state["highest_modseq"]})'
+                    )
+                except imaplib.IMAP4.abort:
+                    raise
+                except imaplib.IMAP4.error:
+                    # 服务器声明了 CONDSTORE 却不接受修饰符时跳过，不影响新邮件同步
+                    status, data = 'NO', []
+                if status == 'OK':
+                    cache.update_flags(key, _parse_flags(data))
+            cache.set_state(key, highest_modseq=modseq)
+            return len(new_uids)
+
+        return self.pool.run(host, port, user, password, run)
+
+    def get_page(self, host, port, user, password, page, page_size, offline=False):
+        """从缓存取一页摘要，缺失的头字段一次性补取；offline 时不访问网络"""
+        key = self.account_key(host, user)
+        cache = self.cache
+        page_uids = cache.page_uids(key, page * page_size, page_size)
+        headers = cache.get_headers(key, page_uids)
+        missing = [uid for uid in page_uids if uid not in headers]
+
+        if missing and not offline:
+            def run(mail):
+                uid_set = ','.join(str(uid) for uid in missing)
+                with METRICS.phase("imap_fetch_headers", host):
+                    status, data = mail.uid('FETCH', uid_set, MAIL_LIST_FETCH_ITEMS)
+                if status != 'OK':
+                    raise imaplib.IMAP4.error("获取邮件摘要失败")
+                if METRICS.enabled:
+                    METRICS.add_bytes(sum(len(item[1]) for item in data if isinstance(item, tuple)), "in", host)
+                return parse_header_fetch(data)
+
+            fetched = self.pool.run(host, port, user, password, run)
+            cache.put_headers(key, fetched)
+            headers.update(fetched)
+
+        mail_list = [headers[uid] for uid in page_uids if uid in headers]
+        return mail_list, cache.count(key)
+
+    def get_body(self, host, port, user, password, uid):
+        """取邮件正文（fetch_body 的结果），优先读内存缓存，邮件不存在时返回 None"""
+        key = (self.account_key(host, user), int(uid))
+        while True:
+            body = self.bodies.get(key)
+            if body is not None:
+                return body
+            with self._body_lock:
+                event = self._body_inflight.get(key)
+                if event is None:
+                    event = self._body_inflight[key] = threading.Event()
+                    break
+            # 同一封邮件正在被其他线程下载（如预读），等它完成后再读缓存
+            event.wait()
+        try:
+            body = self.pool.run(host, port, user, password, lambda mail: fetch_body(mail, uid))
+            if body is not None:
+                self.bodies.put(key, body)
+            return body
+        finally:
+            with self._body_lock:
+                del self._body_inflight[key]
+            event.set()
+
+    def prefetch(self, host, port, user, password, page, page_size, cancel_event, body_count=PREFETCH_BODIES):
+        """预读当前页前几封邮件的正文和相邻页的摘要，cancel_event 置位后尽快停止"""
+        mail_list, total = self.get_page(host, port, user, password, page, page_size, offline=True)
+        for mail in mail_list[:body_count]:
+            if cancel_event.is_set():
+                return
+            self.get_body(host, port, user, password, mail["uid"])
+        last_page = (total - 1) // page_size
+        for adjacent in (page + 1, page - 1):
+            if cancel_event.is_set():
+                return
+            if 0 <= adjacent <= last_page:
+                self.get_page(host, port, user, password, adjacent, page_size)
+
+
+def _first_int(values):
+    if values and values[0]:
+        try:
+            return int(values[0])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _parse_flags(data):
+    flags_by_uid = {}
+    for item in data:
+        meta = item[0] if isinstance(item, tuple) else item
+        if not isinstance(meta, bytes):
+            continue
+        uid = re.search(rb'UID (\d+)', meta)
+        flags = re.search(rb'FLAGS \(([^)]*)\)', meta)
+        if uid and flags:
+            flags_by_uid[int(uid.group(1))] = flags.group(1).decode().split()
+    return flags_by_uid
+
+
+MAIL_SYNC = MailSyncEngine()
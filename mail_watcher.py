@@ -0,0 +1,381 @@
+import imaplib
+import selectors
+import socket
+import threading
+import time
+
+from mail_sync import fetch_body_text
+from providers.base import extract_code_content
+
+# 最多同时监听的账号数（每个账号占用一条 IMAP 连接）
+WATCH_MAX_ACCOUNTS = 20
+# IDLE 续期间隔：服务器一般 30 分钟断开 IDLE，部分服务器更短
+WATCH_IDLE_RENEW = 540
+# 服务器不支持 IDLE 时的轮询间隔
+WATCH_POLL_INTERVAL = 15
+# 连接断开后的重连间隔
+WATCH_RETRY_DELAY = 30
+WATCH_IO_TIMEOUT = 30
+# IDLE 命令使用自己的标签（imaplib 的标签为大写字母），不会与其他命令冲突
+IDLE_TAG = b"idle"
+
+
+class _SocketReader:
+    """替换 imaplib 的文件对象，可以判断是否还有已收到但未处理的数据
+
+    makefile 返回的 BufferedReader 可能已把 EXISTS 通知读进缓冲区，
+    此时 socket 不再可读，selector 就收不到通知。
+    """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._buf = bytearray()
+
+    def _fill(self):
+        data = self._sock.recv(65536)
+        if not data:
+            # 服务器正常关闭连接时 recv 返回空，不抛异常；
+            # 不转成 abort 的话 selector 会一直报告可读，后台线程空转
+            raise imaplib.IMAP4.abort("服务器关闭了连接")
+        self._buf += data
+
+    def pending(self):
+        # SSL socket 内部可能还缓存着已解密的数据
+        return bool(self._buf) or (hasattr(self._sock, "pending") and self._sock.pending() > 0)
+
+    def readline(self, limit=-1):
+        while True:
+            end = self._buf.find(b"\n") + 1
+            if end or 0 < limit <= len(self._buf):
+                break
+            self._fill()
+        if not end:
+            end = len(self._buf)
+        if limit > 0:
+            end = min(end, limit)
+        line = bytes(self._buf[:end])
+        del self._buf[:end]
+        return line
+
+    def read(self, size):
+        while len(self._buf) < size:
+            self._fill()
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def close(self):
+        pass
+
+
+class _Watch:
+    """一个被监听的账号"""
+
+    def __init__(self, host, port, user, password, callback):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.callback = callback
+        self.conn = None
+        self.reader = None
+        self.next_uid = None
+        self.idle_supported = True
+        self.idling = False
+        self.deadline = 0.0      # 下次重连 / IDLE 续期 / 轮询的时间
+        self.failures = 0
+
+    @property
+    def key(self):
+        return self.host, self.port, self.user
+
+
+class MailWatcher:
+    """IMAP 新邮件推送：单个后台线程用 selector 同时等待所有账号的 IDLE 连接
+
+    收到 EXISTS 通知后结束 IDLE，只取新到邮件的正文提取验证码并回调，
+    然后重新进入 IDLE；服务器不支持 IDLE 时改为定时轮询。
+    回调在后台线程执行，参数与 fetch_verification_code 的返回值相同。
+    """
+
+    def __init__(self, max_accounts=WATCH_MAX_ACCOUNTS):
+        self.max_accounts = max_accounts
+        self._lock = threading.Lock()
+        self._watches = {}      # (host, port, user) -> _Watch
+        self._commands = []     # 交给后台线程处理的 ("add" / "remove", _Watch)
+        self._thread = None
+        self._selector = None
+        self._wakeup_r = self._wakeup_w = None
+        self._stopped = False
+
+    def watch(self, host, port, user, password, callback):
+        """开始监听账号收件箱，返回 {"success", "message"}"""
+        watch = _Watch(host, int(port), user, password, callback)
+        with self._lock:
+            if self._stopped:
+                return {"success": False, "message": "监听已停止"}
+            if watch.key in self._watches:
+                return {"success": True, "message": "已在监听"}
+            if len(self._watches) >= self.max_accounts:
+                return {"success": False, "message": f"最多同时监听 {self.max_accounts} 个邮箱"}
+            self._watches[watch.key] = watch
+            self._commands.append(("add", watch))
+            self._ensure_thread()
+        self._wakeup()
+        return {"success": True, "message": "开始监听新邮件"}
+
+    def unwatch(self, host, port, user):
+        with self._lock:
+            watch = self._watches.pop((host, int(port), user), None)
+            if watch is None:
+                return
+            self._commands.append(("remove", watch))
+        self._wakeup()
+
+    def is_watching(self, host, port, user):
+        with self._lock:
+            return (host, int(port), user) in self._watches
+
+    def stop(self):
+        """停止后台线程并登出所有监听连接"""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is not None:
+            self._wakeup()
+            thread.join(WATCH_IO_TIMEOUT)
+
+    def _ensure_thread(self):
+        """按需启动后台线程（调用方持有锁）"""
+        if self._thread is None:
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+            self._thread = threading.Thread(target=self._loop, name="mail-watcher", daemon=True)
+            self._thread.start()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except (AttributeError, OSError):
+            pass
+
+    # 以下方法只在后台线程中执行
+    def _loop(self):
+        active = []
+        error = None
+        try:
+            while True:
+                with self._lock:
+                    commands, self._commands = self._commands, []
+                    stopped = self._stopped
+                for command, watch in commands:
+                    if command == "add":
+                        active.append(watch)
+                    elif watch in active:
+                        active.remove(watch)
+                        self._close(watch)
+                if stopped:
+                    return
+
+                now = time.monotonic()
+                for watch in list(active):
+                    if watch.idling and watch.reader.pending():
+                        self._guard(watch, active, self._on_readable)
+                    elif now >= watch.deadline:
+                        self._guard(watch, active, self._on_timer)
+
+                deadlines = [watch.deadline for watch in active]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                if any(watch.idling and watch.reader.pending() for watch in active):
+                    timeout = 0
+                for key, _ in self._selector.select(timeout):
+                    watch = key.data
+                    if watch is None:
+                        self._drain_wakeup()
+                    elif watch.idling:
+                        self._guard(watch, active, self._on_readable)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            for watch in active:
+                self._close(watch)
+            with self._lock:
+                self._selector.close()
+                self._wakeup_r.close()
+                self._wakeup_w.close()
+                # 线程结束后清空状态，之后的 watch() 会重新启动后台线程
+                self._thread = self._selector = None
+                self._wakeup_r = self._wakeup_w = None
+                # 退出前刚加入、还没处理的监听交给新线程
+                self._commands = [(command, watch) for command, watch in self._commands
+                                  if command == "add" and self._watches.get(watch.key) is watch]
+                self._watches = {watch.key: watch for _, watch in self._commands}
+                if self._commands and not self._stopped:
+                    self._ensure_thread()
+            if error is not None:
+                for watch in active:
+                    self._notify(watch, {"success": False, "message": f"监听线程异常退出，已停止监听：{error}"})
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _guard(self, watch, active, handler):
+        try:
+            handler(watch)
+            watch.failures = 0
+        except (imaplib.IMAP4.abort, OSError) as e:
+            # 网络错误：稍后重连，连续失败只通知一次
+            self._close(watch)
+            watch.deadline = time.monotonic() + WATCH_RETRY_DELAY
+            watch.failures += 1
+            if watch.failures == 1:
+                self._notify(watch, {"success": False,
+                                     "message": f"监听连接中断，{WATCH_RETRY_DELAY} 秒后重连：{e}"})
+        except Exception as e:
+            # 登录失败等命令错误，或邮件无法解码（如未知字符集）等意外错误：重连也无济于事，停止监听
+            self._close(watch)
+            active.remove(watch)
+            with self._lock:
+                self._watches.pop(watch.key, None)
+            self._notify(watch, {"success": False, "message": f"已停止监听：{e}"})
+
+    @staticmethod
+    def _notify(watch, result):
+        try:
+            watch.callback(result)
+        except Exception:
+            pass
+
+    def _on_timer(self, watch):
+        if watch.conn is None:
+            self._connect(watch)
+        elif watch.idling:
+            # IDLE 续期，顺带检查一次新邮件
+            self._stop_idle(watch)
+            self._check_new(watch)
+            self._start_idle(watch)
+        else:
+            self._check_new(watch)
+            watch.deadline = time.monotonic() + WATCH_POLL_INTERVAL
+        if not watch.idling and watch.idle_supported:
+            self._start_idle(watch)
+
+    def _connect(self, watch):
+        conn = imaplib.IMAP4_SSL(watch.host, watch.port, timeout=WATCH_IO_TIMEOUT)
+        try:
+            conn.login(watch.user, watch.password)
+            status, data = conn.select("INBOX")
+            if status != "OK":
+                raise imaplib.IMAP4.error(f"选择收件箱失败：{data}")
+        except BaseException:
+            try:
+                conn.logout()
+            except Exception:
+                pass
+            raise
+        watch.conn = conn
+        watch.reader = conn.file = _SocketReader(conn.sock)
+        watch.idle_supported = "IDLE" in conn.capabilities
+        watch.deadline = time.monotonic() + WATCH_POLL_INTERVAL
+
+        if watch.next_uid is None:
+            uidnext = conn.untagged_responses.get("UIDNEXT")
+            watch.next_uid = int(uidnext[-1]) if uidnext else self._max_uid(conn) + 1
+        else:
+            # 重连：补上断线期间到达的邮件
+            self._check_new(watch)
+
+    @staticmethod
+    def _max_uid(conn):
+        status, data = conn.uid("SEARCH", None, "ALL")
+        uids = data[0].split() if status == "OK" and data and data[0] else []
+        return max((int(uid) for uid in uids), default=0)
+
+    def _start_idle(self, watch):
+        watch.conn.send(IDLE_TAG + b" IDLE\r\n")
+        # 续行之前到达的 EXISTS 不会再通知，记下来进入 IDLE 后立即检查
+        has_new = False
+        while True:
+            line = watch.conn.readline()
+            if line.startswith(b"+"):
+                break
+            if line.startswith(IDLE_TAG + b" "):
+                # 服务器拒绝 IDLE，改为轮询
+                watch.idle_supported = False
+                watch.deadline = time.monotonic() + (0 if has_new else WATCH_POLL_INTERVAL)
+                return
+            if line.rstrip().upper().endswith(b"EXISTS"):
+                has_new = True
+        watch.idling = True
+        # 到期时由 _on_timer 结束 IDLE 并检查新邮件
+        watch.deadline = time.monotonic() + (0 if has_new else WATCH_IDLE_RENEW)
+        self._selector.register(watch.conn.sock, selectors.EVENT_READ, watch)
+
+    def _stop_idle(self, watch):
+        self._selector.unregister(watch.conn.sock)
+        watch.idling = False
+        watch.conn.send(b"DONE\r\n")
+        while not watch.conn.readline().startswith(IDLE_TAG + b" "):
+            pass
+
+    def _on_readable(self, watch):
+        has_new = False
+        while True:
+            line = watch.conn.readline()
+            if line.startswith(b"* BYE"):
+                raise imaplib.IMAP4.abort("服务器关闭了连接")
+            if line.rstrip().upper().endswith(b"EXISTS"):
+                has_new = True
+            if not watch.reader.pending():
+                break
+        if has_new:
+            self._stop_idle(watch)
+            self._check_new(watch)
+            self._start_idle(watch)
+
+    def _check_new(self, watch):
+        """取 UID 不小于 next_uid 的新邮件，有验证码或验证链接时回调"""
+        conn = watch.conn
+        while True:
+            conn.untagged_responses.pop("EXISTS", None)
+            status, data = conn.uid("SEARCH", None, f"UID {watch.next_uid}:*")
+            if status != "OK":
+                raise imaplib.IMAP4.error("搜索新邮件失败")
+            # UID n:* 在没有新邮件时也会返回最后一封，需要过滤
+            uids = sorted(int(uid) for uid in (data[0] or b"").split() if int(uid) >= watch.next_uid)
+            for uid in uids:
+                text = fetch_body_text(conn, uid)
+                watch.next_uid = uid + 1
+                if text is None:
+                    continue
+                result = extract_code_content(text)
+                if result["code"] or result["link"]:
+                    self._notify(watch, result)
+            # 处理期间又有新邮件到达
+            if not conn.untagged_responses.get("EXISTS"):
+                return
+
+    def _close(self, watch):
+        if watch.conn is None:
+            return
+        try:
+            if watch.idling:
+                # IDLE 中的连接不必再走 LOGOUT，直接断开
+                self._selector.unregister(watch.conn.sock)
+                watch.conn.shutdown()
+            else:
+                watch.conn.logout()
+        except Exception:
+            pass
+        watch.idling = False
+        watch.conn = watch.reader = None
+
+
+MAIL_WATCHER = MailWatcher()
@@ -1,8 +1,37 @@
 import sys
+import time
+
+_START = time.perf_counter()
+
+from PySide6.QtCore import QTimer
 from email_gui import QApplication, EmailRegisterApp
 
+# 启动耗时测量模式：python main.py --startup-time
+STARTUP_TIME_FLAG = "--startup-time"
+# 应当延迟到首次使用时才加载的模块
+DEFERRED_MODULES = ("selenium", "requests", "aiohttp", "asyncio", "imaplib", "smtplib")
+
+
+def report_startup_time(imported_at, shown_at):
+    """窗口显示后的第一次事件循环中输出各阶段耗时，然后退出"""
+    first_frame_at = time.perf_counter()
+    print(f"导入模块：{(imported_at - _START) * 1000:.1f} ms", file=sys.stderr)
+    print(f"创建窗口：{(shown_at - imported_at) * 1000:.1f} ms", file=sys.stderr)
+    print(f"首个窗口可见：{(first_frame_at - _START) * 1000:.1f} ms", file=sys.stderr)
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(f"启动时已加载的重型模块：{', '.join(loaded) or '无'}", file=sys.stderr)
+    QApplication.quit()
+
+
 if __name__ == "__main__":
+    measure = STARTUP_TIME_FLAG in sys.argv
+    if measure:
+        sys.argv.remove(STARTUP_TIME_FLAG)
+    imported_at = time.perf_counter()
     app = QApplication(sys.argv)
     window = EmailRegisterApp()
     window.show()
+    if measure:
+        shown_at = time.perf_counter()
+        QTimer.singleShot(0, lambda: report_startup_time(imported_at, shown_at))
     sys.exit(app.exec())
\ No newline at end of file
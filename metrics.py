@@ -0,0 +1,301 @@
+import json
+import time
+import bisect
+import inspect
+import functools
+import threading
+import contextvars
+
+# 默认关闭；关闭时埋点只多一次属性判断
+METRICS_ENABLED = False
+# 耗时直方图的桶上界（秒），与 Prometheus 默认桶接近
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 导出 Prometheus 文本时的指标名前缀
+METRIC_PREFIX = "mailtool"
+
+# 当前线程 / 协程所在的操作，底层的阶段计时按它归属服务商和操作
+_current_span = contextvars.ContextVar("metrics_span", default=None)
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)   # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """按桶内线性插值估算分位数（与 Prometheus histogram_quantile 相同）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(HISTOGRAM_BUCKETS):
+                    return HISTOGRAM_BUCKETS[-1]
+                lower = HISTOGRAM_BUCKETS[index - 1] if index else 0.0
+                upper = HISTOGRAM_BUCKETS[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return HISTOGRAM_BUCKETS[-1]
+
+
+class _NullSpan:
+    """统计关闭时的空操作，span / phase 都返回同一个实例"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def fail(self):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """一次服务商操作，退出时记录总耗时（phase 为 total）与是否失败"""
+
+    __slots__ = ("metrics", "provider", "operation", "failed", "_start", "_token")
+
+    def __init__(self, metrics, provider, operation):
+        self.metrics = metrics
+        self.provider = provider or "unknown"
+        self.operation = operation
+        self.failed = False
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        self.metrics.observe(self.provider, self.operation, "total", elapsed, failed=self.failed or exc_type is not None)
+        return False
+
+    def fail(self):
+        """操作以失败结果返回（没有抛异常）时调用"""
+        self.failed = True
+
+
+class _Phase:
+    """操作内的一个阶段（连接、登录、搜索、下载等）"""
+
+    __slots__ = ("metrics", "name", "provider", "_start")
+
+    def __init__(self, metrics, name, provider):
+        self.metrics = metrics
+        self.name = name
+        self.provider = provider
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        provider, operation = self.metrics.labels(self.provider)
+        self.metrics.observe(provider, operation, self.name, elapsed, failed=exc_type is not None)
+        return False
+
+    def fail(self):
+        pass
+
+
+class Metrics:
+    """服务商操作的耗时直方图与计数器
+
+    耗时按 (服务商, 操作, 阶段) 聚合，阶段 total 为整个操作；
+    另外统计 HTTP 状态码和收发字节数。enabled 为 False 时所有埋点立即返回。
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}    # (服务商, 操作, 阶段) -> Histogram
+        self._errors = {}        # (服务商, 操作, 阶段) -> 失败次数
+        self._http_status = {}   # (服务商, 状态码) -> 次数
+        self._bytes = {}         # (服务商, in/out) -> 字节数
+
+    def span(self, provider, operation):
+        """with METRICS.span(服务商, 操作) as span: ...，结果为失败时调用 span.fail()"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, provider, operation)
+
+    def phase(self, name, provider=None):
+        """with METRICS.phase(阶段): ...，归属当前操作；不在操作内时记到 provider 名下"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Phase(self, name, provider)
+
+    @staticmethod
+    def labels(provider=None):
+        """当前操作的 (服务商, 操作)，不在操作内时为 (provider, "-")"""
+        span = _current_span.get()
+        if span is None:
+            return provider or "unknown", "-"
+        return span.provider, span.operation
+
+    def observe(self, provider, operation, phase, seconds, failed=False):
+        key = (provider, operation, phase)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def record_http(self, provider, status, seconds, sent=0, received=0):
+        """记录一次 HTTP 请求（status 为状态码，网络异常时为 "error"）"""
+        if not self.enabled:
+            return
+        _, operation = self.labels(provider)
+        failed = status == "error" or int(status) >= 400
+        self.observe(provider, operation, "http", seconds, failed=failed)
+        with self._lock:
+            key = (provider, str(status))
+            self._http_status[key] = self._http_status.get(key, 0) + 1
+        self.add_bytes(sent, "out", provider)
+        self.add_bytes(received, "in", provider)
+
+    def add_bytes(self, count, direction="in", provider=None):
+        if not self.enabled or not count:
+            return
+        key = (self.labels(provider)[0], direction)
+        with self._lock:
+            self._bytes[key] = self._bytes.get(key, 0) + count
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+            self._http_status.clear()
+            self._bytes.clear()
+
+    def snapshot(self):
+        """当前统计的副本：{"enabled", "operations": [...], "http_responses": [...], "bytes": [...]}"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+            errors = dict(self._errors)
+            http_status = dict(self._http_status)
+            transferred = dict(self._bytes)
+        operations = []
+        for (provider, operation, phase), (counts, total, count) in sorted(histograms.items()):
+            histogram = Histogram()
+            histogram.counts, histogram.sum, histogram.count = counts, total, count
+            operations.append({
+                "provider": provider,
+                "operation": operation,
+                "phase": phase,
+                "count": count,
+                "errors": errors.get((provider, operation, phase), 0),
+                "sum": total,
+                "p50": histogram.quantile(0.5),
+                "p90": histogram.quantile(0.9),
+                "p99": histogram.quantile(0.99),
+                "buckets": counts,
+            })
+        return {
+            "enabled": self.enabled,
+            "buckets": list(HISTOGRAM_BUCKETS),
+            "operations": operations,
+            "http_responses": [{"provider": p, "status": s, "count": c} for (p, s), c in sorted(http_status.items())],
+            "bytes": [{"provider": p, "direction": d, "bytes": b} for (p, d), b in sorted(transferred.items())],
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        snapshot = self.snapshot()
+        name = f"{METRIC_PREFIX}_operation_seconds"
+        lines = [f"# HELP {name} Provider operation and phase latency.", f"# TYPE {name} histogram"]
+        for op in snapshot["operations"]:
+            labels = _format_labels(provider=op["provider"], operation=op["operation"], phase=op["phase"])
+            cumulative = 0
+            for bound, bucket_count in zip(HISTOGRAM_BUCKETS + ("+Inf",), op["buckets"]):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {op['sum']:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {op['count']}")
+
+        name = f"{METRIC_PREFIX}_operation_errors_total"
+        lines += [f"# HELP {name} Failed provider operations and phases.", f"# TYPE {name} counter"]
+        for op in snapshot["operations"]:
+            labels = _format_labels(provider=op["provider"], operation=op["operation"], phase=op["phase"])
+            lines.append(f"{name}{{{labels}}} {op['errors']}")
+
+        name = f"{METRIC_PREFIX}_http_responses_total"
+        lines += [f"# HELP {name} HTTP responses by status code.", f"# TYPE {name} counter"]
+        for item in snapshot["http_responses"]:
+            lines.append(f"{name}{{{_format_labels(provider=item['provider'], status=item['status'])}}} {item['count']}")
+
+        name = f"{METRIC_PREFIX}_transfer_bytes_total"
+        lines += [f"# HELP {name} Bytes sent to and received from providers.", f"# TYPE {name} counter"]
+        for item in snapshot["bytes"]:
+            labels = _format_labels(provider=item["provider"], direction=item["direction"])
+            lines.append(f"{name}{{{labels}}} {item['bytes']}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _succeeded(result):
+    """服务方法的返回值是否表示成功：dict 看 success，元组看第一个元素"""
+    if isinstance(result, dict):
+        return result.get("success", True)
+    if isinstance(result, tuple) and result and isinstance(result[0], bool):
+        return result[0]
+    return True
+
+
+def instrumented(operation, provider_of):
+    """服务方法装饰器：按 provider_of(*参数) 得到的服务商记录整个操作的耗时与成败
+
+    参数先按函数签名绑定，以关键字传入的位置参数同样会传给 provider_of。
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                # 参数与签名不符，由原函数抛出同样的错误
+                return func(*args, **kwargs)
+            with METRICS.span(provider_of(*bound.args), operation) as span:
+                result = func(*args, **kwargs)
+                if not _succeeded(result):
+                    span.fail()
+                return result
+        return wrapper
+    return decorate
+
+
+METRICS = Metrics()
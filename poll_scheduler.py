@@ -0,0 +1,226 @@
+import time
+import heapq
+import random
+import asyncio
+import threading
+
+from async_backend import ASYNC_BACKEND
+from providers import get_provider
+from providers.base import extract_code_content
+
+# 最多同时轮询的邮箱数
+POLL_MAX_MAILBOXES = 500
+# 开始监听（或收到非验证码邮件）后的一段时间内快速轮询
+POLL_FAST_INTERVAL = 3.0
+POLL_FAST_PERIOD = 60.0
+# 之后每次没有新邮件，间隔乘以该系数，直到上限
+POLL_BACKOFF = 1.5
+POLL_MAX_INTERVAL = 60.0
+# 间隔上下随机浮动的比例，避免大量邮箱同时到期
+POLL_JITTER = 0.2
+# 超过该时长仍未收到验证码则停止轮询
+POLL_TIMEOUT = 1800.0
+# 连续失败次数上限
+POLL_MAX_FAILURES = 5
+# 每次最多检查的新邮件封数（从新到旧）
+POLL_FETCH_LIMIT = 3
+
+
+class AsyncRateLimiter:
+    """协程版令牌桶，等待者按先来后到取令牌"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Mailbox:
+    """一个被轮询的邮箱"""
+
+    def __init__(self, email_info, callback):
+        self.email_info = email_info
+        self.callback = callback
+        self.started = time.monotonic()
+        self.fast_until = self.started + POLL_FAST_PERIOD
+        self.interval = POLL_FAST_INTERVAL
+        # 已见过的邮件 id；第一次轮询前为 None
+        self.seen = None
+        self.failures = 0
+        self.active = True
+
+
+class _ProviderQueue:
+    """同一服务商的待轮询邮箱（按到期时间排序的堆）及其共用的令牌桶"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.heap = []           # (到期时间, 序号, _Mailbox)
+        self.seq = 0
+        self.wakeup = asyncio.Event()
+        self.runner = None
+
+    def schedule(self, mailbox, delay):
+        self.seq += 1
+        heapq.heappush(self.heap, (time.monotonic() + delay, self.seq, mailbox))
+        self.wakeup.set()
+
+
+class PollScheduler:
+    """HTTP 临时邮箱的后台轮询，运行在异步后端的事件循环上
+
+    每个邮箱按自适应间隔轮询：刚开始监听时快速轮询，之后没有新邮件就指数退避；
+    同一服务商的所有邮箱共用一个令牌桶，总请求速率不超过 poll_limits，
+    邮箱多到速率不够用时按到期先后依次轮询，实际间隔自然拉长。
+    找到验证码（或验证链接）后回调并自动停止，回调在事件循环线程执行。
+    """
+
+    def __init__(self, backend=ASYNC_BACKEND, max_mailboxes=POLL_MAX_MAILBOXES, limits=None):
+        self.backend = backend
+        self.max_mailboxes = max_mailboxes
+        # limits 可按类型覆盖服务商声明的轮询速率
+        self.limits = limits or {}
+        self._lock = threading.Lock()
+        self._mailboxes = {}     # email -> _Mailbox
+        self._queues = {}        # 邮箱类型 -> _ProviderQueue
+        self._tasks = set()
+
+    def watch(self, email_info, callback):
+        """开始轮询邮箱，返回 {"success", "message"}"""
+        provider = get_provider(email_info.get("type"))
+        if provider is None or provider.list_messages_flow(email_info) is None:
+            return {"success": False, "message": "该邮箱类型不支持后台轮询"}
+        mailbox = _Mailbox(email_info, callback)
+        with self._lock:
+            if email_info["email"] in self._mailboxes:
+                return {"success": True, "message": "已在轮询"}
+            if len(self._mailboxes) >= self.max_mailboxes:
+                return {"success": False, "message": f"最多同时轮询 {self.max_mailboxes} 个邮箱"}
+            self._mailboxes[email_info["email"]] = mailbox
+        self.backend.submit(self._add(mailbox))
+        return {"success": True, "message": "开始轮询新邮件"}
+
+    def unwatch(self, email):
+        with self._lock:
+            mailbox = self._mailboxes.pop(email, None)
+        if mailbox is not None:
+            # 堆中的条目到期时再丢弃
+            mailbox.active = False
+
+    def is_watching(self, email):
+        with self._lock:
+            return email in self._mailboxes
+
+    def watch_count(self):
+        with self._lock:
+            return len(self._mailboxes)
+
+    # 以下方法在事件循环线程中执行
+    async def _add(self, mailbox):
+        email_type = mailbox.email_info["type"]
+        queue = self._queues.get(email_type)
+        if queue is None:
+            limit = self.limits.get(email_type) or get_provider(email_type).poll_limits
+            queue = self._queues[email_type] = _ProviderQueue(AsyncRateLimiter(limit["rate"], limit.get("burst", 1)))
+            queue.runner = asyncio.get_running_loop().create_task(self._run(queue))
+        queue.schedule(mailbox, 0)
+
+    async def _run(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            queue.wakeup.clear()
+            if not queue.heap:
+                await queue.wakeup.wait()
+                continue
+            due, _, mailbox = queue.heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(queue.heap)
+            if not mailbox.active:
+                continue
+            # 在这里按速率放行，等待令牌的只有调度器本身，
+            # 发现新邮件后取正文的请求不必排在所有邮箱后面
+            await queue.limiter.acquire()
+            task = loop.create_task(self._poll(queue, mailbox))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _poll(self, queue, mailbox):
+        info = mailbox.email_info
+        provider = get_provider(info["type"])
+        got_new = False
+        try:
+            messages = await self.backend.run_flow(provider.list_messages_flow(info))
+            if mailbox.seen is None:
+                # 第一次轮询：开始监听前已有的邮件只记下，不取正文也不回调，
+                # 否则会把旧验证码当作新验证码（与 MailWatcher 以 UIDNEXT 为起点一致）
+                mailbox.seen = {m["id"] for m in messages}
+                new = []
+            else:
+                new = [m for m in messages if m["id"] not in mailbox.seen]
+                mailbox.seen.update(m["id"] for m in messages)
+            for message in new[:POLL_FETCH_LIMIT]:
+                if not mailbox.active:
+                    return
+                await queue.limiter.acquire()
+                content = await self.backend.run_flow(provider.fetch_message_flow(info, message["id"]))
+                result = extract_code_content(content or "")
+                if result["code"] or result["link"]:
+                    self._finish(mailbox, result)
+                    return
+            got_new = bool(new)
+            mailbox.failures = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            mailbox.failures += 1
+            if mailbox.failures >= POLL_MAX_FAILURES:
+                self._finish(mailbox, {"success": False, "message": f"轮询连续失败，已停止：{e}"})
+                return
+
+        now = time.monotonic()
+        if now - mailbox.started >= POLL_TIMEOUT:
+            self._finish(mailbox, {"success": False, "message": "长时间未收到验证码，已停止轮询"})
+            return
+        if got_new:
+            # 来了非验证码邮件，验证码可能紧随其后
+            mailbox.fast_until = now + POLL_FAST_PERIOD
+            mailbox.interval = POLL_FAST_INTERVAL
+        elif now >= mailbox.fast_until:
+            mailbox.interval = min(POLL_MAX_INTERVAL, mailbox.interval * POLL_BACKOFF)
+        if mailbox.active:
+            jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+            queue.schedule(mailbox, mailbox.interval * jitter)
+
+    def _finish(self, mailbox, result):
+        with self._lock:
+            if self._mailboxes.get(mailbox.email_info["email"]) is mailbox:
+                del self._mailboxes[mailbox.email_info["email"]]
+        if not mailbox.active:
+            return
+        mailbox.active = False
+        try:
+            mailbox.callback(result)
+        except Exception:
+            pass
+
+
+POLL_SCHEDULER = PollScheduler()
@@ -0,0 +1,54 @@
+import importlib
+import threading
+
+# 邮箱类型 -> (模块, 类名, 显示名称)
+# 服务商模块在第一次使用时才导入，未用到的依赖（如 Outlook 的 Selenium）不会被加载
+PROVIDER_SPECS = {
+    "outlook": ("providers.outlook", "OutlookProvider", "Outlook邮箱"),
+    "mail.tm": ("providers.mail_tm", "MailTmProvider", "临时邮箱 mail.tm"),
+    "1secmail": ("providers.onesecmail", "OneSecMailProvider", "临时邮箱 1secmail"),
+    "guerrillamail": ("providers.guerrillamail", "GuerrillaMailProvider", "临时邮箱 GuerrillaMail"),
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def register_provider(email_type, module, class_name, display_name):
+    """登记一个服务商；新增服务商只需实现 EmailProvider 并在此登记"""
+    with _providers_lock:
+        PROVIDER_SPECS[email_type] = (module, class_name, display_name)
+        _providers.pop(email_type, None)
+
+
+def provider_types():
+    """返回 [(邮箱类型, 显示名称)]，不会导入服务商模块"""
+    return [(email_type, spec[2]) for email_type, spec in PROVIDER_SPECS.items()]
+
+
+def get_provider(email_type):
+    """返回该类型的服务商实例（首次调用时导入模块），未知类型返回 None"""
+    provider = _providers.get(email_type)
+    if provider is not None:
+        return provider
+    spec = PROVIDER_SPECS.get(email_type)
+    if spec is None:
+        return None
+    with _providers_lock:
+        provider = _providers.get(email_type)
+        if provider is None:
+            module_name, class_name, _ = spec
+            provider_class = getattr(importlib.import_module(module_name), class_name)
+            provider = _providers[email_type] = provider_class()
+        return provider
+
+
+def close_providers():
+    """关闭已加载的服务商（未加载的不会被导入）"""
+    with _providers_lock:
+        providers = list(_providers.values())
+    for provider in providers:
+        try:
+            provider.close()
+        except Exception:
+            pass
@@ -0,0 +1,144 @@
+import random
+import string
+
+from code_extractor import extract_code
+from http_client import run_flow
+from mail_store import get_store
+
+# 邮件列表最多返回的缓存邮件数
+MESSAGE_LIST_LIMIT = 50
+
+
+def generate_email_prefix():
+    """生成邮箱前缀（首字母+7位字母数字）"""
+    first_char = random.choice(string.ascii_lowercase)
+    rest = ''.join(random.choices(string.ascii_lowercase + string.digits, k=7))
+    return first_char + rest
+
+
+def generate_password():
+    return ''.join(random.choices(string.ascii_letters + string.digits + '!@#$%', k=12))
+
+
+def extract_code_content(email_content):
+    """提取验证码相关内容（code 为识别出的验证码，link 为验证链接）"""
+    extracted = extract_code(email_content)
+    return {
+        "success": True,
+        "code": extracted["code"],
+        "link": extracted["link"],
+        "related": extracted["related"] or "找到关键词邮件，但未提取到相关核心内容",
+        "full": email_content
+    }
+
+
+def format_timings(timings):
+    """把 [(步骤, 等待秒数, 操作秒数)] 格式化为一行日志"""
+    return "，".join(f"{step} {waited + acted:.1f}s" for step, waited, acted in timings)
+
+
+class EmailProvider:
+    """邮箱服务商接口
+
+    HTTP 类服务商实现 *_flow 生成器（逐个 yield HttpRequest），同一份流程
+    可由 http_client.run_flow 同步执行，也可由异步后端执行；
+    非 HTTP 类服务商（如 Outlook）直接覆盖同步方法，*_flow 返回 None。
+    """
+
+    name = ""
+    # 能力声明
+    supports_push = False          # 支持 IMAP IDLE 等推送
+    supports_bulk = True           # 可以批量注册
+    manual_verification = False    # 注册后需要人工完成验证
+    # 批量注册的并发上限与速率（每秒请求数 / 突发量）
+    rate_limits = {"concurrency": 1, "rate": 1.0, "burst": 1}
+    # 后台轮询收件箱的总速率（所有被轮询的账号共用，每秒请求数 / 突发量）
+    poll_limits = {"rate": 1.0, "burst": 2}
+    # 注册结果中需要随账号一起保存的字段
+    account_fields = ()
+
+    def prepare(self):
+        """注册前的准备工作（如拉取域名、预启动浏览器），异步后端会放到线程池执行"""
+
+    def finish_registration(self, email_info):
+        """需要人工验证的注册完成（或放弃）后释放占用的资源"""
+
+    def close(self):
+        """程序退出时释放服务商持有的资源"""
+
+    def imap_server(self):
+        """supports_push 的服务商返回 IMAP (服务器, 端口)，用于推送监听"""
+        return None
+
+    def register_flow(self):
+        return None
+
+    def new_messages_flow(self, email_info, cursor):
+        """增量列表流程：按游标只取新邮件，返回 (新邮件 [{id, subject, from, date}] 从新到旧, 新游标)"""
+        return None
+
+    def fetch_body_flow(self, email_info, msg_id):
+        """从服务器取单封邮件正文的流程"""
+        return None
+
+    def list_messages_flow(self, email_info):
+        """邮件列表流程，返回 [{id, subject, from, date}]，按时间从新到旧
+
+        只向服务器请求游标之后的新邮件，与本地缓存合并后返回；
+        未实现 new_messages_flow 的服务商返回 None。
+        """
+        if type(self).new_messages_flow is EmailProvider.new_messages_flow:
+            return None
+        return self._list_messages_flow(email_info)
+
+    def _list_messages_flow(self, email_info):
+        store = get_store()
+        account = email_info["email"]
+        cursor = store.get_temp_cursor(account)
+        new, new_cursor = yield from self.new_messages_flow(email_info, cursor)
+        if new or new_cursor != cursor:
+            # 没有新邮件时不写库，轮询只有一次读
+            store.add_temp_messages(account, new, new_cursor)
+        return store.list_temp_messages(account, MESSAGE_LIST_LIMIT)
+
+    def fetch_message_flow(self, email_info, msg_id):
+        """单封邮件流程，返回正文文本；已下载过的正文直接读本地缓存"""
+        if type(self).fetch_body_flow is EmailProvider.fetch_body_flow:
+            return None
+        return self._fetch_message_flow(email_info, msg_id)
+
+    def _fetch_message_flow(self, email_info, msg_id):
+        store = get_store()
+        body = store.get_temp_body(email_info["email"], msg_id)
+        if body is None:
+            body = yield from self.fetch_body_flow(email_info, msg_id)
+            store.set_temp_body(email_info["email"], msg_id, body)
+        return body
+
+    def fetch_code_flow(self, email_info):
+        """验证码查询流程：取最新一封邮件提取验证码"""
+        return self._fetch_code_flow(email_info)
+
+    def _fetch_code_flow(self, email_info):
+        messages = yield from self.list_messages_flow(email_info)
+        if not messages:
+            return {"success": False, "message": "未找到邮件"}
+        content = yield from self.fetch_message_flow(email_info, messages[0]["id"])
+        return extract_code_content(content or "")
+
+    def register(self):
+        return self._run(self.register_flow())
+
+    def list_messages(self, email_info):
+        return self._run(self.list_messages_flow(email_info))
+
+    def fetch_message(self, email_info, msg_id):
+        return self._run(self.fetch_message_flow(email_info, msg_id))
+
+    def fetch_verification_code(self, email_info):
+        return self._run(self.fetch_code_flow(email_info))
+
+    def _run(self, flow):
+        if flow is None:
+            raise NotImplementedError(f"{self.name} 不支持该操作")
+        return run_flow(flow)
@@ -0,0 +1,72 @@
+from http_client import HttpRequest
+from providers.base import EmailProvider
+
+GUERRILLAMAIL_API = "https://api.guerrillamail.com/ajax.php"
+
+
+class GuerrillaMailProvider(EmailProvider):
+    """GuerrillaMail 临时邮箱（按 sid_token 会话查询）"""
+
+    name = "guerrillamail"
+    rate_limits = {"concurrency": 2, "rate": 1.0, "burst": 2}
+    poll_limits = {"rate": 1.0, "burst": 2}
+    account_fields = ("sid_token",)
+
+    def register_flow(self):
+        """GuerrillaMail 注册流程"""
+        try:
+            resp = yield HttpRequest(
+                "guerrillamail", "GET", GUERRILLAMAIL_API,
+                params={"f": "get_email_address"},
+            )
+            if resp.status_code != 200:
+                return {"success": False, "message": f"创建失败：{resp.status_code}"}
+
+            data = resp.json()
+            email_addr = data.get("email_addr")
+            sid_token = data.get("sid_token")
+
+            if not email_addr or not sid_token:
+                return {"success": False, "message": "信息不完整"}
+
+            return {
+                "success": True,
+                "email": email_addr,
+                "sid_token": sid_token,
+                "password": ""
+            }
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    def new_messages_flow(self, email_info, cursor):
+        # seq 为已见过的最大 mail_id，服务器只返回更新的邮件
+        seq = cursor.get("seq", 0)
+        params = {
+            "f": "check_email",
+            "sid_token": email_info.get("sid_token"),
+            "seq": seq
+        }
+        resp = yield HttpRequest("guerrillamail", "GET", GUERRILLAMAIL_API, params=params)
+        if resp.status_code != 200:
+            raise ValueError(f"获取列表失败：{resp.status_code}")
+
+        msg_list = sorted(resp.json().get("list", []), key=lambda m: int(m.get("mail_id") or 0), reverse=True)
+        new = [{
+            "id": m.get("mail_id"),
+            "subject": m.get("mail_subject", ""),
+            "from": m.get("mail_from", ""),
+            "date": m.get("mail_date", ""),
+        } for m in msg_list if int(m.get("mail_id") or 0) > seq]
+        return new, ({"seq": int(new[0]["id"])} if new else cursor)
+
+    def fetch_body_flow(self, email_info, msg_id):
+        params = {
+            "f": "fetch_email",
+            "sid_token": email_info.get("sid_token"),
+            "email_id": msg_id
+        }
+        resp = yield HttpRequest("guerrillamail", "GET", GUERRILLAMAIL_API, params=params)
+        if resp.status_code != 200:
+            raise ValueError(f"获取邮件失败：{resp.status_code}")
+
+        return resp.json().get("mail_body", "")
@@ -0,0 +1,222 @@
+import json
+import time
+import base64
+import threading
+
+from domain_cache import DomainCache
+from http_client import HttpRequest, run_flow
+from mail_store import get_store
+from providers.base import EmailProvider, generate_email_prefix, generate_password
+
+MAIL_TM_API = "https://api.mail.tm"
+# 邮件列表每页条数（服务器固定）与单次最多翻页数
+MAIL_TM_PAGE_SIZE = 30
+MAIL_TM_MAX_PAGES = 5
+# token 剩余有效期不足该秒数时提前刷新
+MAIL_TM_TOKEN_REFRESH_MARGIN = 300
+# 刷新失败（如密码错误、账号已删除）后，该时间内不再重试，避免批量轮询时反复请求
+MAIL_TM_TOKEN_RETRY_DELAY = 60
+
+
+def _mail_tm_domains_flow():
+    """拉取 mail.tm 当前可用的公共域名"""
+    resp = yield HttpRequest("mail.tm", "GET", f"{MAIL_TM_API}/domains")
+    if resp.status_code != 200:
+        raise ValueError(f"获取域名失败：{resp.status_code}")
+    members = resp.json().get("hydra:member", [])
+    return [m.get("domain") for m in members
+            if m.get("domain") and m.get("isActive", True) and not m.get("isPrivate", False)]
+
+
+MAIL_TM_DOMAINS = DomainCache("mail.tm", lambda: run_flow(_mail_tm_domains_flow()))
+
+
+def jwt_expiry(token):
+    """读取 JWT 的 exp 声明（Unix 时间戳），无法解析时返回 None"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class MailTmTokenManager:
+    """mail.tm token 生命周期管理
+
+    按 JWT 的 exp 判断有效期，快过期时在流程内用保存的密码提前换新 token，
+    同一账号的并发刷新合并为一次请求；请求返回 401 时作废旧 token、刷新后重试一次。
+    新 token 写回账号库，下次启动直接使用。
+    """
+
+    def __init__(self, margin=MAIL_TM_TOKEN_REFRESH_MARGIN, retry_delay=MAIL_TM_TOKEN_RETRY_DELAY):
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._tokens = {}       # email -> (token, 过期时间 或 None)
+        self._failed = {}       # email -> (失败时间, 错误信息)
+
+    def remember(self, email, token):
+        with self._lock:
+            self._tokens[email] = (token, jwt_expiry(token))
+            self._failed.pop(email, None)
+
+    def invalidate(self, email, token):
+        """作废被服务器拒绝的 token；已被其他请求换成新 token 时不动"""
+        with self._lock:
+            entry = self._tokens.get(email)
+            if entry is None or entry[0] == token:
+                self._tokens[email] = (None, None)
+
+    def current(self, email_info):
+        """返回可直接使用的 token，需要刷新时返回 None"""
+        with self._lock:
+            entry = self._tokens.get(email_info["email"])
+        if entry is None:
+            token = email_info.get("token")
+            entry = (token, jwt_expiry(token))
+        token, expiry = entry
+        if not token:
+            return None
+        # 解析不出过期时间的 token 先照常使用，由 401 触发刷新
+        if expiry is not None and expiry - time.time() < self.margin:
+            return None
+        return token
+
+    def token_flow(self, email_info):
+        """取得有效 token 的流程，必要时向服务器换新"""
+        token = self.current(email_info)
+        if token:
+            return token
+        email = email_info["email"]
+        with self._lock:
+            failed = self._failed.get(email)
+        if failed and time.monotonic() - failed[0] < self.retry_delay:
+            raise ValueError(failed[1])
+        if not email_info.get("password"):
+            raise ValueError("token 已过期且未保存密码，无法刷新")
+
+        resp = yield HttpRequest(
+            "mail.tm", "POST", f"{MAIL_TM_API}/token",
+            json={"address": email, "password": email_info["password"]},
+            coalesce=f"mail.tm/token/{email}",
+        )
+        token = resp.json().get("token") if resp.status_code == 200 else None
+        if not token:
+            message = f"刷新 token 失败：{resp.status_code}"
+            with self._lock:
+                self._failed[email] = (time.monotonic(), message)
+            raise ValueError(message)
+        # 合并的请求会让多个流程拿到同一个响应，只需其中一个写库
+        with self._lock:
+            stored = self._tokens.get(email, (None,))[0] == token
+        self.remember(email, token)
+        if not stored:
+            try:
+                get_store().update_account(email, token=token)
+            except Exception:
+                pass
+        return token
+
+    def request_flow(self, email_info, method, url, params=None):
+        """带 token 的请求流程，401 时刷新 token 后重试一次"""
+        token = yield from self.token_flow(email_info)
+        resp = yield HttpRequest("mail.tm", method, url, params=params, headers=_auth_headers(token))
+        if resp.status_code == 401:
+            self.invalidate(email_info["email"], token)
+            token = yield from self.token_flow(email_info)
+            resp = yield HttpRequest("mail.tm", method, url, params=params, headers=_auth_headers(token))
+        return resp
+
+
+def _auth_headers(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+MAIL_TM_TOKENS = MailTmTokenManager()
+
+
+class MailTmProvider(EmailProvider):
+    """mail.tm 临时邮箱（账号 + JWT token）"""
+
+    name = "mail.tm"
+    rate_limits = {"concurrency": 4, "rate": 2.0, "burst": 4}
+    poll_limits = {"rate": 4.0, "burst": 8}
+    account_fields = ("token",)
+
+    def prepare(self):
+        MAIL_TM_DOMAINS.get_domains()
+
+    def register_flow(self):
+        """mail.tm 注册流程"""
+        try:
+            prefix = generate_email_prefix()
+            # 域名列表走缓存，每个账号只需创建账号和获取 token 两次请求
+            domain = MAIL_TM_DOMAINS.pick()
+            email_addr = f"{prefix}@{domain}"
+            password = generate_password()
+
+            # 创建账号
+            acc_resp = yield HttpRequest(
+                "mail.tm", "POST", f"{MAIL_TM_API}/accounts",
+                json={"address": email_addr, "password": password},
+            )
+            if acc_resp.status_code not in (200, 201):
+                if acc_resp.status_code == 422 and "domain" in acc_resp.text.lower():
+                    # 域名已下线，下次重新拉取
+                    MAIL_TM_DOMAINS.invalidate(domain)
+                return {"success": False, "message": f"创建失败：{acc_resp.text}"}
+
+            # 获取token
+            token_resp = yield HttpRequest(
+                "mail.tm", "POST", f"{MAIL_TM_API}/token",
+                json={"address": email_addr, "password": password},
+            )
+            token_data = token_resp.json()
+            token = token_data.get("token")
+            if token:
+                MAIL_TM_TOKENS.remember(email_addr, token)
+
+            return {
+                "success": True,
+                "email": email_addr,
+                "password": password,
+                "token": token
+            }
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    def new_messages_flow(self, email_info, cursor):
+        """逐页拉取（每页从新到旧），遇到上次见过的最新邮件即停止"""
+        last_id = cursor.get("last_id")
+        new = []
+        for page in range(1, MAIL_TM_MAX_PAGES + 1):
+            resp = yield from MAIL_TM_TOKENS.request_flow(email_info, "GET", f"{MAIL_TM_API}/messages",
+                                                          params={"page": page})
+            if resp.status_code != 200:
+                raise ValueError(f"获取邮件列表失败：{resp.status_code}")
+
+            members = resp.json().get("hydra:member", [])
+            members.sort(key=lambda m: m.get("createdAt") or "", reverse=True)
+            reached = False
+            for m in members:
+                if m.get("id") == last_id:
+                    reached = True
+                    break
+                new.append({
+                    "id": m.get("id"),
+                    "subject": m.get("subject", ""),
+                    "from": (m.get("from") or {}).get("address", ""),
+                    "date": m.get("createdAt", ""),
+                })
+            if reached or len(members) < MAIL_TM_PAGE_SIZE:
+                break
+        return new, ({"last_id": new[0]["id"]} if new else cursor)
+
+    def fetch_body_flow(self, email_info, msg_id):
+        resp = yield from MAIL_TM_TOKENS.request_flow(email_info, "GET", f"{MAIL_TM_API}/messages/{msg_id}")
+        if resp.status_code != 200:
+            raise ValueError(f"获取邮件失败：{resp.status_code}")
+
+        msg_data = resp.json()
+        return msg_data.get("text") or "\n".join(msg_data.get("html", [])) or ""
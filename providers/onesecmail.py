@@ -0,0 +1,70 @@
+from http_client import HttpRequest
+from providers.base import EmailProvider
+
+ONESECMAIL_API = "https://www.1secmail.com/api/v1/"
+
+
+class OneSecMailProvider(EmailProvider):
+    """1secmail 临时邮箱（无密码，按地址查询）"""
+
+    name = "1secmail"
+    rate_limits = {"concurrency": 4, "rate": 4.0, "burst": 8}
+    poll_limits = {"rate": 2.0, "burst": 4}
+
+    def register_flow(self):
+        """1secmail 注册流程"""
+        try:
+            resp = yield HttpRequest(
+                "1secmail", "GET", ONESECMAIL_API,
+                params={"action": "genRandomMailbox", "count": 1},
+            )
+            if resp.status_code != 200:
+                return {"success": False, "message": f"创建失败：{resp.status_code}"}
+
+            data = resp.json()
+            if not data:
+                return {"success": False, "message": "未返回邮箱地址"}
+
+            return {
+                "success": True,
+                "email": data[0],
+                "password": ""
+            }
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @staticmethod
+    def _split_address(email_info):
+        try:
+            login, domain = email_info["email"].split('@', 1)
+        except ValueError:
+            raise ValueError("邮箱格式错误")
+        return login, domain
+
+    def new_messages_flow(self, email_info, cursor):
+        # 1secmail 只能取完整列表，按递增的 id 过滤出新邮件
+        login, domain = self._split_address(email_info)
+        params = {"action": "getMessages", "login": login, "domain": domain}
+        resp = yield HttpRequest("1secmail", "GET", ONESECMAIL_API, params=params)
+        if resp.status_code != 200:
+            raise ValueError(f"获取列表失败：{resp.status_code}")
+
+        last_id = cursor.get("last_id", 0)
+        msg_list = sorted(resp.json(), key=lambda m: int(m.get("id") or 0), reverse=True)
+        new = [{
+            "id": m.get("id"),
+            "subject": m.get("subject", ""),
+            "from": m.get("from", ""),
+            "date": m.get("date", ""),
+        } for m in msg_list if int(m.get("id") or 0) > last_id]
+        return new, ({"last_id": int(new[0]["id"])} if new else cursor)
+
+    def fetch_body_flow(self, email_info, msg_id):
+        login, domain = self._split_address(email_info)
+        params = {"action": "readMessage", "login": login, "domain": domain, "id": msg_id}
+        resp = yield HttpRequest("1secmail", "GET", ONESECMAIL_API, params=params)
+        if resp.status_code != 200:
+            raise ValueError(f"获取邮件失败：{resp.status_code}")
+
+        msg_data = resp.json()
+        return msg_data.get("textBody") or msg_data.get("body") or ""
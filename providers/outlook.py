@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from datetime import date
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from driver_pool import DRIVER_POOL
+from mail_pool import IMAP_POOL
+from mail_sync import MAIL_SYNC, fetch_body_text
+from providers.outlook_signup import OutlookSignup
+from providers.base import EmailProvider, extract_code_content, generate_email_prefix, generate_password
+from code_extractor import CODE_KEYWORDS, keyword_roots
+
+OUTLOOK_IMAP_SERVER = "imap-mail.outlook.com"
+OUTLOOK_IMAP_PORT = 993
+
+# 验证码发件人白名单（FROM 子串匹配），为空时不限制；账号信息中的 code_senders 优先
+OUTLOOK_CODE_SENDERS = ()
+# SINCE 只精确到日期且按服务器时区比较，向前多留一天
+SEARCH_SINCE_MARGIN = 86400
+# IMAP 搜索本身是不区分大小写的子串匹配，被其他关键词包含的长关键词不必再搜
+SEARCH_KEYWORDS = keyword_roots(CODE_KEYWORDS)
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+class OutlookProvider(EmailProvider):
+    """Outlook 邮箱：Selenium 自动填写注册表单，IMAP 收信"""
+
+    name = "outlook"
+    supports_push = True
+    supports_bulk = False
+    manual_verification = True
+
+    def __init__(self):
+        # 等待人工验证的注册：邮箱 -> 浏览器
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # 邮箱 -> 上次查询无结果的时间，下次只需搜索此后的邮件
+        self._last_empty_check = {}
+
+    def register(self):
+        """注册Outlook邮箱（启动 Edge 自动填表，返回账号信息，人工完成验证码）"""
+        driver = None
+        signup = None
+        try:
+            # 1. 生成邮箱和密码
+            prefix = generate_email_prefix()
+            domain = random.choice(["outlook.com", "hotmail.com"])
+            email_addr = f"{prefix}@{domain}"
+            password = generate_password()
+
+            # 2. 从浏览器池借出预启动的 Edge
+            driver = DRIVER_POOL.acquire()
+
+            # 3. 按页面状态机自动填写，直到人机验证页
+            signup = OutlookSignup(driver, email_addr, password)
+            timings = signup.run()
+
+            # 接下来通常进入"证明你不是机器人"页面，此处交给用户手动完成
+            # 浏览器保持打开，直到用户确认验证完成（finish_registration）后归还浏览器池
+            with self._pending_lock:
+                self._pending[email_addr] = driver
+            driver = None
+            return {
+                "success": True,
+                "email": email_addr,
+                "password": password,
+                "message": "已自动完成前置步骤，请在浏览器中完成人机验证，然后在界面中点击验证按钮。",
+                "timings": timings
+            }
+        except (TimeoutException, WebDriverException) as e:
+            if driver is not None and not isinstance(e, TimeoutException):
+                # 浏览器本身出错（崩溃、断开），不再复用
+                DRIVER_POOL.discard(driver)
+                driver = None
+            return {"success": False, "message": f"浏览器自动化出错：{e}",
+                    "timings": signup.timings if signup else []}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+        finally:
+            if driver is not None:
+                DRIVER_POOL.release(driver)
+
+    def prepare(self):
+        # 用户选中 Outlook 时预启动浏览器
+        DRIVER_POOL.warm_up()
+
+    def finish_registration(self, email_info):
+        """人工验证完成（或放弃）后把浏览器清理干净归还浏览器池"""
+        with self._pending_lock:
+            driver = self._pending.pop(email_info["email"], None)
+        if driver is not None:
+            DRIVER_POOL.release(driver)
+
+    def close(self):
+        with self._pending_lock:
+            drivers = list(self._pending.values())
+            self._pending.clear()
+        DRIVER_POOL.close_all(drivers)
+
+    def fetch_verification_code(self, email_info):
+        """获取Outlook邮箱验证码（IMAP）
+
+        搜索限定在注册（或上次无结果的查询）之后、白名单发件人的邮件，
+        旧版导入的账号没有注册时间（created_at 为空），此时不加 SINCE 条件；
+        先只搜主题，主题没有命中才让服务器做代价高的正文全文搜索；
+        命中后只取最新一封的正文部分，不下载整封 RFC822 和附件。
+        """
+        email_addr = email_info["email"]
+        since = max(email_info.get("created_at") or 0, self._last_empty_check.get(email_addr, 0))
+        criteria = _base_criteria(since, email_info.get("code_senders") or OUTLOOK_CODE_SENDERS)
+        checked_at = time.time()
+
+        def fetch(mail):
+            uid = _search_latest(mail, criteria, "SUBJECT") or _search_latest(mail, criteria, "BODY")
+            if uid is None:
+                return None
+            return fetch_body_text(mail, uid)
+
+        text = IMAP_POOL.run(
+            OUTLOOK_IMAP_SERVER, OUTLOOK_IMAP_PORT,
+            email_addr, email_info["password"], fetch
+        )
+        if text is None:
+            self._last_empty_check[email_addr] = checked_at
+            return {"success": False, "message": "未找到相关邮件"}
+
+        return extract_code_content(text)
+
+    def imap_server(self):
+        return OUTLOOK_IMAP_SERVER, OUTLOOK_IMAP_PORT
+
+    def fetch_code_flow(self, email_info):
+        # IMAP 会话不走 HTTP 流程，由调用方在线程中执行 fetch_verification_code
+        return None
+
+    def list_messages(self, email_info):
+        """增量同步收件箱后返回最新一页邮件摘要"""
+        user, password = email_info["email"], email_info["password"]
+        MAIL_SYNC.sync(OUTLOOK_IMAP_SERVER, OUTLOOK_IMAP_PORT, user, password)
+        messages, _ = MAIL_SYNC.get_page(OUTLOOK_IMAP_SERVER, OUTLOOK_IMAP_PORT, user, password, 0, 20)
+        return messages
+
+    def fetch_message(self, email_info, msg_id):
+        def fetch(mail):
+            text = fetch_body_text(mail, msg_id)
+            if text is None:
+                raise ValueError("邮件不存在或已被删除")
+            return text
+
+        return IMAP_POOL.run(
+            OUTLOOK_IMAP_SERVER, OUTLOOK_IMAP_PORT,
+            email_info["email"], email_info["password"], fetch
+        )
+
+
+def _imap_date(timestamp):
+    day = date.fromtimestamp(timestamp)
+    # 不用 strftime("%b")，中文系统下月份名会本地化
+    return f"{day.day}-{_MONTHS[day.month - 1]}-{day.year}"
+
+
+def _or_chain(field, values):
+    """生成 OR field v1 field v2 ... 的前缀式搜索条件"""
+    criteria = ["OR"] * (len(values) - 1)
+    for value in values:
+        criteria.extend([field, f'"{value}"'])
+    return criteria
+
+
+def _base_criteria(since, senders):
+    criteria = []
+    if since:
+        criteria.extend(["SINCE", _imap_date(since - SEARCH_SINCE_MARGIN)])
+    if senders:
+        criteria.extend(_or_chain("FROM", list(senders)))
+    return criteria
+
+
+def _search_latest(mail, criteria, field):
+    """按 field（SUBJECT/BODY）搜索关键词，返回命中的最大 UID
+
+    ASCII 关键词合并成一条 OR 搜索；中文关键词需以 UTF-8 字面量发送，
+    imaplib 每条命令只能带一个字面量（且在末尾），因此逐个搜索。
+    """
+    uids = []
+    ascii_keywords = [k for k in SEARCH_KEYWORDS if k.isascii()]
+    if ascii_keywords:
+        status, data = mail.uid('SEARCH', *criteria, *_or_chain(field, ascii_keywords))
+        if status == 'OK' and data[0]:
+            uids.extend(data[0].split())
+    for keyword in SEARCH_KEYWORDS:
+        if keyword.isascii():
+            continue
+        mail.literal = keyword.encode("utf-8")
+        status, data = mail.uid('SEARCH', 'CHARSET', 'UTF-8', *criteria, field)
+        if status == 'OK' and data[0]:
+            uids.extend(data[0].split())
+    return max(uids, key=int).decode() if uids else None
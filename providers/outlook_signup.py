@@ -0,0 +1,144 @@
+import random
+import string
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+SIGNUP_URL = "https://signup.live.com/signup"
+# 等待下一页出现的总时长（同时等待所有可能的页面，而不是逐个等待超时）
+SIGNUP_STEP_TIMEOUT = 20
+# 页面出现后，页内元素（按钮、下拉项）的等待时长
+SIGNUP_ACTION_TIMEOUT = 10
+SIGNUP_POLL_INTERVAL = 0.2
+
+# 注册流程中可能出现的页面及其识别方式（任一定位器命中即认为进入该页）
+SIGNUP_PAGES = {
+    "consent": [(By.XPATH, "//button[contains(., '同意并继续')]")],
+    "email": [(By.NAME, "电子邮件"), (By.ID, "floatingLabelInput7")],
+    "password": [(By.ID, "floatingLabelInput16"), (By.NAME, "Password")],
+    "birthdate": [(By.ID, "Country"), (By.NAME, "BirthYear")],
+    "name": [(By.NAME, "FirstName")],
+    # 人机验证页：到这里自动化结束，交给用户
+    "challenge": [(By.ID, "enforcementFrame"), (By.XPATH, "//*[contains(text(), '机器人')]")],
+}
+# 必须经过的页面；其余页面可能不出现
+REQUIRED_PAGES = ("email", "password")
+
+
+class OutlookSignup:
+    """Outlook 注册页面状态机
+
+    每一步同时等待所有尚未处理的页面，哪个先出现就处理哪个，
+    可选页面不出现时不会再白白等满超时；并记录每一步的等待与操作耗时。
+    """
+
+    def __init__(self, driver, email_addr, password, step_timeout=SIGNUP_STEP_TIMEOUT):
+        self.driver = driver
+        self.email_addr = email_addr
+        self.password = password
+        self.step_timeout = step_timeout
+        self.timings = []      # [(页面, 等待秒数, 操作秒数)]
+        self._handlers = {
+            "consent": self._on_consent,
+            "email": self._on_email,
+            "password": self._on_password,
+            "birthdate": self._on_birthdate,
+            "name": self._on_name,
+        }
+
+    def run(self):
+        """执行到人机验证页（或没有更多可识别页面）为止，返回各步耗时"""
+        started = time.monotonic()
+        self.driver.get(SIGNUP_URL)
+        self.timings.append(("open", 0.0, time.monotonic() - started))
+
+        remaining = set(SIGNUP_PAGES)
+        while True:
+            wait_started = time.monotonic()
+            page, element = self._wait_any(remaining)
+            waited = time.monotonic() - wait_started
+            if page is None:
+                missing = [name for name in REQUIRED_PAGES if name in remaining]
+                if missing:
+                    raise TimeoutException(f"注册页面未出现：{', '.join(missing)}")
+                # 必要步骤已完成，识别不到后续页面时交给用户继续
+                self.timings.append(("done", waited, 0.0))
+                return self.timings
+            if page == "challenge":
+                self.timings.append((page, waited, 0.0))
+                return self.timings
+
+            remaining.discard(page)
+            action_started = time.monotonic()
+            try:
+                self._handlers[page](element)
+            except TimeoutException:
+                # 可选页面的界面略有变化时尽量不中断流程
+                if page in REQUIRED_PAGES:
+                    raise
+            self.timings.append((page, waited, time.monotonic() - action_started))
+
+    def _wait_any(self, pages):
+        """轮询等待任一页面出现，返回 (页面, 元素)，超时返回 (None, None)"""
+        locators = [(page, locator) for page in SIGNUP_PAGES if page in pages
+                    for locator in SIGNUP_PAGES[page]]
+
+        def match(driver):
+            for page, locator in locators:
+                try:
+                    for element in driver.find_elements(*locator):
+                        if element.is_displayed():
+                            return page, element
+                except WebDriverException:
+                    # 页面切换中元素失效，下次轮询重试
+                    continue
+            return False
+
+        try:
+            return WebDriverWait(self.driver, self.step_timeout, poll_frequency=SIGNUP_POLL_INTERVAL).until(match)
+        except TimeoutException:
+            return None, None
+
+    def _wait_clickable(self, locator):
+        return WebDriverWait(self.driver, SIGNUP_ACTION_TIMEOUT).until(EC.element_to_be_clickable(locator))
+
+    def _click_next(self):
+        self._wait_clickable((By.XPATH, "//button[contains(., '下一步')]")).click()
+
+    def _on_consent(self, button):
+        button.click()
+
+    def _on_email(self, email_input):
+        email_input.send_keys(self.email_addr)
+        self._click_next()
+
+    def _on_password(self, pwd_input):
+        pwd_input.send_keys(self.password)
+        self._click_next()
+
+    def _on_birthdate(self, _):
+        country_select = self.driver.find_elements(By.ID, "Country")
+        if country_select:
+            country_select[0].send_keys("中国")
+
+        year_input = WebDriverWait(self.driver, SIGNUP_ACTION_TIMEOUT).until(
+            EC.presence_of_element_located((By.NAME, "BirthYear"))
+        )
+        year_input.clear()
+        year_input.send_keys("1995")
+
+        self._wait_clickable((By.ID, "BirthMonthDropdown")).click()
+        self._wait_clickable((By.XPATH, "//*[@role='option' and contains(., '1月')]")).click()
+        self._wait_clickable((By.ID, "BirthDayDropdown")).click()
+        self._wait_clickable((By.XPATH, "//*[@role='option' and contains(., '1日')]")).click()
+        self._click_next()
+
+    def _on_name(self, first_name_input):
+        first_name = ''.join(random.choices(string.ascii_lowercase, k=5)).capitalize()
+        last_name = ''.join(random.choices(string.ascii_lowercase, k=6)).capitalize()
+        first_name_input.send_keys(first_name)
+        self.driver.find_element(By.NAME, "LastName").send_keys(last_name)
+        self._click_next()
@@ -0,0 +1,118 @@
+import time
+import threading
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from email_services import TempEmailService
+from providers import get_provider
+
+# 批量注册配置；各服务商的并发上限与速率见 EmailProvider.rate_limits
+BULK_MAX_WORKERS = 16
+
+
+class RateLimiter:
+    """令牌桶限速器，线程安全"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        """取一个令牌，不足时等待；取消时返回 False"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+def build_account(result):
+    """把注册结果转换为邮箱列表中保存的账号信息"""
+    account = {
+        "email": result["email"],
+        "password": result.get("password", ""),
+        "type": result["type"],
+        "used": False,
+        # 注册时间，查询验证码时用于缩小 IMAP 搜索范围
+        "created_at": time.time()
+    }
+    # 添加特定类型的额外信息
+    provider = get_provider(result["type"])
+    for field in (provider.account_fields if provider else ()):
+        account[field] = result.get(field)
+    return account
+
+
+class BulkProvisioner:
+    """并发批量注册临时邮箱，按服务商限制并发与速率"""
+
+    def __init__(self, max_workers=BULK_MAX_WORKERS, limits=None):
+        self.max_workers = max_workers
+        # limits 可按类型覆盖服务商声明的限制
+        self.limits = limits or {}
+        self._semaphores = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def _limits_for(self, email_type):
+        with self._lock:
+            if email_type not in self._semaphores:
+                limit = self.limits.get(email_type) or get_provider(email_type).rate_limits
+                self._semaphores[email_type] = threading.BoundedSemaphore(limit["concurrency"])
+                self._limiters[email_type] = RateLimiter(limit["rate"], limit.get("burst", 1))
+            return self._semaphores[email_type], self._limiters[email_type]
+
+    def _register_one(self, email_type, cancel_event):
+        if cancel_event.is_set():
+            return {"success": False, "message": "已取消", "type": email_type}
+        semaphore, limiter = self._limits_for(email_type)
+        with semaphore:
+            if not limiter.acquire(cancel_event):
+                return {"success": False, "message": "已取消", "type": email_type}
+            try:
+                result = TempEmailService.register(email_type)
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+        result["type"] = email_type
+        return result
+
+    def run(self, plan, progress=None, cancel_event=None):
+        """执行批量注册
+
+        plan 为 {邮箱类型: 数量}；progress(done, total, result) 在每个账号完成时回调。
+        返回全部注册结果列表，由调用方一次性持久化成功的账号。
+        """
+        cancel_event = cancel_event or threading.Event()
+        for email_type in plan:
+            provider = get_provider(email_type)
+            if provider is None:
+                raise ValueError(f"未知邮箱类型：{email_type}")
+            if not provider.supports_bulk:
+                raise ValueError(f"{email_type} 需要人工验证，不支持批量注册")
+        # 交错排列各服务商任务，避免单个服务商的限速拖住整个线程池
+        queues = [[email_type] * count for email_type, count in plan.items()]
+        jobs = [email_type for batch in zip_longest(*queues) for email_type in batch if email_type]
+
+        total = len(jobs)
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(total, 1)),
+                                thread_name_prefix="bulk-register") as executor:
+            futures = [executor.submit(self._register_one, email_type, cancel_event) for email_type in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if progress is not None:
+                    progress(len(results), total, result)
+        return results